@@ -1,7 +1,54 @@
-import math
-import tkinter as tk
-from tkinter import simpledialog
-from tkinter import messagebox
+import argparse
+import multiprocessing
+import os
+import sys
+
+import instrumentation
+from kinematics import (MOVE_VALID, MOVE_CROSSES_ORIGIN, MOVE_INTERSECTS_INNER_CIRCLE, MOVE_COLLIDES_OBSTACLE,
+                        are_coords_inside_workspace, calculate_first_arm, check_arm_lengths_fit_size, check_arm_move,
+                        check_joint_move, get_arm1_coords, get_single_arm1_coords_from_direction, get_workspace_radius)
+from nlink import ChainIKSolver, check_chain_move, get_equivalent_arm_lengths, plan_chain_move
+from obstacles import check_arm_move_obstacles, load_obstacles
+from path_planner import plan_detour_move
+from pose_ring import PoseRing, stream_move
+from recording import RECORD_TARGET, TrajectoryRecorder
+from target_follow import FollowRenderer, TargetFollower
+from time_scaling import scale_trajectory
+from trajectory import plan_joint_move, plan_move
+from animation import ChainPlayer, RingPlayer, TrajectoryPlayer
+from viewport import Viewport
+
+# tkinter is loaded by load_tk only when the GUI is actually used, so that the module can be imported headless
+tk = None
+simpledialog = None
+messagebox = None
+
+# The root and canvas of the GUI, created by create_root_and_canvas
+root = None
+canvas = None
+
+# The cached world to canvas transform of the canvas, created by get_viewport
+viewport = None
+
+# Tuple (viewport, listener) of the player of the last move, replaced by the player of the next move
+move_listener = None
+
+# Optional ObstacleMap the moves are checked against, loaded by run_robotic_system
+obstacles = None
+
+
+def load_tk():
+    """
+    Import tkinter and its dialog modules on first use
+    """
+    global tk, simpledialog, messagebox
+
+    if tk is None:
+        import tkinter
+        from tkinter import simpledialog as tk_simpledialog
+        from tkinter import messagebox as tk_messagebox
+
+        tk, simpledialog, messagebox = tkinter, tk_simpledialog, tk_messagebox
 
 
 def create_root_and_canvas():
@@ -9,6 +56,8 @@ def create_root_and_canvas():
     Create a canvas and root for our program taking advantage of tkinter lib
     :return: A tuple (tk_root, tk_canvas) representing the root and canvas created
     """
+    load_tk()
+
     # Create the main window
     tk_root = tk.Tk()
     tk_root.title("2D Robotic System")
@@ -33,11 +82,10 @@ def draw_axes():
     """
     Draw X,Y axes to canvas
     """
-    # Retrieve width, height from created canvas
-    width, height = get_canvas_width_height()
-    # Draw axes
-    canvas.create_line(width / 2, 0, width / 2, height, fill="green")  # y-axis
-    canvas.create_line(0, height / 2, width, height / 2, fill="green")  # x-axis
+    # Draw axes - The viewport keeps them across the whole canvas through (0, 0)
+    y_axis = canvas.create_line(0, 0, 0, 0, fill="green")
+    x_axis = canvas.create_line(0, 0, 0, 0, fill="green")
+    get_viewport().set_axes(x_axis, y_axis)
 
 
 def draw_workspace_circles(l1, l2):
@@ -49,8 +97,10 @@ def draw_workspace_circles(l1, l2):
     # Get the center of the canvas
     center_x, center_y = get_center_xy()
 
-    # Get internal and external radius
+    # Get internal and external radius in canvas pixels
     ext_r, int_r = get_workspace_radius(l1, l2)
+    ext_r *= viewport.scale
+    int_r *= viewport.scale
 
     # Coordinates for the smaller circle
     small_circle_coords = (center_x - int_r, center_y - int_r, center_x + int_r, center_y + int_r)
@@ -67,10 +117,37 @@ def draw_workspace_circles(l1, l2):
 
 def get_canvas_width_height():
     """
-    Retrieve defined canvas width and height
+    Retrieve defined canvas width and height, cached by the viewport
     :return: A tuple (width, height) representing the dimensions of the defined canvas
     """
-    return canvas.winfo_width(), canvas.winfo_height()
+    return get_viewport().get_size()
+
+
+def get_viewport():
+    """
+    Get the viewport of the canvas, created on first use
+    :return: The Viewport caching the world to canvas transform
+    """
+    global viewport
+
+    if viewport is None or viewport.canvas is not canvas:
+        viewport = Viewport(canvas)
+
+    return viewport
+
+
+def set_move_listener(listener):
+    """
+    Make a player follow the changes of the viewport transform, in place of the player of the previous move. Only
+    the last player stays registered, so that finished players are not kept alive by the viewport
+    :param listener: The set_transform method of the player
+    """
+    global move_listener
+
+    if move_listener is not None:
+        move_listener[0].remove_listener(move_listener[1])
+    get_viewport().add_listener(listener)
+    move_listener = (viewport, listener)
 
 
 def get_user_input_data():
@@ -99,11 +176,15 @@ def get_arm_lengths_input(message):
         l1 = abs(ask_int_number_input(message + " L1"))
         l2 = abs(ask_int_number_input(message + " L2"))
 
-        # Check that L1, L2 greater than 0, and that L1,L2 fit the canvas
-        if l1 > 0 and l2 > 0 and check_arm_lengths_fit_canvas(l1, l2):
+        # Check that L1, L2 greater than 0
+        if l1 > 0 and l2 > 0:
             break
         else:
-            messagebox.showerror("Length error", "Length outside canvas or 0. Press OK to re enter values")
+            messagebox.showerror("Length error", "Length cannot be 0. Press OK to re enter values")
+
+    # Zoom out for arm lengths that do not fit the canvas
+    if not check_arm_lengths_fit_canvas(l1, l2):
+        get_viewport().fit(l1 + l2)
 
     print(f"Arm length L1: {l1}")
     print(f"Arm length L2: {l2}")
@@ -154,118 +235,6 @@ def get_arm2_coordinates(l1, l2):
     return x2, y2
 
 
-def are_coords_inside_workspace(l1, l2, x, y):
-    """
-    Check if provided (x, y) coordinate is inside workspace
-    :param l1: The arm1 length
-    :param l2: The arm2 length
-    :param x: The x coordinate to check
-    :param y: The y coordinate to check
-    :return: Boolean True if provided (x, y) is inside workspace or False if not
-    """
-    # Retrieve the R and r radius
-    ext_r, int_r = get_workspace_radius(l1, l2)
-
-    # Check booleans by computing specific functions for R and r
-    is_lower_ext_radius = x ** 2 + y ** 2 < ext_r ** 2
-    is_higher_int_radius = x ** 2 + y ** 2 > int_r ** 2
-
-    if is_lower_ext_radius and is_higher_int_radius:
-        return True
-    else:
-        return False
-
-
-def get_arm1_coords(l1, l2, x2, y2):
-    """
-    Compute the 2 different coordinate solutions for arm1
-    :param l1: The arm length L1
-    :param l2: The arm length L2
-    :param x2: The coordinate x2 from arm2
-    :param y2: The coordinate y2 from arm2
-    :return: A tuple (x1a, y1a, x1b, y1b) representing the different coordinate solutions for arm1
-    """
-    # Compute the variable c from provided lab notes
-    c = (y2 ** 2 + x2 ** 2 + l1 ** 2 - l2 ** 2) / 2
-
-    # Compute the 2 possible coordinate solutions from provided lab notes
-    if x2 != 0:
-        # Compute delta from provided lab notes
-        delta = (4 * c ** 2 * y2 ** 2) - 4 * ((y2 ** 2 + x2 ** 2) * (c ** 2 - (l1 ** 2 * x2 ** 2)))
-
-        y1a = (2 * c * y2 + math.sqrt(delta)) / (2 * (x2 ** 2 + y2 ** 2))
-        x1a = calculate_arm1_x1(c, y1a, x2, y2)
-
-        y1b = (2 * c * y2 - math.sqrt(delta)) / (2 * (x2 ** 2 + y2 ** 2))
-        x1b = calculate_arm1_x1(c, y1b, x2, y2)
-    else:
-        # We are safe from arm_y2 = 0, as arm_x2 is already 0 and this combination (0, 0) has already been excluded
-        # in previous step
-        y1a = c / y2
-        x1a = math.sqrt(l1 ** 2 - (c ** 2 / y2 ** 2))
-
-        y1b = y1a
-        x1b = -x1a
-
-    print(f"Coordinate solution (x1a, y1a): ({x1a}, {y1a})")
-    print(f"Coordinate solution (x1b, y1b): ({x1b}, {y1b})")
-    return x1a, y1a, x1b, y1b
-
-
-def calculate_arm1_x1(c, y1, x2, y2):
-    """
-    Compute arm1 x1 coordinate when x2 from arm2 is not 0
-    :param c: The stable c number as defined in robotics lab notes
-    :param y1: The coordinate y1 from arm1
-    :param x2: The coordinate x2 from arm2
-    :param y2: The coordinate y2 from arm2
-    :return: The coordinate x1 from arm1
-    """
-    return (c - (y2 * y1)) / x2
-
-
-def get_single_arm1_coords_from_direction(x2, y2, x1a, y1a, x1b, y1b, direction):
-    """
-    Pick a single arm1 coordinates from the double coordinate solutions according to user's desire
-    :param x2: The x2 coordinate of arm2
-    :param y2: The y2 coordinate of arm2
-    :param x1a: The x1a coordinate of arm1
-    :param y1a: The y1a coordinate of arm1
-    :param x1b: The x1b coordinate of arm1
-    :param y1b: The y1b coordinate of arm1
-    :param direction: The user's picked direction
-    :return: A tuple (x1, y1) representing arm1's coordinates
-    """
-    # Calculate negative f1 for (arm_x1b, arm_y1b)
-    f1 = - atn2(x1b, y1b)
-
-    # Calculate new coordinates in the new system - First move and then rotate
-    x2_move = x2 - x1b
-    y2_move = y2 - y1b
-
-    x2_rot = (x2_move * math.cos(f1)) - (y2_move * math.sin(f1))
-    y2_rot = (x2_move * math.sin(f1)) + (y2_move * math.cos(f1))
-
-    # Calculate f2 for (x2_rot, y2_rot) - Enough to make final decision on arm1 coordinates
-    f2 = atn2(x2_rot, y2_rot)
-
-    # Check if f2 is left or right turn view
-    if 0 < f2 < math.pi:
-        # Counterclockwise
-        turn_view = 0
-    else:
-        # Clockwise
-        turn_view = 1
-
-    # Check what the user picked as desired direction
-    if direction == turn_view:
-        print_arm1_coordinates(x1b, y1b)
-        return x1b, y1b
-    else:
-        print_arm1_coordinates(x1a, y1a)
-        return x1a, y1a
-
-
 def draw_robotic_arm(x1, y1, x2, y2):
     """
     Draw the final robotic arm as for the given arm1 and arm2 coordinates
@@ -279,10 +248,8 @@ def draw_robotic_arm(x1, y1, x2, y2):
     center_x, center_y = get_center_xy()
 
     # Translate (x1, y1) and (x2, y2) to canvas coordinates
-    canvas_x1 = center_x + x1
-    canvas_y1 = center_y - y1
-    canvas_x2 = center_x + x2
-    canvas_y2 = center_y - y2
+    canvas_x1, canvas_y1 = viewport.to_canvas(x1, y1)
+    canvas_x2, canvas_y2 = viewport.to_canvas(x2, y2)
 
     # Draw lines from center to (x1, y1) and (x1, y1) to (x2, y2)
     line_thickness = 3
@@ -301,153 +268,208 @@ def draw_robotic_arm(x1, y1, x2, y2):
     return arm1, arm2, oval1, oval2
 
 
-def get_user_move_arm_data(l1, l2, x2, y2):
+def draw_chain_arm(pose):
     """
-    Get new arm move coordinates (xt, yt) from User with several checks
+    Draw a robotic arm of any number of links, as draw_robotic_arm does for 2 links. The workspace of a chain is
+    drawn by draw_workspace_circles(*nlink.get_equivalent_arm_lengths(lengths))
+    :param pose: Sequence (x1, y1, ..., xn, yn) of the link end points, e.g. from nlink.ChainIKSolver.solve
+    :return: A tuple (links, ovals) with the list of link lines, to be animated by animation.ChainPlayer, and the
+    list of joint oval points
+    """
+    center_x, center_y = get_center_xy()
+
+    links = []
+    ovals = []
+    canvas_x, canvas_y = center_x, center_y
+    circle_radius = 3
+    for i in range(0, len(pose), 2):
+        next_x, next_y = viewport.to_canvas(pose[i], pose[i + 1])
+        links.append(canvas.create_line(canvas_x, canvas_y, next_x, next_y, fill="black", width=3))
+        ovals.append(canvas.create_oval(next_x - circle_radius, next_y - circle_radius,
+                                        next_x + circle_radius, next_y + circle_radius, fill="red", outline="red"))
+        canvas_x, canvas_y = next_x, next_y
+
+    return links, ovals
+
+
+def get_user_move_arm_data(l1, l2, x2, y2, direction=1, joint=False):
+    """
+    Get new arm move coordinates (xt, yt) from User with several checks. If the straight move is blocked by the
+    internal circle, the User can accept a detour around it instead of re-entering the coordinates. Moves where the
+    arm hits one of the obstacles are rejected. Joint space moves never cross the internal circle, so only (xt, yt)
+    must be inside workspace
     :param l1: The length L1 of arm1
     :param l2: The length L2 of arm2
     :param x2: The x coordinate of arm2
     :param y2: The y coordinate of arm2
-    :return: A tuple (xt, yt) of valid move coordinates and the moving red line
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise, used for the obstacles
+    :param joint: Boolean True to interpolate the joint angles instead of moving the arm edge straight, see
+    trajectory.plan_joint_move
+    :return: A tuple (xt, yt, path) of valid move coordinates and the PlannedPath of an accepted detour, or None for
+    a straight or joint move
     """
     while True:
         # Pop up message for data input from user
         xt = ask_int_number_input("Give coordinate xt for new robotic move")
         yt = ask_int_number_input("Give coordinate yt for new robotic move")
 
-        # Init check if new desired (xt, yt) is inside workspace. If not re-enter input data
-        if are_coords_inside_workspace(l1, l2, xt, yt):
-            if xt != x2:
-                # Calculate a and b constant values
-                a = (yt - y2) / (xt - x2)
-                b = y2 - a * x2
-                delta = (4 * a ** 2 * b ** 2) - (4 * ((a ** 2 + 1) * (b ** 2 - (l1 - l2) ** 2)))
-
-                # Check delta
-                if delta <= 0:
-                    # Check special case where L1 = L2 and move path goes through (0 , 0) coordinate point
-                    # This should be treated as invalid move
-                    if l1 == l2:
-                        if x2 == xt * (-1) and y2 == yt * (-1):
-                            line, inter_point1, inter_point2 = draw_move_scene(x2, y2, xt, yt, None, None, None, None)
-                            # The following message box takes either True or False according to User's click,
-                            # If True (so User clicked OK) clear the drawn line from canvas to start fresh
-                            if messagebox.showerror("Coordinates error",
-                                                 "Move to provided coordinates is crossing by (0, 0). "
-                                                 "Press OK to re enter values"):
-                                clear_from_canvas(line)
-                            continue
-                    # Valid move - Draw the moving red line in canvas and return (xt, yt)
-                    print(f"Valid move to coordinate (xt, yt): {xt, yt}")
-                    draw_move_scene(x2, y2, xt, yt, None, None, None, None)
-                    return xt, yt
-                else:
-                    # Find the 2 intersection points (xs1, ys1) and (xs2, ys2)
-                    xs1 = ((-2 * a * b) + math.sqrt(delta)) / (2 * (a ** 2 + 1))
-                    ys1 = (a * xs1) + b
-
-                    xs2 = ((-2 * a * b) - math.sqrt(delta)) / (2 * (a ** 2 + 1))
-                    ys2 = (a * xs2) + b
-
-                    # Check intersection distances and define if valid move
-                    if is_valid_arm_move_as_for_distances_check(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
-                        # Valid move - Draw the moving red line in canvas and return (xt, yt)
-                        print(f"Valid move to coordinate (xt, yt): {xt, yt}")
-                        draw_move_scene(x2, y2, xt, yt, None, None, None, None)
-                        return xt, yt
-                    else:
-                        # Invalid move - Draw the moving line intersecting with the small internal circle
-                        # Once the user presses OK to pop up window, remove drawn objects from canvas
-                        line, inter_point1, inter_point2 = draw_move_scene(x2, y2, xt, yt, xs1, ys1,
-                                                                           xs2, ys2)
-                        show_coordinates_error(inter_point1, inter_point2, line)
-                        continue
-            else:
-                if abs(x2) > abs(l1 - l2):
-                    # Valid move - Draw the moving red line in canvas and return (xt, yt)
-                    print(f"Valid move to coordinate (xt, yt): {xt, yt}")
-                    draw_move_scene(x2, y2, xt, yt, None, None, None, None)
-                    return xt, yt
-                else:
-                    # Find the 2 intersection points (xs1, ys1) and (xs2, ys2)
-                    xs1 = x2
-                    ys1 = math.sqrt((l1 - l2) ** 2 - xs1 ** 2)
-
-                    xs2 = x2
-                    ys2 = -ys1
-
-                    # Check intersection distances and define if valid move
-                    if is_valid_arm_move_as_for_distances_check(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
-                        # Valid move - Draw the moving red line in canvas and return (xt, yt)
-                        print(f"Valid move to coordinate (xt, yt): {xt, yt}")
-                        draw_move_scene(x2, y2, xt, yt, None, None, None, None)
-                        return xt, yt
-                    else:
-                        # Invalid move - Draw the moving line intersecting with the small internal circle
-                        # Once the user presses OK to pop up window, remove drawn objects from canvas
-                        line, inter_point1, inter_point2 = draw_move_scene(x2, y2, xt, yt, xs1, ys1,
-                                                                           xs2, ys2)
-                        show_coordinates_error(inter_point1, inter_point2, line)
-                        continue
+        # Joint move - Only check that (xt, yt) is reachable and draw the arc the arm edge follows
+        if joint:
+            if check_joint_move(l1, l2, xt, yt) != MOVE_VALID:
+                messagebox.showerror("Coordinates error",
+                                     "Move to provided coordinates is outside workspace. "
+                                     "Press OK to re enter values")
+            elif is_move_collision_free(l1, l2, direction, x2, y2, xt, yt, None, True):
+                print(f"Valid joint move to coordinate (xt, yt): {xt, yt}")
+                draw_joint_scene(direction, x2, y2, xt, yt, l1, l2)
+                return xt, yt, None
+            continue
+
+        # Check if the straight move to (xt, yt) is valid. If not re-enter input data
+        if instrumentation.enabled:
+            start = instrumentation.now()
+        status, xs1, ys1, xs2, ys2 = check_arm_move(l1, l2, x2, y2, xt, yt)
+        if instrumentation.enabled:
+            instrumentation.record("check_arm_move", start, instrumentation.now() - start, {"status": status})
+
+        if status == MOVE_VALID:
+            if not is_move_collision_free(l1, l2, direction, x2, y2, xt, yt, None):
+                continue
+
+            # Valid move - Draw the moving red line in canvas and return (xt, yt)
+            print(f"Valid move to coordinate (xt, yt): {xt, yt}")
+            draw_move_scene(x2, y2, xt, yt, None, None, None, None)
+            return xt, yt, None
+        elif status == MOVE_CROSSES_ORIGIN:
+            line, inter_point1, inter_point2 = draw_move_scene(x2, y2, xt, yt, None, None, None, None)
+            path = ask_detour_move(l1, l2, x2, y2, xt, yt, "Move to provided coordinates is crossing by (0, 0).",
+                                   direction)
+            clear_from_canvas(line)
+            if path is not None:
+                return xt, yt, path
+        elif status == MOVE_INTERSECTS_INNER_CIRCLE:
+            # Invalid straight move - Draw the moving line intersecting with the small internal circle
+            # Once the user answers the pop up window, remove drawn objects from canvas
+            line, inter_point1, inter_point2 = draw_move_scene(x2, y2, xt, yt, xs1, ys1, xs2, ys2)
+            path = ask_detour_move(l1, l2, x2, y2, xt, yt,
+                                   "Move to provided coordinates is not possible as for intersecting points.",
+                                   direction)
+            clear_from_canvas(line)
+            clear_from_canvas(inter_point1)
+            clear_from_canvas(inter_point2)
+            if path is not None:
+                return xt, yt, path
         else:
             messagebox.showerror("Coordinates error",
                                  "Move to provided coordinates is outside workspace. "
                                  "Press OK to re enter values")
-            continue
 
 
-def show_coordinates_error(inter_point1, inter_point2, line):
+def ask_detour_move(l1, l2, x2, y2, xt, yt, message, direction=1):
     """
-    Show message error to User. If User clicks OK clear line and intersection points from canvas
-    :param inter_point1: The small blue oval circle at (xs1, ys1)
-    :param inter_point2: The small blue oval circle at (xs2, ys2)
-    :param line: The red line connecting (x2, y2) with (xt, yt)
+    Offer the User the shortest detour around the internal circle for a blocked straight move
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param x2: The x coordinate of arm2
+    :param y2: The y coordinate of arm2
+    :param xt: The desired x coordinate to move to
+    :param yt: The desired y coordinate to move to
+    :param message: The message explaining why the straight move is blocked
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise, used for the obstacles
+    :return: The accepted PlannedPath, or None if the User prefers to re enter values
     """
-    if messagebox.showerror("Coordinates error",
-                            "Move to provided coordinates is not possible as for intersecting points. "
-                            "Press OK to re enter values"):
-        clear_from_canvas(line)
-        clear_from_canvas(inter_point1)
-        clear_from_canvas(inter_point2)
+    path = plan_detour_move(l1, l2, x2, y2, xt, yt)
+    if path is None:
+        messagebox.showerror("Coordinates error", message + " Press OK to re enter values")
+        return None
+
+    # Draw the detour and let the User decide - If declined, remove it from canvas
+    detour_line = draw_path_scene(path)
+    if messagebox.askyesno("Coordinates error", message + " Follow the shortest detour around the internal circle?"):
+        if not is_move_collision_free(l1, l2, direction, x2, y2, xt, yt, path):
+            clear_from_canvas(detour_line)
+            return None
+        print(f"Detour move to coordinate (xt, yt): {xt, yt} - Path length {path.length}")
+        return path
+
+    clear_from_canvas(detour_line)
+    return None
 
 
-def is_valid_arm_move_as_for_distances_check(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
+def is_move_collision_free(l1, l2, direction, x2, y2, xt, yt, path, joint=False):
     """
-    Check if an arm move is valid as for calculated distances between arm edge coordinates,
-    new desired coordinates, and the intersection points with the small round circle r
-    :param x2: The x2 coordinate of arm2
-    :param y2: The y2 coordinate of arm2
+    Check the arm links of a move against the obstacles, and show an error if one of them is hit
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The x coordinate of arm2
+    :param y2: The y coordinate of arm2
     :param xt: The desired x coordinate to move to
     :param yt: The desired y coordinate to move to
-    :param xs1: The x coordinate of intersection 1 with small round circle r
-    :param ys1: The y coordinate of intersection 1 with small round circle r
-    :param xs2: The x coordinate of intersection 2 with small round circle r
-    :param ys2: The y coordinate of intersection 2 with small round circle r
-    :return: Boolean True if move is valid or False if not
-    """
-    # Compute different distances between arm points and intersections
-    dis_2t = math.sqrt((yt - y2) ** 2 + (xt - x2) ** 2)
-    dis_2s1 = math.sqrt((ys1 - y2) ** 2 + (xs1 - x2) ** 2)
-    dis_2s2 = math.sqrt((ys2 - y2) ** 2 + (xs2 - x2) ** 2)
-    dis_ts1 = math.sqrt((ys1 - yt) ** 2 + (xs1 - xt) ** 2)
-    dis_ts2 = math.sqrt((ys2 - yt) ** 2 + (xs2 - xt) ** 2)
-
-    # Find min between dis_2s1 and dis_2s2
-    min_dis_2s = min(dis_2s1, dis_2s2)
-
-    # Find min between dis_ts1 and dis_ts2
-    min_dis_ts = min(dis_ts1, dis_ts2)
-
-    # Find max between min_dis_2s and min_dis_ts
-    max_dis = max(min_dis_2s, min_dis_ts)
-
-    # Compare max_dis to dis_2t
-    if max_dis > dis_2t:
-        # Valid move
+    :param path: The PlannedPath of a detour, None for the straight or joint move
+    :param joint: Boolean True for a joint space move
+    :return: Boolean True if there are no obstacles or the arm does not hit any of them
+    """
+    if obstacles is None:
         return True
-    else:
+
+    status, step, polygon = check_arm_move_obstacles(obstacles, direction, l1, l2, x2, y2, xt, yt, path=path,
+                                                     joint=joint)
+    if status == MOVE_COLLIDES_OBSTACLE:
+        messagebox.showerror("Collision error", f"The arm hits obstacle {polygon} at step {step} of the move. "
+                                                "Press OK to re enter values")
         return False
 
+    return True
+
+
+def draw_obstacles():
+    """
+    Draw the obstacles as gray polygons
+    """
+    get_viewport()
+    for polygon in obstacles.polygons:
+        points = []
+        for x, y in polygon.tolist():
+            points += viewport.to_canvas(x, y)
+        canvas.create_polygon(*points, fill="gray", outline="black")
+
+
+def draw_path_scene(path):
+    """
+    Draw in canvas a planned move path of the arm edge
+    :param path: The PlannedPath
+    :return: The drawn path line
+    """
+    # Enough points for a smooth arc, including the start point of the path
+    x, y = path.sample(100)
+    points = list(get_viewport().to_canvas(path.x2, path.y2))
+    for px, py in zip(x.tolist(), y.tolist()):
+        points += viewport.to_canvas(px, py)
+
+    return canvas.create_line(*points, fill="red")
+
+
+def draw_joint_scene(direction, x2, y2, xt, yt, l1, l2):
+    """
+    Draw in canvas the arc the arm edge follows in a joint space move
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The x2 coordinate of arm2
+    :param y2: The y2 coordinate of arm2
+    :param xt: The new xt coordinate of moving arm
+    :param yt: The new yt coordinate of moving arm
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :return: The drawn arc line
+    """
+    # Enough points for a smooth arc, the first pose is the start point
+    trajectory = plan_joint_move(direction, x2, y2, xt, yt, l1, l2, 100)
+    points = list(get_viewport().to_canvas(x2, y2))
+    for px, py in trajectory.poses[:, 2:].tolist():
+        points += viewport.to_canvas(px, py)
+
+    return canvas.create_line(*points, fill="red")
+
 
 def draw_move_scene(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
     """
@@ -462,24 +484,17 @@ def draw_move_scene(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
     :param ys2: The y2 intersection coordinate if defined. Otherwise, set None
     :return: The moving line and intersection points if any
     """
-    # Get actual center xy of canvas
-    center_x, center_y = get_center_xy()
-
     # Translate coordinates to canvas coordinates
-    canvas_x2 = center_x + x2
-    canvas_y2 = center_y - y2
-    canvas_xt = center_x + xt
-    canvas_yt = center_y - yt
+    canvas_x2, canvas_y2 = get_viewport().to_canvas(x2, y2)
+    canvas_xt, canvas_yt = viewport.to_canvas(xt, yt)
 
     # Draw the red line
     line = canvas.create_line(canvas_x2, canvas_y2, canvas_xt, canvas_yt, fill="red")
 
     if xs1 is not None:
         # Translate intersection coordinates to canvas coordinates
-        canvas_xs1 = center_x + xs1
-        canvas_ys1 = center_y - ys1
-        canvas_xs2 = center_x + xs2
-        canvas_ys2 = center_y - ys2
+        canvas_xs1, canvas_ys1 = viewport.to_canvas(xs1, ys1)
+        canvas_xs2, canvas_ys2 = viewport.to_canvas(xs2, ys2)
 
         # Draw small green circles at the intersection points
         intersection_radius = 3  # Radius of intersection point
@@ -503,15 +518,6 @@ def clear_from_canvas(item):
     canvas.delete(item)
 
 
-def print_arm1_coordinates(x1, x2):
-    """
-    Console print the arm1 coordinates
-    :param x1: The x1 coordinate of arm1
-    :param x2: The y1 coordinate of arm1
-    """
-    print(f"Coordinates (x1, y1): ({x1}, {x2})")
-
-
 def ask_int_number_input(message):
     """
     Pop-up to get an integer number by the user
@@ -528,7 +534,7 @@ def ask_int_number_input(message):
 
 def check_arm_lengths_fit_canvas(l1, l2):
     """
-    Check if the provided arm lengths fit the opened canvas created
+    Check if the provided arm lengths fit the opened canvas created, at the current zoom of the viewport
     :param l1: The arm length L1
     :param l2: The arm length L2
     :return: Boolean True if arm lengths fit canvas or False if not
@@ -537,89 +543,79 @@ def check_arm_lengths_fit_canvas(l1, l2):
     width, height = get_canvas_width_height()
 
     # Check if L1 and L2 are smaller than the canvas size when stretched
-    return (l1 + l2) <= width / 2 and (l1 + l2) <= height / 2
-
-
-def get_workspace_radius(l1, l2):
-    """
-    Calculate the external R and internal r radius for workspace
-    :param l1: The arm length L1
-    :param l2: The arm length L2
-    :return: A tuple (ext_r, int_r) representing the external and internal workspace radius accordingly
-    """
-    ext_r = l1 + l2
-    int_r = abs(l1 - l2)
-
-    return ext_r, int_r
-
-
-def atn2(x, y):
-    """
-    Angle of arm and axis OX in RAD - Copied from robotics lab notes
-    :param x: The x arm coordinate
-    :param y: The y arm coordinate
-    :return: The angle of arm in RAD
-    """
-    # if the value of X moves to infinity on the y-axis
-    if abs(x) < 0.0001:
-        if y > 0:  # 90o or P/2
-            return math.pi / 2
-        else:  # 270o - P/2
-            return 3 * math.pi / 2
-    else:  # x greater than 0.0001
-        if x > 0 and y >= 0:  # 1st quarter
-            return math.atan(y / x)
-        elif x > 0 > y:  # 4th quarter
-            return math.atan(y / x) + 2 * math.pi
-        else:
-            return math.atan(y / x) + math.pi
+    return check_arm_lengths_fit_size(l1 * viewport.scale, l2 * viewport.scale, width, height)
 
 
-def calculate_first_arm(x2, y2, l1, l2, direction):
+def animate_movement(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, steps, delay, path=None, recorder=None,
+                     joint_limits=None, joint=False):
     """
-    Calculate the movement of the arm1 (x1, y1) while arm2 takes a new position
-    :param x2: The updated x coordinate of arm2
-    :param y2: The updated y coordinate of arm2
-    :param l1: The fixed arm1 length L1
-    :param l2: The fixed arm2 length L2
+    Function to animate the movement of robotic arm across a specific defined path
     :param direction: The chosen direction from User - 1 for clockwise and 0 for counterclockwise
-    :return: A tuple (x1, y1) representing the updated coordinates of arm1
+    :param arm1: The robotic arm line 1
+    :param arm2: The robotic arm line 2
+    :param x1: The initial x coordinate of arm1
+    :param y1: The initial y coordinate of arm1
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate of robotic movement
+    :param yt: The final target y coordinate of robotic movement
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm1 length L2
+    :param steps: Number of steps for the animation
+    :param delay: Delay of movement for the animation - The move lasts steps * delay ms at up to 1000 / delay frames
+    per second, skipping steps if drawing falls behind
+    :param path: Optional PlannedPath to follow instead of the straight line to (xt, yt)
+    :param recorder: Optional TrajectoryRecorder every drawn pose is recorded to
+    :param joint_limits: Optional tuple (max_velocity, max_acceleration) of (shoulder, elbow) limits in RAD/s and
+    RAD/s^2. The steps are then timed by time_scaling.scale_trajectory, so that the move takes the shortest time
+    the joints allow instead of steps * delay ms
+    :param joint: Boolean True to interpolate the joint angles instead of moving the arm edge straight, if there is
+    no path
+    :return: A tuple (player, trajectory) - The move can be replayed without recomputation by
+    player.play_timed(trajectory, duration, fps). Both are None if the joint move has an end point outside workspace
     """
-    # Calculate the distance from the origin (0,0) to the second arm's endpoint
-    distance = math.sqrt(x2 ** 2 + y2 ** 2)
-
-    # Check if the point is reachable
-    if distance > l1 + l2 or distance < abs(l1 - l2):
-        return None, None  # The point is not reachable
-
-    # Angle between the line connecting origin (0,0) with the second arm's endpoint and X axis
-    angle_to_endpoint = math.atan2(y2, x2)
-
-    # Use the law of cosines to find the angle between the first arm
-    # and the line connecting origin (0,0) with second arm endpoint
-    cos_angle = (l1 ** 2 + distance ** 2 - l2 ** 2) / (2 * l1 * distance)
-    angle1 = math.acos(cos_angle)
+    # Define the center of the canvas
+    center_x, center_y = get_center_xy()
 
-    # Based on User's picked arm direction, the final angle between first arm and X axis will be either
-    # the subtraction of angle1 from angle_to_endpoint in case of counterclockwise
-    # Or the sum of angle1 and angle_to_endpoint in case of clockwise
-    if direction == 0:
-        # For counterclockwise
-        final_angle = angle_to_endpoint - angle1
+    # Compute the whole move up front, so that the animation only pushes stored coordinates to the canvas
+    if instrumentation.enabled:
+        start = instrumentation.now()
+    trajectory = plan_move(direction, x2, y2, xt, yt, l1, l2, steps, path, joint)
+    if trajectory is None:
+        # Joint move with an end point outside workspace - The arm stays where it is
+        messagebox.showerror("Coordinates error", "Move to provided coordinates is outside workspace.")
+        return None, None
+    if instrumentation.enabled:
+        instrumentation.record("ik_solve", start, instrumentation.now() - start, {"steps": len(trajectory)})
+
+    # Function to report the achieved animation timing once the move is finished
+    def print_animation_stats():
+        # An empty trajectory finishes at once, without a scheduler
+        if player.scheduler is None:
+            print("Animation: no frames, the move has no reachable step")
+            return
+        stats = player.scheduler.get_stats()
+        print(f"Animation: {stats['frames']} frames at {stats['fps']:.1f} FPS, {stats['skipped']} skipped, "
+              f"worst frame time {stats['worst_frame_time'] * 1000:.1f} ms")
+
+    # Start the animation - Resizing, zooming and panning the canvas update the frames still to draw
+    player = TrajectoryPlayer(canvas, arm1, arm2, center_x, center_y, recorder, viewport.scale)
+    set_move_listener(player.set_transform)
+    if joint_limits is not None and len(trajectory):
+        times = scale_trajectory(trajectory, *joint_limits, start_pose=(x1, y1, x2, y2))
+        print(f"Time optimal move: {times[-1]:.3f} s")
+        player.play_timed(trajectory, times[-1], 1000 / delay, print_animation_stats, times)
     else:
-        # For clockwise
-        final_angle = angle_to_endpoint + angle1
-
-    # Calculate the new (x1, y1) for the first arm
-    x1 = l1 * math.cos(final_angle)
-    y1 = l1 * math.sin(final_angle)
+        player.play_timed(trajectory, steps * delay / 1000, 1000 / delay, print_animation_stats)
 
-    return x1, y1
+    return player, trajectory
 
 
-def animate_movement(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, steps, delay):
+def animate_movement_in_process(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, steps, delay, path=None,
+                                recorder=None, joint_limits=None, joint=False):
     """
-    Function to animate the movement of robotic arm across a specific defined path
+    Same move as animate_movement, but computed in a worker process that writes the poses into a shared memory
+    PoseRing at the time each one is due. The GUI process only draws the newest pose of the ring every frame
     :param direction: The chosen direction from User - 1 for clockwise and 0 for counterclockwise
     :param arm1: The robotic arm line 1
     :param arm2: The robotic arm line 2
@@ -632,55 +628,184 @@ def animate_movement(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, step
     :param l1: The fixed arm1 length L1
     :param l2: The fixed arm1 length L2
     :param steps: Number of steps for the animation
-    :param delay: Delay of movement for the animation
+    :param delay: Delay of movement for the animation - The move lasts steps * delay ms, drawn at 1000 / delay frames
+    per second
+    :param path: Optional PlannedPath to follow instead of the straight line to (xt, yt)
+    :param recorder: Optional TrajectoryRecorder every drawn pose is recorded to
+    :param joint_limits: Optional tuple (max_velocity, max_acceleration) of (shoulder, elbow) limits, see
+    animate_movement
+    :param joint: Boolean True for a joint space move, see animate_movement
+    :return: A tuple (player, process) with the RingPlayer and the worker multiprocessing.Process
     """
-    # Define the center of the canvas
     center_x, center_y = get_center_xy()
 
-    # Calculate the increments for each animation step
-    dx = (xt - x2) / steps
-    dy = (yt - y2) / steps
+    ring = PoseRing(capacity=max(steps, 1024))
+    process = multiprocessing.Process(target=stream_move, daemon=True,
+                                      args=(ring.name, direction, x2, y2, xt, yt, l1, l2, steps, steps * delay / 1000,
+                                            path, joint_limits, (x1, y1, x2, y2), joint))
 
-    # Function to update the position of the arms
-    def update_position(step):
-        # Known variables - Coords change over the duration of animation
-        nonlocal x2, y2, x1, y1
+    # Function to report the ring counters and free the shared memory once the move is finished
+    def close_ring():
+        process.join()
+        stats = ring.get_stats()
+        print(f"Pose ring: {player.updates} poses drawn in {player.frames} frames, {stats['skipped']} passed over, "
+              f"{stats['overruns']} overruns, {stats['underruns']} underruns, "
+              f"worst latency {player.worst_latency * 1000:.1f} ms")
+        ring.close()
+        ring.unlink()
 
-        # Update the positions
-        x2 += dx
-        y2 += dy
+    player = RingPlayer(canvas, arm1, arm2, center_x, center_y, ring, recorder, viewport.scale)
+    set_move_listener(player.set_transform)
+    process.start()
+    player.play(1000 / delay, process.is_alive, close_ring)
 
-        # Calculate the new position for the first arm
-        new_x1, new_y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+    return player, process
 
-        if new_x1 is not None and new_y1 is not None:
-            x1, y1 = new_x1, new_y1
-            # Redraw the arms
-            canvas.coords(arm1, center_x, center_y, center_x + x1, center_y - y1)
-            canvas.coords(arm2, center_x + x1, center_y - y1, center_x + x2, center_y - y2)
-            # Continue the animation until the final position is reached
-            if step < steps:
-                canvas.after(delay, update_position, step+1)
 
-    # Start the animation
-    update_position(1)
+def get_user_chain_move_data(lengths, x, y):
+    """
+    Get new move coordinates (xt, yt) of the edge of an arm of any number of links from User, checked with
+    nlink.check_chain_move
+    :param lengths: The link lengths
+    :param x: The x coordinate of the edge
+    :param y: The y coordinate of the edge
+    :return: A tuple (xt, yt) of valid move coordinates
+    """
+    while True:
+        xt = ask_int_number_input("Give coordinate xt for new robotic move")
+        yt = ask_int_number_input("Give coordinate yt for new robotic move")
+
+        status, xs1, ys1, xs2, ys2 = check_chain_move(lengths, x, y, xt, yt)
+        if status == MOVE_VALID:
+            print(f"Valid move to coordinate (xt, yt): {xt, yt}")
+            draw_move_scene(x, y, xt, yt, None, None, None, None)
+            return xt, yt
+
+        if status == MOVE_INTERSECTS_INNER_CIRCLE:
+            # Show the blocked move line until the user answers the pop up window
+            items = [item for item in draw_move_scene(x, y, xt, yt, xs1, ys1, xs2, ys2) if item is not None]
+            messagebox.showerror("Coordinates error", "Move to provided coordinates is not possible as for "
+                                                      "intersecting points. Press OK to re enter values")
+            for item in items:
+                clear_from_canvas(item)
+        else:
+            messagebox.showerror("Coordinates error",
+                                 "Move to provided coordinates is outside workspace. "
+                                 "Press OK to re enter values")
+
+
+def animate_chain_movement(solver, links, x, y, xt, yt, steps, delay):
+    """
+    Animate a straight move of the edge of an arm of any number of links, as animate_movement does for 2 links
+    :param solver: The ChainIKSolver of the arm, at its current pose
+    :param links: The link lines, from draw_chain_arm
+    :param x: The initial x coordinate of the edge
+    :param y: The initial y coordinate of the edge
+    :param xt: The final target x coordinate of the edge
+    :param yt: The final target y coordinate of the edge
+    :param steps: Number of steps for the animation
+    :param delay: Delay of movement for the animation - The move lasts steps * delay ms
+    :return: A tuple (player, trajectory) with the ChainPlayer and the ChainTrajectory of the move
+    """
+    center_x, center_y = get_center_xy()
+    trajectory = plan_chain_move(solver, x, y, xt, yt, steps)
+
+    player = ChainPlayer(canvas, links, center_x, center_y, viewport.scale)
+    set_move_listener(player.set_transform)
+    player.play_timed(trajectory, steps * delay / 1000, 1000 / delay)
+
+    return player, trajectory
+
+
+def run_chain_system(lengths):
+    """
+    Run the project tasks for an arm of any number of links - The link lengths are given instead of L1 and L2, the
+    workspace is the ring of nlink.get_chain_workspace_radius and the moves are straight moves of the edge
+    :param lengths: The link lengths, from the base to the edge
+    """
+    l1, l2 = get_equivalent_arm_lengths(lengths)
+    if not check_arm_lengths_fit_canvas(l1, l2):
+        get_viewport().fit(l1 + l2)
+    print(f"Link lengths: {lengths}")
+
+    direction = get_arm_direction_input()
+    x, y = get_arm2_coordinates(l1, l2)
+
+    draw_axes()
+    draw_workspace_circles(l1, l2)
+
+    solver = ChainIKSolver(lengths, direction)
+    links, ovals = draw_chain_arm(solver.solve(x, y))
+
+    xt, yt = get_user_chain_move_data(lengths, x, y)
+    for oval in ovals:
+        clear_from_canvas(oval)
+    root.after(2000, lambda: animate_chain_movement(solver, links, x, y, xt, yt, 300, 10))
+
+    root.mainloop()
 
 
 def get_center_xy():
     """
-    Calculate the center x,y to be the ones of the middle of the canvas
+    Calculate the center x,y to be the ones of the middle of the canvas, moved by the viewport pan
     :return: A tuple (center_x, center_y) representing the actual center x,y (0, 0)
     """
-    width, height = get_canvas_width_height()
-    center_x, center_y = width // 2, height // 2
-
-    return center_x, center_y
+    return get_viewport().get_center_xy()
 
 
 def run_robotic_system():
     """
     The function to run step by step the given project tasks for robotic system
     """
+    global root, canvas, obstacles
+
+    # Opt-in instrumentation - Set ROBOTICS_TRACE to a file path to get a Chrome trace of the session
+    trace_path = os.environ.get("ROBOTICS_TRACE")
+    if trace_path:
+        instrumentation.enable()
+
+    # Opt-in recording - Set ROBOTICS_RECORD to a file path to record all poses of the session, see recording.py
+    record_path = os.environ.get("ROBOTICS_RECORD")
+
+    # Optional joint limits - Set ROBOTICS_JOINT_LIMITS to "shoulder_velocity,elbow_velocity,shoulder_acceleration,
+    # elbow_acceleration" in RAD/s and RAD/s^2 to time the moves as fast as the joints allow, see time_scaling.py
+    joint_limits = None
+    limits = os.environ.get("ROBOTICS_JOINT_LIMITS")
+    if limits:
+        shoulder_velocity, elbow_velocity, shoulder_acceleration, elbow_acceleration = map(float, limits.split(","))
+        joint_limits = ((shoulder_velocity, elbow_velocity), (shoulder_acceleration, elbow_acceleration))
+
+    # Optional solver process - Set ROBOTICS_SOLVER_PROCESS to 1 to compute the moves in a worker process that hands
+    # the poses to the GUI through shared memory, see pose_ring.py
+    animate = animate_movement_in_process if os.environ.get("ROBOTICS_SOLVER_PROCESS") == "1" else animate_movement
+
+    # Optional target following - Set ROBOTICS_FOLLOW to a frame rate, e.g. 120, to drag the arm edge with the mouse
+    # instead of entering the moves in dialogs, see target_follow.py
+    follow_fps = os.environ.get("ROBOTICS_FOLLOW")
+
+    # Optional joint moves - Set ROBOTICS_JOINT_MOVES to 1 to interpolate the joint angles of the moves instead of
+    # moving the arm edge on a straight line, see trajectory.plan_joint_move
+    joint = os.environ.get("ROBOTICS_JOINT_MOVES") == "1"
+
+    # Optional obstacles - Set ROBOTICS_OBSTACLES to a JSON file with a list of polygons, see obstacles.py
+    obstacles_path = os.environ.get("ROBOTICS_OBSTACLES")
+    if obstacles_path:
+        obstacles = load_obstacles(obstacles_path)
+
+    # Create the root and canvas on first use - All GUI calculations are based on them
+    if canvas is None:
+        root, canvas = create_root_and_canvas()
+
+    # Zoom with the mouse wheel and pan with the right mouse button
+    get_viewport().bind_mouse()
+
+    # Optional N-link arm - Set ROBOTICS_CHAIN to the comma separated link lengths, e.g. "100,60,50", to move an arm of
+    # any number of links instead of entering L1 and L2, see nlink.py. The other options only apply to 2 links
+    chain = os.environ.get("ROBOTICS_CHAIN")
+    if chain:
+        run_chain_system([float(length) for length in chain.split(",")])
+        return
+
     # 1st Task: Ask user for input data L1, L2, Direction, (x2, y2)
     l1, l2, direction, x2, y2 = get_user_input_data()
 
@@ -689,31 +814,87 @@ def run_robotic_system():
 
     # 3rd Task: Draw the workspace internal and external circles
     draw_workspace_circles(l1, l2)
+    if obstacles is not None:
+        draw_obstacles()
 
     # 4th Task: Calculate (x1a,y1a) & (x1b,y1b) pairs of solutions
+    if instrumentation.enabled:
+        start = instrumentation.now()
     x1a, y1a, x1b, y1b = get_arm1_coords(l1, l2, x2, y2)
+    if instrumentation.enabled:
+        instrumentation.record("ik_solve", start, instrumentation.now() - start, {"steps": 1})
 
     # 5th Task: Pick proper arm1 coordinate solution according to picked arm direction
     # and print robotic arm in canvas
     x1, y1 = get_single_arm1_coords_from_direction(x2, y2, x1a, y1a, x1b, y1b, direction)
     arm1, arm2, oval1, oval2 = draw_robotic_arm(x1, y1, x2, y2)
 
-    # 6th Task: Ask user for input data (xt, yt) for straight valid robotic arm move
-    xt, yt = get_user_move_arm_data(l1, l2, x2, y2)
-
-    # 7th Task: Animate robotic arm movement - Apply some initial delay in animation to give time to observe move path
-    # At the same time clear some previous defined points as not needed in movement animation
-    clear_from_canvas(oval1)
-    clear_from_canvas(oval2)
-    root.after(2000, lambda: animate_movement(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, 300, 10))
+    recorder = None
+    if record_path:
+        recorder = TrajectoryRecorder(record_path, l1, l2, direction)
+        recorder.record(x1, y1, x2, y2)
+
+    renderer = None
+    if follow_fps:
+        # Follow the mouse while it is dragged on the canvas, the targets are solved off the Tk thread
+        clear_from_canvas(oval1)
+        clear_from_canvas(oval2)
+        center_x, center_y = get_center_xy()
+        follower = TargetFollower(l1, l2, direction, x2, y2)
+        renderer = FollowRenderer(canvas, arm1, arm2, center_x, center_y, follower, float(follow_fps), recorder,
+                                  viewport.scale)
+        set_move_listener(renderer.set_transform)
+        renderer.bind_mouse()
+        renderer.start()
+    else:
+        # 6th Task: Ask user for input data (xt, yt) for straight valid robotic arm move
+        xt, yt, path = get_user_move_arm_data(l1, l2, x2, y2, direction, joint)
+        if recorder is not None:
+            recorder.record(*calculate_first_arm(xt, yt, l1, l2, direction), xt, yt, RECORD_TARGET)
+
+        # 7th Task: Animate robotic arm movement - Apply some initial delay in animation to give time to observe move
+        # path. At the same time clear some previous defined points as not needed in movement animation
+        clear_from_canvas(oval1)
+        clear_from_canvas(oval2)
+        root.after(2000, lambda: animate(direction, arm1, arm2, x1, y1, x2, y2, xt, yt, l1, l2, 300, 10, path,
+                                         recorder, joint_limits, joint))
 
     root.mainloop()
 
+    if renderer is not None:
+        renderer.stop()
+        stats = renderer.get_stats()
+        print(f"Target following: {stats['updates']} updates in {stats['frames']} frames at {stats['fps']:.1f} FPS, "
+              f"{stats['dropped_targets'] + stats['dropped_results']} stale targets dropped, "
+              f"{stats['rejected']} rejected, latency p50 < {stats['latency']['p50_us']} us, "
+              f"p99 < {stats['latency']['p99_us']} us")
+
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.count} poses to {record_path}")
+
+    if trace_path:
+        instrumentation.write_chrome_trace(trace_path)
+        instrumentation.print_stats()
+
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
-    # Init create a root and canvas - This will be needed to base our calculations on it
-    root, canvas = create_root_and_canvas()
+    parser = argparse.ArgumentParser(description="2D robotic arm system")
+    parser.add_argument("--scenarios", help="Run the scenarios of this file (.jsonl, .json, .csv or - for stdin) "
+                                            "without the GUI, see scenario_runner.py")
+    parser.add_argument("--output", default="-", help="Result JSON Lines file of --scenarios, - for stdout")
+    args = parser.parse_args()
+
+    if args.scenarios:
+        # Non-interactive mode - Same checks and IK as the dialogs, no display needed
+        from scenario_runner import run_scenario_file
+        summary = run_scenario_file(args.scenarios, args.output)
+        print(f"{summary['scenarios']} scenarios ({summary['invalid']} invalid), "
+              f"{summary['done']}/{summary['moves']} moves done in {summary['elapsed']:.1f} s", file=sys.stderr)
+    else:
+        # Init create a root and canvas - This will be needed to base our calculations on it
+        root, canvas = create_root_and_canvas()
 
-    # Ready to run all given tasks for robotic system
-    run_robotic_system()
+        # Ready to run all given tasks for robotic system
+        run_robotic_system()
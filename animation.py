@@ -0,0 +1,421 @@
+import bisect
+import math
+import time
+
+import instrumentation
+from pose_ring import FLAG_LAST
+
+
+class FrameScheduler:
+    """
+    Drive an animation of a fixed duration from a monotonic clock. Every tick draws the frame for the current time,
+    so timer drift or slow frames do not stretch the animation - frames that are already late are skipped instead
+    """
+
+    def __init__(self, widget, duration, fps, draw_frame, on_done=None, clock=time.monotonic):
+        """
+        :param widget: Any tkinter widget, used for its after and after_cancel methods
+        :param duration: The duration of the animation in seconds
+        :param fps: The target frame rate
+        :param draw_frame: Function called with the animation progress in [0, 1] to draw a frame
+        :param on_done: Optional function called without arguments after the last frame
+        :param clock: Function returning the current time in seconds
+        """
+        self.widget = widget
+        self.duration = duration
+        self.fps = fps
+        self.draw_frame = draw_frame
+        self.on_done = on_done
+        self.clock = clock
+
+        self.frames = 0
+        self.skipped = 0
+        self.worst_frame_time = 0.0
+
+        self._start_time = None
+        self._last_frame = -1
+        self._last_draw_time = None
+        self._end_time = None
+        self._after_id = None
+        self._expected_time = None
+
+    def start(self):
+        """
+        Start the animation from its beginning
+        """
+        self.stop()
+
+        self.frames = 0
+        self.skipped = 0
+        self.worst_frame_time = 0.0
+        self._last_frame = -1
+        self._last_draw_time = None
+        self._end_time = None
+        self._start_time = self.clock()
+
+        self._tick()
+
+    def stop(self):
+        """
+        Stop a running animation, leaving its last drawn frame on screen
+        """
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def is_running(self):
+        """
+        :return: Boolean True if the animation is waiting for its next frame
+        """
+        return self._after_id is not None
+
+    def get_stats(self):
+        """
+        :return: A dict with the drawn and skipped frames, the achieved fps and the worst time between two frames in
+        seconds
+        """
+        end_time = self._end_time if self._end_time is not None else self.clock()
+        elapsed = end_time - self._start_time if self._start_time is not None else 0.0
+
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "worst_frame_time": self.worst_frame_time,
+            "elapsed": elapsed,
+        }
+
+    def _tick(self):
+        self._after_id = None
+        now = self.clock()
+        elapsed = now - self._start_time
+
+        if instrumentation.enabled:
+            tick_start = instrumentation.now()
+            if self._expected_time is not None:
+                # How late the after callback fired compared to the requested delay
+                lag = max(0.0, now - self._expected_time)
+                instrumentation.record("after_lag", tick_start - lag, lag)
+
+        # Frames whose time has already passed are not drawn
+        frame = int(elapsed * self.fps)
+        if frame > self._last_frame + 1:
+            self.skipped += frame - self._last_frame - 1
+        self._last_frame = frame
+
+        if self._last_draw_time is not None:
+            self.worst_frame_time = max(self.worst_frame_time, now - self._last_draw_time)
+        self._last_draw_time = now
+
+        progress = min(elapsed / self.duration, 1.0) if self.duration > 0 else 1.0
+        self.draw_frame(progress)
+        self.frames += 1
+
+        if instrumentation.enabled:
+            instrumentation.record("frame", tick_start, instrumentation.now() - tick_start,
+                                   {"frame": frame, "progress": progress})
+
+        if progress >= 1.0:
+            self._end_time = now
+            if self.on_done is not None:
+                self.on_done()
+            return
+
+        # Wake up at the start of the next frame, but not after the end of the animation
+        next_time = self._start_time + min((frame + 1) / self.fps, self.duration)
+        delay = max(0, math.ceil((next_time - self.clock()) * 1000))
+        self._expected_time = self.clock() + delay / 1000
+        self._after_id = self.widget.after(delay, self._tick)
+
+
+class TrajectoryPlayer:
+    """
+    Animate the robotic arm lines along a precomputed Trajectory. Every frame only pushes stored canvas coordinates
+    into canvas.coords, no kinematics are computed while the animation runs. Trajectories can be played either one
+    step per timer callback (play) or against the clock for a fixed duration (play_timed)
+    """
+
+    def __init__(self, canvas, arm1, arm2, center_x, center_y, recorder=None, scale=1.0):
+        """
+        :param canvas: The canvas the arm is drawn on
+        :param arm1: The robotic arm line 1
+        :param arm2: The robotic arm line 2
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param recorder: Optional TrajectoryRecorder every pose is recorded to. Steps skipped by play_timed are
+        recorded with the frame that passes over them, so the recording holds every step of the trajectory
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.canvas = canvas
+        self.arm1 = arm1
+        self.arm2 = arm2
+        # The link lines from the base to the edge, the frames hold the end point of every link
+        self.links = [arm1, arm2]
+        self.center_x = center_x
+        self.center_y = center_y
+        self.scale = scale
+        self.recorder = recorder
+
+        self._trajectory = None
+        self._poses = []
+        self._frames = []
+        self._times = None
+        self._index = 0
+        # Index of the next pose to record
+        self._recorded = 0
+        self._delay = 0
+        self._after_id = None
+        self._on_done = None
+        self.scheduler = None
+
+    def is_playing(self):
+        """
+        :return: Boolean True if an animation is currently running
+        """
+        return self._after_id is not None or (self.scheduler is not None and self.scheduler.is_running())
+
+    def play(self, trajectory, delay, on_done=None):
+        """
+        Start animating the given trajectory. A running animation is stopped first.
+        The same trajectory can be played again later without being recomputed
+        :param trajectory: The Trajectory to animate
+        :param delay: Delay in ms between two frames
+        :param on_done: Optional function called without arguments once the last frame is drawn
+        """
+        self.stop()
+
+        self._load(trajectory, None)
+        self._index = 0
+        self._delay = delay
+        self._on_done = on_done
+
+        self._show_next_frame()
+
+    def play_timed(self, trajectory, duration, fps, on_done=None, times=None):
+        """
+        Animate the given trajectory in `duration` seconds, drawing the step for the current time at up to `fps`
+        frames per second. Steps are skipped when drawing falls behind. A running animation is stopped first
+        :param trajectory: The Trajectory to animate
+        :param duration: The duration of the move in seconds
+        :param fps: The target frame rate
+        :param on_done: Optional function called without arguments once the last step is drawn
+        :param times: Optional increasing sequence with the time in seconds of every step, e.g. from a recording.
+        By default the steps are evenly spread over the duration
+        :return: The FrameScheduler running the animation, which holds the achieved frame statistics
+        """
+        self.stop()
+
+        self._load(trajectory, times)
+        if not self._frames:
+            if on_done is not None:
+                on_done()
+            return None
+
+        self._on_done = on_done
+        self.scheduler = FrameScheduler(self.canvas, duration, fps, self._show_progress, self._finish)
+        self.scheduler.start()
+        return self.scheduler
+
+    def set_transform(self, center_x, center_y, scale):
+        """
+        Continue with a new world to canvas transform, e.g. as a Viewport listener. The drawn arm is already moved by
+        the viewport, only the frames still to draw are translated again
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.center_x, self.center_y, self.scale = center_x, center_y, scale
+        if self._trajectory is not None:
+            self._frames = self._trajectory.get_canvas_frames(center_x, center_y, scale)
+
+    def stop(self):
+        """
+        Stop a running animation, leaving the arm at its current frame
+        """
+        if self._after_id is not None:
+            self.canvas.after_cancel(self._after_id)
+            self._after_id = None
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+    def _load(self, trajectory, times):
+        self._trajectory = trajectory
+        self._poses = trajectory.poses.tolist() if self.recorder is not None else []
+        self._frames = trajectory.get_canvas_frames(self.center_x, self.center_y, self.scale)
+        self._times = None if times is None else list(times)
+        self._recorded = 0
+
+    def _show_progress(self, progress):
+        if self._times is None:
+            # The first step is shown at the start and the last one at the end of the move
+            index = round(progress * (len(self._frames) - 1))
+        else:
+            # The last step whose time has come
+            index = max(bisect.bisect_right(self._times, progress * self.scheduler.duration) - 1, 0)
+        self._show_frame(index)
+
+    def _show_next_frame(self):
+        self._after_id = None
+
+        if self._index >= len(self._frames):
+            self._finish()
+            return
+
+        self._show_frame(self._index)
+        self._index += 1
+
+        # Continue the animation until the final position is reached
+        if self._index < len(self._frames):
+            self._after_id = self.canvas.after(self._delay, self._show_next_frame)
+        else:
+            self._finish()
+
+    def _finish(self):
+        # The trajectory is only needed while playing, play and play_timed load it again
+        self._trajectory = None
+        self._poses = []
+        self._frames = []
+        self._times = None
+        if self._on_done is not None:
+            self._on_done()
+
+    def _show_frame(self, index):
+        frame = self._frames[index]
+
+        if instrumentation.enabled:
+            start = instrumentation.now()
+
+        # Redraw the arms, every link starts where the previous one ends
+        canvas_x, canvas_y = self.center_x, self.center_y
+        for link, i in zip(self.links, range(0, len(frame), 2)):
+            self.canvas.coords(link, canvas_x, canvas_y, frame[i], frame[i + 1])
+            canvas_x, canvas_y = frame[i], frame[i + 1]
+
+        if instrumentation.enabled:
+            instrumentation.record("canvas.coords", start, instrumentation.now() - start)
+
+        if self.recorder is not None:
+            # Also record the steps skipped since the last frame, the trajectory only moves forward
+            for pose in self._poses[self._recorded:index + 1]:
+                self.recorder.record(*pose)
+            self._recorded = max(self._recorded, index + 1)
+
+
+class ChainPlayer(TrajectoryPlayer):
+    """
+    TrajectoryPlayer for arms of any number of links, animating a ChainTrajectory from nlink.py
+    """
+
+    def __init__(self, canvas, links, center_x, center_y, scale=1.0):
+        """
+        :param canvas: The canvas the arm is drawn on
+        :param links: The list of link lines, from the base to the edge
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit
+        """
+        super().__init__(canvas, links[0], links[1], center_x, center_y, scale=scale)
+        self.links = list(links)
+
+
+class RingPlayer:
+    """
+    Draw the arm poses a worker process writes into a PoseRing. Every frame draws the newest pose of the ring and
+    passes over the older ones, so the GUI process only renders and never waits for the solver
+    """
+
+    def __init__(self, canvas, arm1, arm2, center_x, center_y, ring, recorder=None, scale=1.0):
+        """
+        :param canvas: The canvas the arm is drawn on
+        :param arm1: The robotic arm line 1
+        :param arm2: The robotic arm line 2
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param ring: The PoseRing to read, this player is its only consumer
+        :param recorder: Optional TrajectoryRecorder every pose is recorded to. Steps skipped by play_timed are
+        recorded with the frame that passes over them, so the recording holds every step of the trajectory
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.canvas = canvas
+        self.arm1 = arm1
+        self.arm2 = arm2
+        self.center_x = center_x
+        self.center_y = center_y
+        self.scale = scale
+        self.ring = ring
+        self.recorder = recorder
+
+        self.frames = 0
+        self.updates = 0
+        # Largest time from writing a pose in the worker to drawing it, both measured with time.monotonic
+        self.worst_latency = 0.0
+
+        self._delay = 0
+        self._is_producer_alive = None
+        self._on_done = None
+        self._after_id = None
+
+    def play(self, fps, is_producer_alive, on_done=None):
+        """
+        Start drawing the ring, until a pose flagged FLAG_LAST is drawn or the producer stopped without one
+        :param fps: The frame rate
+        :param is_producer_alive: Function returning False once the producer will not write anymore, e.g. the
+        is_alive method of its multiprocessing.Process
+        :param on_done: Optional function called without arguments after the last pose
+        """
+        self.stop()
+
+        self._delay = max(1, round(1000 / fps))
+        self._is_producer_alive = is_producer_alive
+        self._on_done = on_done
+        self._tick()
+
+    def set_transform(self, center_x, center_y, scale):
+        """
+        Draw the next poses with a new world to canvas transform, e.g. as a Viewport listener
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.center_x, self.center_y, self.scale = center_x, center_y, scale
+
+    def stop(self):
+        """
+        Stop drawing, leaving the arm at its current pose
+        """
+        if self._after_id is not None:
+            self.canvas.after_cancel(self._after_id)
+            self._after_id = None
+
+    def is_playing(self):
+        """
+        :return: Boolean True if the player is waiting for its next frame
+        """
+        return self._after_id is not None
+
+    def _tick(self):
+        self._after_id = None
+        # Checked before reading, so that a pose written just before the producer stopped is still drawn
+        producer_alive = self._is_producer_alive()
+
+        record = self.ring.read_latest()
+        self.frames += 1
+        if record is not None:
+            pose_time, x1, y1, x2, y2, _, flags = record
+            canvas_x1 = self.center_x + x1 * self.scale
+            canvas_y1 = self.center_y - y1 * self.scale
+            self.canvas.coords(self.arm1, self.center_x, self.center_y, canvas_x1, canvas_y1)
+            self.canvas.coords(self.arm2, canvas_x1, canvas_y1,
+                               self.center_x + x2 * self.scale, self.center_y - y2 * self.scale)
+
+            self.updates += 1
+            self.worst_latency = max(self.worst_latency, time.monotonic() - pose_time)
+            if self.recorder is not None:
+                self.recorder.record(x1, y1, x2, y2)
+
+        if (record is not None and record[6] & FLAG_LAST) or (record is None and not producer_alive):
+            if self._on_done is not None:
+                self._on_done()
+            return
+
+        self._after_id = self.canvas.after(self._delay, self._tick)
@@ -0,0 +1,544 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+
+from animation import TrajectoryPlayer
+from differential_ik import DifferentialIKSolver
+from fleet import FleetRenderer, create_random_fleet, retarget_fleet
+from kinematics import (atn2, calculate_first_arm, check_arm_move, get_arm1_coords,
+                        get_single_arm1_coords_from_direction, iterate_arm_move)
+from kinematics_batch import atn2_batch, calculate_first_arm_batch, check_arm_moves_batch, solve_arm_batch
+from nlink import ChainIKSolver, get_chain_workspace_radius
+from time_scaling import get_joint_rates, get_trajectory_joint_angles, time_optimal_scaling
+from trajectory import plan_joint_move, plan_straight_move
+
+# Arm lengths used by all benchmarks
+BENCH_L1 = 100
+BENCH_L2 = 60
+
+# Smallest accepted speedup of the batch kinematics over a loop of the scalar functions they replace
+BATCH_MIN_SPEEDUP = 50
+
+# Largest accepted time of one ChainIKSolver solve for up to 6 links, in seconds
+CHAIN_MAX_SOLVE_TIME = 1e-3
+
+# Fleet size and smallest accepted frame rate of the fleet benchmark
+FLEET_ARMS = 200
+FLEET_MIN_FPS = 30
+
+# Batch benchmarks and the scalar benchmarks whose per point times add up to the loop the batch function replaces
+BATCH_SCALAR_LOOPS = {
+    "solve_arm_batch": ("get_arm1_coords", "get_single_arm1_coords_from_direction"),
+    "calculate_first_arm_batch": ("calculate_first_arm",),
+}
+
+
+def generate_targets(distribution, count, l1, l2, rng):
+    """
+    Generate arm edge targets inside workspace
+    :param distribution: "uniform" for targets spread evenly over the workspace area, "boundary" for targets close
+    to the internal and external circles, or "stations" for a few targets repeated many times
+    :param count: Number of targets
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param rng: The numpy random generator
+    :return: A tuple (x, y) of arrays
+    """
+    ext_r, int_r = l1 + l2, abs(l1 - l2)
+    margin = 1e-6 * ext_r
+
+    if distribution == "uniform":
+        radius = np.sqrt(rng.uniform((int_r + margin) ** 2, (ext_r - margin) ** 2, count))
+    elif distribution == "boundary":
+        near_inner = rng.random(count) < 0.5
+        offset = rng.uniform(margin, 0.01 * ext_r, count)
+        radius = np.where(near_inner, int_r + offset, ext_r - offset)
+    elif distribution == "stations":
+        x, y = generate_targets("uniform", 8, l1, l2, rng)
+        picks = rng.integers(0, 8, count)
+        return x[picks], y[picks]
+    else:
+        raise ValueError(f"Unknown distribution {distribution}")
+
+    angle = rng.uniform(0, 2 * math.pi, count)
+    return radius * np.cos(angle), radius * np.sin(angle)
+
+
+def summarize(name, kind, distribution, ops_per_sample, samples):
+    """
+    Build the result record of one benchmark
+    :param name: The benchmark name
+    :param kind: "scalar", "batch" or "frame"
+    :param distribution: The target distribution
+    :param ops_per_sample: Number of operations timed by every sample
+    :param samples: List of sample durations in seconds
+    :return: A dict with ops/sec and per operation latency percentiles in ns
+    """
+    samples = np.asarray(samples)
+    per_op_ns = samples / ops_per_sample * 1e9
+
+    return {
+        "name": name,
+        "kind": kind,
+        "distribution": distribution,
+        "ops_per_sample": ops_per_sample,
+        "samples": len(samples),
+        "ops_per_sec": ops_per_sample * len(samples) / samples.sum(),
+        "latency_ns": {
+            "p50": float(np.percentile(per_op_ns, 50)),
+            "p90": float(np.percentile(per_op_ns, 90)),
+            "p99": float(np.percentile(per_op_ns, 99)),
+            "max": float(per_op_ns.max()),
+        },
+    }
+
+
+def time_scalar(function, args_list, group):
+    """
+    Time a scalar function over a list of argument tuples, in groups of calls to keep the timer overhead low
+    :param function: The function to call
+    :param args_list: List of argument tuples, one per call
+    :param group: Number of calls per timed sample
+    :return: List of sample durations in seconds
+    """
+    samples = []
+    for start in range(0, len(args_list) - group + 1, group):
+        chunk = args_list[start:start + group]
+        begin = time.perf_counter()
+        for args in chunk:
+            function(*args)
+        samples.append(time.perf_counter() - begin)
+
+    return samples
+
+
+def time_batch(function, repeat):
+    """
+    Time a batch function call
+    :param function: The function to call without arguments
+    :param repeat: Number of timed calls
+    :return: List of call durations in seconds
+    """
+    function()  # Warm up
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - begin)
+
+    return samples
+
+
+def get_ik_args(x, y, direction):
+    # Pair every target with its two arm1 solutions, as get_single_arm1_coords_from_direction needs them
+    return [(x2, y2, *get_arm1_coords(BENCH_L1, BENCH_L2, x2, y2, verbose=False), direction)
+            for x2, y2 in zip(x.tolist(), y.tolist())]
+
+
+def run_kinematics_benchmarks(scalar_count, batch_count, repeat, group, rng):
+    """
+    Benchmark the scalar and batch kinematics functions on every target distribution
+    :return: List of result records
+    """
+    results = []
+
+    for distribution in ("uniform", "boundary", "stations"):
+        x, y = generate_targets(distribution, scalar_count, BENCH_L1, BENCH_L2, rng)
+        xt, yt = generate_targets(distribution, scalar_count, BENCH_L1, BENCH_L2, rng)
+        points = list(zip(x.tolist(), y.tolist()))
+        moves = list(zip(x.tolist(), y.tolist(), xt.tolist(), yt.tolist()))
+
+        scalar_cases = [
+            ("get_arm1_coords", lambda x2, y2: get_arm1_coords(BENCH_L1, BENCH_L2, x2, y2, verbose=False), points),
+            ("calculate_first_arm", lambda x2, y2: calculate_first_arm(x2, y2, BENCH_L1, BENCH_L2, 1), points),
+            ("atn2", atn2, points),
+            ("math.atan2", lambda x2, y2: math.atan2(y2, x2), points),
+            ("get_single_arm1_coords_from_direction",
+             lambda *args: get_single_arm1_coords_from_direction(*args, verbose=False), get_ik_args(x, y, 1)),
+            ("check_arm_move", lambda *move: check_arm_move(BENCH_L1, BENCH_L2, *move), moves),
+        ]
+        for name, function, args_list in scalar_cases:
+            samples = time_scalar(function, args_list, group)
+            results.append(summarize(name, "scalar", distribution, group, samples))
+
+        bx, by = generate_targets(distribution, batch_count, BENCH_L1, BENCH_L2, rng)
+        btx, bty = generate_targets(distribution, batch_count, BENCH_L1, BENCH_L2, rng)
+
+        batch_cases = [
+            ("solve_arm_batch", lambda: solve_arm_batch(BENCH_L1, BENCH_L2, bx, by, 1)),
+            ("calculate_first_arm_batch", lambda: calculate_first_arm_batch(bx, by, BENCH_L1, BENCH_L2, 1)),
+            ("atn2_batch", lambda: atn2_batch(bx, by)),
+            ("numpy.arctan2", lambda: np.arctan2(by, bx)),
+            ("check_arm_moves_batch", lambda: check_arm_moves_batch(BENCH_L1, BENCH_L2, bx, by, btx, bty)),
+        ]
+        for name, function in batch_cases:
+            results.append(summarize(name, "batch", distribution, batch_count, time_batch(function, repeat)))
+
+    return results
+
+
+class StubCanvas:
+    """
+    Canvas replacement for benchmarking the animation path without a display. Calls are accepted and dropped,
+    after callbacks are kept so that the benchmark can run them itself
+    """
+
+    def __init__(self):
+        self.pending = []
+
+    def coords(self, item, *args):
+        pass
+
+    def create_line(self, *args, **kwargs):
+        return 0
+
+    def after(self, delay, callback, *args):
+        self.pending.append((callback, args))
+        return len(self.pending)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def time_frames(canvas, start):
+    """
+    Start an animation on the stub canvas and time every frame callback
+    :param canvas: The StubCanvas
+    :param start: Function starting the animation, which draws the first frame
+    :return: List of frame durations in seconds
+    """
+    begin = time.perf_counter()
+    start()
+    samples = [time.perf_counter() - begin]
+
+    while canvas.pending:
+        callback, args = canvas.pending.pop(0)
+        begin = time.perf_counter()
+        callback(*args)
+        samples.append(time.perf_counter() - begin)
+
+    return samples
+
+
+def run_frame_benchmarks(steps, repeat):
+    """
+    Benchmark the per frame cost of the animation path on a stub canvas, both computing IK on every frame as the
+    original animate_movement did, and replaying a precomputed trajectory
+    :return: List of result records
+    """
+    results = []
+    move = (1, 150, 20, -60, 120, BENCH_L1, BENCH_L2, steps)
+
+    legacy_samples = []
+    replay_samples = []
+    plan_samples = []
+    joint_plan_samples = []
+    for _ in range(repeat):
+        canvas = StubCanvas()
+
+        def start_legacy():
+            poses = iterate_arm_move(*move)
+
+            def update_position():
+                pose = next(poses, None)
+                if pose is not None:
+                    x1, y1, x2, y2 = pose
+                    canvas.coords(1, 0, 0, x1, -y1)
+                    canvas.coords(2, x1, -y1, x2, -y2)
+                    canvas.after(10, update_position)
+
+            update_position()
+
+        legacy_samples += time_frames(canvas, start_legacy)
+
+        begin = time.perf_counter()
+        trajectory = plan_straight_move(*move)
+        plan_samples.append(time.perf_counter() - begin)
+
+        begin = time.perf_counter()
+        plan_joint_move(*move)
+        joint_plan_samples.append(time.perf_counter() - begin)
+
+        player = TrajectoryPlayer(canvas, 1, 2, 400, 300)
+        replay_samples += time_frames(canvas, lambda: player.play(trajectory, 10))
+
+    results.append(summarize("animate_movement_ik_per_frame", "frame", "straight_move", 1, legacy_samples))
+    results.append(summarize("trajectory_player_frame", "frame", "straight_move", 1, replay_samples))
+    results.append(summarize("plan_straight_move", "batch", "straight_move", steps, plan_samples))
+    results.append(summarize("plan_joint_move", "batch", "straight_move", steps, joint_plan_samples))
+
+    return results
+
+
+def run_dense_path_benchmarks(count, repeat):
+    """
+    Benchmark the incremental DifferentialIKSolver against one calculate_first_arm call per point on a dense closed
+    path, which also passes close to the external radius. The records also keep the largest distance of arm1 to the
+    closed form solution, and the incremental record its speedup over the closed form, which is about 1 in CPython
+    :return: List of result records
+    """
+    angle = np.linspace(0, 2 * math.pi, count)
+    radius = 110 + 48 * np.sin(3 * angle)
+    x = (radius * np.cos(angle)).tolist()
+    y = (radius * np.sin(angle)).tolist()
+
+    closed_samples = []
+    incremental_samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        closed = [calculate_first_arm(x2, y2, BENCH_L1, BENCH_L2, 1) for x2, y2 in zip(x, y)]
+        closed_samples.append(time.perf_counter() - begin)
+
+        solver = DifferentialIKSolver(BENCH_L1, BENCH_L2, 1)
+        begin = time.perf_counter()
+        x1, y1 = solver.solve_path(x, y)
+        incremental_samples.append(time.perf_counter() - begin)
+
+    closed_x1, closed_y1 = np.array(closed).T
+    closed_record = summarize("calculate_first_arm_path", "batch", "dense_path", count, closed_samples)
+    closed_record["max_error"] = 0.0
+    incremental_record = summarize("differential_ik_path", "batch", "dense_path", count, incremental_samples)
+    incremental_record["max_error"] = float(np.hypot(x1 - closed_x1, y1 - closed_y1).max())
+    incremental_record["solver"] = solver.get_stats()
+    incremental_record["speedup"] = incremental_record["ops_per_sec"] / closed_record["ops_per_sec"]
+
+    return [closed_record, incremental_record]
+
+
+def run_chain_benchmarks(count, repeat, rng):
+    """
+    Benchmark ChainIKSolver for 2 to 6 links, both warm started along a dense closed path and cold started on
+    uniform targets. Every sample is a single solve, so the latency percentiles are per solve. The records also keep
+    the largest distance of the edge to its target, the solver stats and the check of CHAIN_MAX_SOLVE_TIME: a solve
+    slower than it is timed 3 more times from the same pose, and only misses the target if all of them are slower,
+    so that the benchmark process being preempted is not counted as a slow solve
+    :return: List of result records
+    """
+    results = []
+    for count_links in range(2, 7):
+        lengths = [BENCH_L1, BENCH_L2, 50, 40, 30, 20][:count_links]
+        ext_r, int_r = get_chain_workspace_radius(lengths)
+
+        angle = np.linspace(0, 2 * math.pi, count)
+        radius = int_r + (ext_r - int_r) * (0.55 + 0.44 * np.sin(3 * angle))
+        path = list(zip((radius * np.cos(angle)).tolist(), (radius * np.sin(angle)).tolist()))
+
+        # Reuse generate_targets through the equivalent 2-link ring of the chain
+        x, y = generate_targets("uniform", count, (ext_r + int_r) / 2, (ext_r - int_r) / 2, rng)
+        targets = list(zip(x.tolist(), y.tolist()))
+
+        for distribution, warm in (("dense_path", True), ("uniform", False)):
+            points = path if warm else targets
+            solver = ChainIKSolver(lengths, 1)
+            samples = []
+            slow_solves = []
+            max_error = 0.0
+            for _ in range(repeat):
+                for x2, y2 in points:
+                    if not warm:
+                        solver.reset()
+                    start_pose = solver.pose
+                    begin = time.perf_counter()
+                    pose = solver.solve(x2, y2)
+                    samples.append(time.perf_counter() - begin)
+                    max_error = max(max_error, math.hypot(pose[-2] - x2, pose[-1] - y2))
+                    if samples[-1] > CHAIN_MAX_SOLVE_TIME:
+                        slow_solves.append((start_pose, x2, y2))
+
+            record = summarize(f"chain_ik_{count_links}_links", "scalar", distribution, 1, samples)
+            record["max_error"] = max_error
+            record["solver"] = solver.get_stats()
+
+            # Time the slow solves again from the pose they started from
+            max_retimed = 0.0
+            for start_pose, x2, y2 in slow_solves:
+                retimed = []
+                for _ in range(3):
+                    solver.pose = start_pose
+                    begin = time.perf_counter()
+                    solver.solve(x2, y2)
+                    retimed.append(time.perf_counter() - begin)
+                max_retimed = max(max_retimed, min(retimed))
+
+            record["slow_solves"] = len(slow_solves)
+            record["max_retimed"] = max_retimed
+            record["passed"] = max_retimed <= CHAIN_MAX_SOLVE_TIME
+            results.append(record)
+
+    return results
+
+
+def run_fleet_benchmarks(frames, rng):
+    """
+    Benchmark the FleetRenderer ticks of FLEET_ARMS arms on a stub canvas, every tick steps and draws the whole fleet
+    and the arms that arrived get new targets every 10 ticks. The ticks run back to back, so the record fps is the
+    highest rate the fleet reaches without the Tk drawing cost and worst_frame_time the slowest time between two
+    ticks. `python fleet.py` measures the same in a window
+    :return: List of result records
+    """
+    fleet = create_random_fleet(FLEET_ARMS, rng)
+    canvas = StubCanvas()
+    renderer = FleetRenderer(canvas, fleet, 400, 300)
+
+    samples = []
+    renderer.start(FLEET_MIN_FPS)
+    for frame in range(frames):
+        if frame % 10 == 0:
+            retarget_fleet(fleet, rng, renderer.clock(), 0.5)
+        callback, args = canvas.pending.pop(0)
+        begin = time.perf_counter()
+        callback(*args)
+        samples.append(time.perf_counter() - begin)
+    renderer.stop()
+
+    record = summarize("fleet_renderer_tick", "frame", "fleet", 1, samples)
+    record["arms"] = len(fleet)
+    record.update(renderer.get_stats())
+    return [record]
+
+
+def run_time_scaling_benchmarks(steps, repeat):
+    """
+    Benchmark time_optimal_scaling on a long straight move passing close to the internal circle, where the joints
+    turn fastest. The record also keeps the move duration and the largest joint rates measured on the result
+    :return: List of result records
+    """
+    max_velocity, max_acceleration = (2.0, 3.0), (5.0, 8.0)
+    trajectory = plan_straight_move(1, 150, 20, -60, 120, BENCH_L1, BENCH_L2, steps)
+    angles = get_trajectory_joint_angles(trajectory)
+
+    samples = time_batch(lambda: time_optimal_scaling(angles, max_velocity, max_acceleration), repeat)
+    times = time_optimal_scaling(angles, max_velocity, max_acceleration)
+    velocity, acceleration = get_joint_rates(angles, times)
+
+    record = summarize("time_optimal_scaling", "batch", "straight_move", len(angles), samples)
+    record["duration"] = float(times[-1])
+    record["max_velocity"] = velocity.tolist()
+    record["max_acceleration"] = acceleration.tolist()
+
+    return [record]
+
+
+def get_batch_speedups(results):
+    """
+    Compare the per point time of the batch kinematics with the loop of scalar functions they replace, for every
+    target distribution
+    :param results: The result records of run_kinematics_benchmarks
+    :return: List of dicts with the batch name, the distribution, the speedup and whether it reaches BATCH_MIN_SPEEDUP
+    """
+    ops_per_sec = {(record["name"], record["distribution"]): record["ops_per_sec"] for record in results}
+
+    speedups = []
+    for name, scalar_names in BATCH_SCALAR_LOOPS.items():
+        for (record_name, distribution), batch_ops in ops_per_sec.items():
+            if record_name == name:
+                scalar_time = sum(1 / ops_per_sec[scalar_name, distribution] for scalar_name in scalar_names)
+                speedup = float(batch_ops * scalar_time)
+                speedups.append({"name": name, "distribution": distribution, "speedup": speedup,
+                                 "passed": speedup >= BATCH_MIN_SPEEDUP})
+
+    return speedups
+
+
+def get_environment():
+    """
+    :return: A dict describing where the benchmarks ran, to tell apart results of different machines
+    """
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare_results(old, new):
+    """
+    Console print the ops/sec change of every benchmark present in both result sets
+    :param old: The previous results dict
+    :param new: The current results dict
+    """
+    def key(record):
+        return record["name"], record["kind"], record["distribution"]
+
+    old_records = {key(record): record for record in old["results"]}
+    for record in new["results"]:
+        previous = old_records.get(key(record))
+        if previous is not None:
+            ratio = record["ops_per_sec"] / previous["ops_per_sec"]
+            print(f"{record['name']:<40} {record['distribution']:<14} {ratio:6.2f}x")
+
+
+def run_benchmarks(quick=False, seed=0):
+    """
+    Run the whole benchmark suite
+    :param quick: If True use smaller sizes for a fast smoke run
+    :param seed: The seed of the random targets
+    :return: A dict with the environment and the list of result records
+    """
+    rng = np.random.default_rng(seed)
+    scalar_count, batch_count, repeat, group = (2000, 10000, 5, 50) if quick else (50000, 200000, 20, 100)
+
+    results = run_kinematics_benchmarks(scalar_count, batch_count, repeat, group, rng)
+    speedups = get_batch_speedups(results)
+    results += run_frame_benchmarks(300, 3 if quick else 20)
+    results += run_dense_path_benchmarks(10000 if quick else 100000, 3 if quick else 10)
+    results += run_chain_benchmarks(2000 if quick else 20000, 1 if quick else 3, rng)
+    results += run_time_scaling_benchmarks(10000 if quick else 100000, 3 if quick else 10)
+    fleet_record, = run_fleet_benchmarks(300 if quick else 3000, rng)
+    results.append(fleet_record)
+    chain = [{"name": record["name"], "distribution": record["distribution"],
+              "p99": record["latency_ns"]["p99"] * 1e-9, "max": record["latency_ns"]["max"] * 1e-9,
+              "slow_solves": record["slow_solves"], "max_retimed": record["max_retimed"], "passed": record["passed"]}
+             for record in results if record["name"].startswith("chain_ik_")]
+    fleet = {"arms": fleet_record["arms"], "fps": fleet_record["fps"],
+             "worst_frame_time": fleet_record["worst_frame_time"], "passed": fleet_record["fps"] >= FLEET_MIN_FPS}
+
+    return {"environment": get_environment(), "seed": seed, "quick": quick, "results": results, "speedups": speedups,
+            "chain": chain, "fleet": fleet}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the kinematics and animation hot paths without a display")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="Previous JSON results to compare ops/sec with")
+    parser.add_argument("--quick", action="store_true", help="Use small sizes for a fast run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random targets")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.quick, args.seed)
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    for result in report["results"]:
+        print(f"{result['name']:<40} {result['kind']:<7} {result['distribution']:<14} "
+              f"{result['ops_per_sec']:>14,.0f} ops/s  p50 {result['latency_ns']['p50']:>10,.0f} ns")
+
+    for speedup in report["speedups"]:
+        print(f"{speedup['name']:<40} {'speedup':<7} {speedup['distribution']:<14} {speedup['speedup']:>10.1f}x "
+              f"{'ok' if speedup['passed'] else f'below {BATCH_MIN_SPEEDUP}x'}")
+
+    for chain in report["chain"]:
+        print(f"{chain['name']:<40} {'solve':<7} {chain['distribution']:<14} p99 {chain['p99'] * 1e6:8.1f} us  "
+              f"max {chain['max'] * 1e6:8.1f} us  {chain['slow_solves']} over {CHAIN_MAX_SOLVE_TIME * 1e3:g} ms, "
+              f"{chain['max_retimed'] * 1e6:.1f} us retimed "
+              f"{'ok' if chain['passed'] else f'above {CHAIN_MAX_SOLVE_TIME * 1e3:g} ms'}")
+
+    fleet = report["fleet"]
+    print(f"{'fleet_renderer_tick':<40} {'fleet':<7} {fleet['arms']} arms {fleet['fps']:>10.1f} FPS  worst frame time "
+          f"{fleet['worst_frame_time'] * 1000:.1f} ms {'ok' if fleet['passed'] else f'below {FLEET_MIN_FPS} FPS'}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare_results(json.load(file), report)
+
+    checks = report["speedups"] + report["chain"] + [fleet]
+    if not all(check["passed"] for check in checks):
+        sys.exit(1)
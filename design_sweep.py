@@ -0,0 +1,295 @@
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from kinematics import MOVE_VALID, get_workspace_radius
+from kinematics_batch import check_arm_moves_batch
+
+RESULT_COLUMNS = ["chunk", "l1", "l2", "ext_r", "int_r", "workspace_area", "dead_zone_area",
+                  "reachable_fraction", "move_feasible_fraction"]
+
+# Target stations of the sweep, set once per worker process by init_worker
+_targets_x = None
+_targets_y = None
+
+
+def get_length_range(start, stop, step):
+    """
+    Get the arm lengths from start to stop (inclusive) with the given step
+    :param start: The first length
+    :param stop: The last length
+    :param step: The distance between two lengths
+    :return: A list of lengths
+    """
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + index * step, 9) for index in range(count)]
+
+
+def load_targets(path):
+    """
+    Read the target stations from a CSV file with one x,y pair per line. Lines that are not numeric are skipped
+    :param path: The path of the CSV file
+    :return: A tuple (x, y) of arrays with the target coordinates
+    """
+    points = []
+    with open(path, newline="") as file:
+        for row in csv.reader(file):
+            try:
+                points.append((float(row[0]), float(row[1])))
+            except (IndexError, ValueError):
+                continue
+
+    if not points:
+        raise ValueError(f"No x,y targets found in {path}")
+
+    targets = np.array(points)
+    return targets[:, 0], targets[:, 1]
+
+
+def init_worker(targets_x, targets_y):
+    """
+    Keep the targets in the worker process, so that they are not sent again with every chunk
+    """
+    global _targets_x, _targets_y
+    _targets_x = targets_x
+    _targets_y = targets_y
+
+
+def evaluate_arm_lengths(l1, l2, targets_x, targets_y):
+    """
+    Evaluate one (L1, L2) design against the target stations
+    The targets are visited in order, so a move is every straight move from one target to the next
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param targets_x: Array of target x coordinates
+    :param targets_y: Array of target y coordinates
+    :return: A dict with the RESULT_COLUMNS values except chunk
+    """
+    ext_r, int_r = get_workspace_radius(l1, l2)
+
+    # Same open workspace as are_coords_inside_workspace
+    dist_sq = targets_x ** 2 + targets_y ** 2
+    reachable = (dist_sq < ext_r ** 2) & (dist_sq > int_r ** 2)
+
+    if len(targets_x) > 1:
+        status, _, _, _, _ = check_arm_moves_batch(l1, l2, targets_x[:-1], targets_y[:-1], targets_x[1:], targets_y[1:])
+        move_feasible_fraction = float(np.mean(status == MOVE_VALID))
+    else:
+        move_feasible_fraction = float("nan")
+
+    return {
+        "l1": l1,
+        "l2": l2,
+        "ext_r": ext_r,
+        "int_r": int_r,
+        "workspace_area": math.pi * (ext_r ** 2 - int_r ** 2),
+        "dead_zone_area": math.pi * int_r ** 2,
+        "reachable_fraction": float(np.mean(reachable)),
+        "move_feasible_fraction": move_feasible_fraction,
+    }
+
+
+def evaluate_chunk(chunk, pairs):
+    """
+    Evaluate a chunk of (L1, L2) pairs in a worker process
+    :param chunk: The chunk index, stored with every result row
+    :param pairs: List of (l1, l2) tuples
+    :return: A tuple (chunk, rows) with one result dict per pair
+    """
+    rows = []
+    for l1, l2 in pairs:
+        row = evaluate_arm_lengths(l1, l2, _targets_x, _targets_y)
+        row["chunk"] = chunk
+        rows.append(row)
+
+    return chunk, rows
+
+
+def get_grid_path(path):
+    """
+    :param path: The output CSV path
+    :return: The path of the JSON file with the grid parameters the output is written for
+    """
+    return path + ".grid.json"
+
+
+def get_grid_parameters(l1_values, l2_values, targets_x, targets_y, chunk_size):
+    """
+    :return: A dict with everything the chunks of an output depend on - The lengths, the chunk size and a SHA-256 of
+    the targets
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(targets_x, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(targets_y, dtype=float).tobytes())
+    return {
+        "l1": [float(l1) for l1 in l1_values],
+        "l2": [float(l2) for l2 in l2_values],
+        "chunk_size": chunk_size,
+        "targets": digest.hexdigest(),
+    }
+
+
+def check_grid_parameters(path, grid):
+    """
+    Make sure an existing output is resumed with the grid it was written for, otherwise its chunk indexes would be
+    mixed with the chunks of another grid. The grid parameters of a new output are stored next to it
+    :param path: The output CSV path
+    :param grid: The grid parameters from get_grid_parameters
+    :raises ValueError: If the output exists and was written for other grid parameters, or the stored ones are missing
+    """
+    grid_path = get_grid_path(path)
+    if os.path.exists(path):
+        try:
+            with open(grid_path) as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            raise ValueError(f"{path} has no readable grid parameters in {grid_path}, it can not be resumed")
+        if stored != grid:
+            raise ValueError(f"{path} was written for other lengths, chunk size or targets, use another output")
+    else:
+        replace_file(grid_path, lambda file: json.dump(grid, file))
+
+
+def replace_file(path, write):
+    """
+    Write a file through a temporary file that replaces it once complete, so that an interruption never leaves a
+    truncated file
+    :param path: The file path
+    :param write: Function called with the open temporary text file
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def write_results(path, rows):
+    """
+    Replace the output file with the given result rows
+    :param path: The output CSV path
+    :param rows: Iterable of result dicts
+    """
+    def write(file):
+        writer = csv.DictWriter(file, RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    replace_file(path, write)
+
+
+def read_completed_chunks(path, chunks):
+    """
+    Read the rows of the chunks finished by a previous interrupted run, and rewrite the output file with only the
+    complete chunks, dropping rows of a chunk that was being written during the interruption. A chunk is only
+    complete if its rows are the (L1, L2) pairs of the chunk
+    :param path: The output CSV path
+    :param chunks: List of the (l1, l2) pair lists of every chunk
+    :return: The set of completed chunk indexes
+    """
+    if not os.path.exists(path):
+        return set()
+
+    rows_by_chunk = {}
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            try:
+                chunk = int(row["chunk"])
+                # A row cut by the interruption has missing trailing columns
+                if row[RESULT_COLUMNS[-1]] in (None, ""):
+                    continue
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows_by_chunk.setdefault(chunk, []).append(row)
+
+    completed = set()
+    for chunk, rows in rows_by_chunk.items():
+        try:
+            pairs = sorted((float(row["l1"]), float(row["l2"])) for row in rows)
+        except ValueError:
+            continue
+        if chunk < len(chunks) and pairs == sorted(chunks[chunk]):
+            completed.add(chunk)
+
+    write_results(path, (row for chunk in sorted(completed) for row in rows_by_chunk[chunk]))
+    return completed
+
+
+def sort_results(path):
+    """
+    Rewrite the finished result table sorted by (L1, L2)
+    :param path: The output CSV path
+    """
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    rows.sort(key=lambda row: (float(row["l1"]), float(row["l2"])))
+    write_results(path, rows)
+
+
+def run_sweep(l1_values, l2_values, targets_x, targets_y, output, chunk_size=256, workers=None):
+    """
+    Evaluate every (L1, L2) pair of the grid across a process pool and write one result table
+    Finished chunks are appended to the output as they complete, so that an interrupted sweep continues from the
+    chunks still missing when run again with the same arguments. Resuming with other arguments is refused, see
+    check_grid_parameters
+    :param l1_values: List of L1 lengths
+    :param l2_values: List of L2 lengths
+    :param targets_x: Array of target x coordinates
+    :param targets_y: Array of target y coordinates
+    :param output: The output CSV path
+    :param chunk_size: Number of (L1, L2) pairs per chunk of work
+    :param workers: Number of worker processes, None for one per CPU
+    :return: Number of chunks evaluated by this run
+    :raises ValueError: If the output exists and was written for another grid
+    """
+    pairs = [(l1, l2) for l1 in l1_values for l2 in l2_values]
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+
+    check_grid_parameters(output, get_grid_parameters(l1_values, l2_values, targets_x, targets_y, chunk_size))
+    completed = read_completed_chunks(output, chunks)
+    missing = [chunk for chunk in range(len(chunks)) if chunk not in completed]
+
+    with open(output, "a", newline="") as file:
+        writer = csv.DictWriter(file, RESULT_COLUMNS)
+        if file.tell() == 0:
+            writer.writeheader()
+
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(targets_x, targets_y)) as executor:
+            futures = [executor.submit(evaluate_chunk, chunk, chunks[chunk]) for chunk in missing]
+
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk, rows = future.result()
+                writer.writerows(rows)
+                file.flush()
+                print(f"Chunk {chunk} done ({done}/{len(missing)})")
+
+    sort_results(output)
+    return len(missing)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep arm lengths (L1, L2) and evaluate workspace and target "
+                                                 "coverage for each pair")
+    parser.add_argument("--l1", type=float, nargs=3, metavar=("START", "STOP", "STEP"), required=True,
+                        help="L1 lengths from START to STOP (inclusive)")
+    parser.add_argument("--l2", type=float, nargs=3, metavar=("START", "STOP", "STEP"), required=True,
+                        help="L2 lengths from START to STOP (inclusive)")
+    parser.add_argument("--targets", required=True,
+                        help="CSV file of x,y target stations, visited in order for the move feasibility")
+    parser.add_argument("--output", required=True, help="Result CSV file, an existing one is resumed")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Number of (L1, L2) pairs per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    x, y = load_targets(args.targets)
+    count = run_sweep(get_length_range(*args.l1), get_length_range(*args.l2), x, y, args.output,
+                      args.chunk_size, args.workers)
+    print(f"Evaluated {count} chunks, results in {args.output}")
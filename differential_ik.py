@@ -0,0 +1,205 @@
+import numpy as np
+
+from kinematics import calculate_first_arm, get_workspace_radius
+
+
+class DifferentialIKSolver:
+    """
+    Incremental IK for an arm edge that moves in small steps, e.g. along a dense path or following a target stream.
+    Instead of a full closed form solve per point, arm1 is turned from the previous pose by the shoulder change the
+    2-link Jacobian gives for the move of the edge. Written in terms of the arm2 length error of the previous arm1
+    with the new edge position, the step is:
+        d_shoulder = ((x2 - x1)^2 + (y2 - y1)^2 - L2^2) / (2 * det),  det = x1 * y2 - y1 * x2
+    which is the Jacobian update d_shoulder = (arm2 . d_edge) / det plus the error left by the previous step, so
+    errors are corrected at every step instead of adding up. det is L1 * L2 * sin(elbow), and arm1 is rotated with a
+    Taylor expansion of cos and sin, so a step only takes a few multiplications and no trigonometric function.
+    The error left by a step is about d_shoulder^2 * (x1 * x2 + y1 * y2) / (2 * det) in RAD, it is estimated for
+    every step before accepting it.
+
+    A pose is solved in closed form with calculate_first_arm instead (re-anchored):
+    - For the first point, and after every `anchor_interval` steps, which bounds the drift of the arm1 length
+    - When |sin(elbow)| is below `singular_sin`, i.e. the arm is close to fully stretched at L1 + L2 or fully folded
+      at |L1 - L2|, where det goes to 0 and the Jacobian cannot be inverted
+    - When the step turns arm1 by more than `max_step`, i.e. for jumps of the edge, where the error estimate does
+      not hold anymore
+    - When the estimated error of the step moves arm1 by more than `tolerance`, which happens close to the singular
+      configurations
+    - When the new pose would put the elbow on the other side than `direction`, which calculate_first_arm would not
+    - When the edge is not reachable, then (None, None) is returned as calculate_first_arm does
+
+    On 100000 point closed paths with steps of 6e-5 of L1 + L2, arm1 stayed within 3e-8 of L1 + L2 of the closed
+    form solution, and within 2e-7 of L1 + L2 for paths passing 1e-3 of the ring width from both workspace radii.
+    The solver gives no real speedup over calculate_first_arm. In CPython both ways are dominated by the same
+    interpreter overhead, and the dense paths of benchmarks.py run at about the same rate with either. The accuracy
+    bounds are checked by tests/test_differential_ik.py
+    """
+
+    def __init__(self, l1, l2, direction, anchor_interval=32, singular_sin=1e-3, tolerance=None,
+                 max_step=0.1):
+        """
+        :param l1: The fixed arm1 length L1
+        :param l2: The fixed arm2 length L2
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param anchor_interval: Number of incremental steps between two closed form solves
+        :param singular_sin: Smallest |sin(elbow)| solved incrementally
+        :param tolerance: Largest accepted estimated error of arm1 per step, by default 1e-6 of L1 + L2
+        :param max_step: Largest shoulder rotation of an incremental step in RAD, the error estimate only holds for
+        small rotations
+        """
+        if anchor_interval <= 0:
+            raise ValueError("anchor_interval must be greater than 0")
+
+        self.l1 = l1
+        self.l2 = l2
+        self.direction = direction
+        self.anchor_interval = anchor_interval
+
+        ext_r, int_r = get_workspace_radius(l1, l2)
+        self._ext_sq = ext_r ** 2
+        self._int_sq = int_r ** 2
+        self._l2_sq = l2 ** 2
+        self._min_det = singular_sin * l1 * l2
+        self._max_step_sq = max_step ** 2
+        # Sign of det on the elbow side of the direction, a step that changes it jumped to the other solution
+        self._side = -1 if direction == 1 else 1
+        # Error bound on d_shoulder^2 * |x1 * x2 + y1 * y2| / |det|, an arm1 error of tolerance is tolerance / L1 RAD
+        self._max_error = 2 * (1e-6 * (l1 + l2) if tolerance is None else tolerance) / l1
+
+        # Current pose, None until the first solve
+        self.x1 = None
+        self.y1 = None
+        self.x2 = None
+        self.y2 = None
+        self._steps_left = 0
+
+        self.steps = 0
+        self.anchors = 0
+        self.singular = 0
+        self.inaccurate = 0
+
+    def reset(self):
+        """
+        Forget the current pose, the next solve is done in closed form
+        """
+        self.x1 = self.y1 = self.x2 = self.y2 = None
+
+    def solve(self, x2, y2):
+        """
+        Get arm1 coordinates for the arm edge at (x2, y2), incrementally from the previous pose when possible
+        :param x2: The x coordinate of arm2
+        :param y2: The y coordinate of arm2
+        :return: A tuple (x1, y1) representing arm1's coordinates, or (None, None) if (x2, y2) is not reachable
+        """
+        x1 = self.x1
+        if x1 is not None and self._steps_left > 0:
+            y1 = self.y1
+
+            if self._int_sq < x2 * x2 + y2 * y2 < self._ext_sq:
+                side = self._side
+                det = x1 * y2 - y1 * x2
+
+                if det * side >= self._min_det:
+                    ex = x2 - x1
+                    ey = y2 - y1
+                    d = (ex * ex + ey * ey - self._l2_sq) / (2 * det)
+                    d_sq = d * d
+
+                    if d_sq <= self._max_step_sq and d_sq * abs(x1 * x2 + y1 * y2) <= self._max_error * det * side:
+                        cos_d = 1 - d_sq * (0.5 - d_sq / 24)
+                        sin_d = d * (1 - d_sq / 6)
+                        new_x1 = x1 * cos_d - y1 * sin_d
+                        new_y1 = y1 * cos_d + x1 * sin_d
+
+                        # The elbow must stay on the side of the direction
+                        if (new_x1 * y2 - new_y1 * x2) * side > 0:
+                            self.x1 = new_x1
+                            self.y1 = new_y1
+                            self.x2 = x2
+                            self.y2 = y2
+                            self._steps_left -= 1
+                            self.steps += 1
+                            return new_x1, new_y1
+
+                    self.inaccurate += 1
+                else:
+                    self.singular += 1
+
+        return self._anchor(x2, y2)
+
+    def solve_path(self, x2, y2):
+        """
+        Solve a whole path of arm edge points in order, continuing from the current pose. Same steps as solve, run in
+        one loop over local variables to save the method call and attribute lookups of every point
+        :param x2: Sequence of x coordinates of arm2
+        :param y2: Sequence of y coordinates of arm2
+        :return: A tuple (x1, y1) of arrays, unreachable points have NaN coordinates
+        """
+        l2_sq, int_sq, ext_sq = self._l2_sq, self._int_sq, self._ext_sq
+        min_det, max_error, max_step_sq, side = self._min_det, self._max_error, self._max_step_sq, self._side
+        x1, y1, steps_left = self.x1, self.y1, self._steps_left
+        steps = singular = inaccurate = 0
+
+        path_x1 = []
+        path_y1 = []
+        for px2, py2 in zip(np.asarray(x2, dtype=float).tolist(), np.asarray(y2, dtype=float).tolist()):
+            if x1 is not None and steps_left > 0 and int_sq < px2 * px2 + py2 * py2 < ext_sq:
+                det = x1 * py2 - y1 * px2
+
+                if det * side >= min_det:
+                    ex = px2 - x1
+                    ey = py2 - y1
+                    d = (ex * ex + ey * ey - l2_sq) / (2 * det)
+                    d_sq = d * d
+
+                    if d_sq <= max_step_sq and d_sq * abs(x1 * px2 + y1 * py2) <= max_error * det * side:
+                        cos_d = 1 - d_sq * (0.5 - d_sq / 24)
+                        sin_d = d * (1 - d_sq / 6)
+                        new_x1 = x1 * cos_d - y1 * sin_d
+                        new_y1 = y1 * cos_d + x1 * sin_d
+
+                        if (new_x1 * py2 - new_y1 * px2) * side > 0:
+                            x1, y1 = new_x1, new_y1
+                            steps_left -= 1
+                            steps += 1
+                            path_x1.append(x1)
+                            path_y1.append(y1)
+                            continue
+
+                    inaccurate += 1
+                else:
+                    singular += 1
+
+            # Closed form anchor
+            x1, y1 = self._anchor(px2, py2)
+            steps_left = self._steps_left
+            path_x1.append(x1)
+            path_y1.append(y1)
+
+        if x1 is not None and steps:
+            # The pose was moved by incremental steps after the last anchor
+            self.x1, self.y1, self.x2, self.y2 = x1, y1, px2, py2
+            self._steps_left = steps_left
+        self.steps += steps
+        self.singular += singular
+        self.inaccurate += inaccurate
+
+        return np.array(path_x1, dtype=float), np.array(path_y1, dtype=float)
+
+    def get_stats(self):
+        """
+        :return: A dict with the number of incremental steps and closed form anchors, and how many of the anchors were
+        caused by a singular pose or by a step estimated too inaccurate
+        """
+        return {"steps": self.steps, "anchors": self.anchors, "singular": self.singular, "inaccurate": self.inaccurate}
+
+    def _anchor(self, x2, y2):
+        x1, y1 = calculate_first_arm(x2, y2, self.l1, self.l2, self.direction)
+        self.anchors += 1
+
+        if x1 is None:
+            self.reset()
+        else:
+            self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+            self._steps_left = self.anchor_interval
+
+        return x1, y1
@@ -0,0 +1,197 @@
+import argparse
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from kinematics import MOVE_VALID, get_workspace_radius
+from kinematics_batch import check_arm_moves_batch
+
+# Estimated fractions - Random points inside workspace, random start/target pairs that are one valid straight move,
+# and the same among the pairs with both ends inside workspace, as the GUI only asks for a move from a valid start
+METRICS = ("reachable", "move_feasible", "move_feasible_inside")
+
+
+def sample_disk(rng, count, radius):
+    """
+    Draw points uniformly distributed over a disk around (0, 0)
+    :param rng: The numpy random generator
+    :param count: Number of points
+    :param radius: The disk radius
+    :return: A tuple (x, y) of arrays
+    """
+    distance = radius * np.sqrt(rng.random(count))
+    angle = rng.uniform(0, 2 * math.pi, count)
+    return distance * np.cos(angle), distance * np.sin(angle)
+
+
+def evaluate_chunk(l1, l2, radius, seed, chunk, size):
+    """
+    Draw and evaluate one chunk of random start/target pairs. The random generator of a chunk only depends on the
+    seed and the chunk index, so a chunk gives the same counts whatever process evaluates it
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param radius: The radius of the disk the starts and targets are drawn from
+    :param seed: The seed of the whole run
+    :param chunk: The chunk index
+    :param size: Number of pairs of the chunk
+    :return: A tuple (chunk, counts) with a dict of (successes, trials) integer counts per METRICS name
+    """
+    rng = np.random.default_rng([seed, chunk])
+    x2, y2 = sample_disk(rng, size, radius)
+    xt, yt = sample_disk(rng, size, radius)
+
+    # Same open workspace as are_coords_inside_workspace, and same move checks as get_user_move_arm_data
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    start_sq = x2 ** 2 + y2 ** 2
+    target_sq = xt ** 2 + yt ** 2
+    start_inside = (start_sq < ext_r ** 2) & (start_sq > int_r ** 2)
+    both_inside = start_inside & (target_sq < ext_r ** 2) & (target_sq > int_r ** 2)
+
+    status, _, _, _, _ = check_arm_moves_batch(l1, l2, x2, y2, xt, yt)
+    valid = int(np.count_nonzero(status == MOVE_VALID))
+
+    return chunk, {
+        "reachable": (int(np.count_nonzero(start_inside)), size),
+        "move_feasible": (valid, size),
+        "move_feasible_inside": (valid, int(np.count_nonzero(both_inside))),
+    }
+
+
+def get_wilson_interval(successes, trials, confidence):
+    """
+    Wilson score interval of a fraction, which keeps a sensible width for fractions close to 0 or 1
+    :param successes: Number of successes
+    :param trials: Number of trials
+    :param confidence: The confidence level, e.g. 0.95
+    :return: A tuple (estimate, low, high), (nan, 0, 1) without trials
+    """
+    if trials == 0:
+        return math.nan, 0.0, 1.0
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    fraction = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (fraction + z ** 2 / (2 * trials)) / denominator
+    half_width = z * math.sqrt(fraction * (1 - fraction) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+
+    return fraction, max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def iterate_chunk_counts(l1, l2, radius, seed, chunk_size, chunks, workers):
+    """
+    Evaluate chunks across a process pool and yield their counts in chunk order. Only a few chunks per worker are
+    submitted ahead, so that stopping early leaves little work behind
+    :param chunks: Largest number of chunks
+    :param workers: Number of worker processes, None for one per CPU, 0 to run in this process
+    :return: Generator of count dicts, see evaluate_chunk
+    """
+    if workers == 0:
+        for chunk in range(chunks):
+            yield evaluate_chunk(l1, l2, radius, seed, chunk, chunk_size)[1]
+        return
+
+    read_ahead = 2 * (workers or os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(workers)
+    try:
+        pending = deque()
+        for chunk in range(chunks):
+            pending.append(executor.submit(evaluate_chunk, l1, l2, radius, seed, chunk, chunk_size))
+            if len(pending) >= read_ahead:
+                yield pending.popleft().result()[1]
+
+        while pending:
+            yield pending.popleft().result()[1]
+    finally:
+        # The chunks submitted after an early stop are not needed any more
+        executor.shutdown(cancel_futures=True)
+
+
+def run_feasibility_stats(l1, l2, seed=0, precision=1e-3, confidence=0.95, radius=None, chunk_size=2 ** 18,
+                          max_samples=10 ** 8, workers=None):
+    """
+    Estimate by Monte Carlo sampling which fraction of random points is inside workspace and which fraction of random
+    start/target pairs is one valid straight move, with confidence intervals. The validity of a straight move does
+    not depend on the arm direction, as both elbow solutions exist all along a move inside workspace.
+
+    Counts are accumulated chunk after chunk in chunk order, and the run stops after the first chunk where the
+    confidence interval of every metric is within +/- precision. As every chunk has its own random generator from
+    (seed, chunk index) and counts are integers, the result for a seed is the same whatever the number of workers
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param seed: The seed of the random samples
+    :param precision: Largest half width of the confidence intervals to stop at
+    :param confidence: The confidence level of the intervals
+    :param radius: The radius of the disk the points are drawn from, by default the external workspace radius
+    :param chunk_size: Number of samples per chunk of work
+    :param max_samples: Largest number of samples, rounded up to whole chunks, the run stops there even if the precision
+    is not reached
+    :param workers: Number of worker processes, None for one per CPU, 0 to run in this process
+    :return: A dict with the run parameters, the number of samples, whether the precision was reached, the elapsed
+    seconds, and per METRICS name the estimate, the interval and the counts
+    """
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    radius = ext_r if radius is None else radius
+    chunks = max(1, math.ceil(max_samples / chunk_size))
+
+    totals = {metric: [0, 0] for metric in METRICS}
+    intervals = {}
+    samples = 0
+    converged = False
+    start = time.perf_counter()
+
+    for counts in iterate_chunk_counts(l1, l2, radius, seed, chunk_size, chunks, workers):
+        samples += chunk_size
+        for metric, (successes, trials) in counts.items():
+            totals[metric][0] += successes
+            totals[metric][1] += trials
+
+        intervals = {metric: get_wilson_interval(*totals[metric], confidence) for metric in METRICS}
+        if all((high - low) / 2 <= precision for _, low, high in intervals.values()):
+            converged = True
+            break
+
+    result = {
+        "l1": l1,
+        "l2": l2,
+        "seed": seed,
+        "radius": radius,
+        "confidence": confidence,
+        "precision": precision,
+        "samples": samples,
+        "converged": converged,
+        "elapsed": time.perf_counter() - start,
+        # Exact value of the reachable fraction, the area ratio of the workspace ring and the disk
+        "reachable_exact": max(0.0, min(radius, ext_r) ** 2 - int_r ** 2) / radius ** 2,
+    }
+    for metric in METRICS:
+        estimate, low, high = intervals[metric]
+        result[metric] = {"estimate": estimate, "low": low, "high": high,
+                          "successes": totals[metric][0], "trials": totals[metric][1]}
+
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate the workspace coverage and the straight move feasibility "
+                                                 "of random start/target pairs by Monte Carlo sampling")
+    parser.add_argument("--l1", type=float, required=True, help="The arm length L1")
+    parser.add_argument("--l2", type=float, required=True, help="The arm length L2")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random samples")
+    parser.add_argument("--precision", type=float, default=1e-3,
+                        help="Stop once every confidence interval is within +/- this value")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--radius", type=float, help="Radius of the sampled disk, default L1 + L2")
+    parser.add_argument("--chunk-size", type=int, default=2 ** 18, help="Number of samples per chunk")
+    parser.add_argument("--max-samples", type=int, default=10 ** 8, help="Largest number of samples")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, 0 for none")
+    args = parser.parse_args()
+
+    stats = run_feasibility_stats(args.l1, args.l2, args.seed, args.precision, args.confidence, args.radius,
+                                  args.chunk_size, args.max_samples, args.workers)
+    print(json.dumps(stats, indent=2))
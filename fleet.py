@@ -0,0 +1,333 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+import instrumentation
+from kinematics import MOVE_VALID
+from kinematics_batch import check_arm_moves_batch, solve_arm_batch
+
+
+class ArmFleet:
+    """
+    State of many robotic arms kept in arrays, one entry per arm. Every arm has its own L1, L2, base position and
+    direction, and moves its edge in a straight line from its start to its target position over a given duration.
+    Edge positions are relative to the arm base
+    """
+
+    def __init__(self, l1, l2, base_x, base_y, direction, x2, y2):
+        """
+        :param l1: Array of arm lengths L1
+        :param l2: Array of arm lengths L2
+        :param base_x: Array of x coordinates of the arm bases
+        :param base_y: Array of y coordinates of the arm bases
+        :param direction: Array of arm directions - 1 for clockwise and 0 for counterclockwise
+        :param x2: Array of initial x2 coordinates of the arm edges
+        :param y2: Array of initial y2 coordinates of the arm edges
+        """
+        self.l1, self.l2, self.base_x, self.base_y, self.direction, self.x2, self.y2 = (
+            np.array(values, dtype=float) for values in np.broadcast_arrays(l1, l2, base_x, base_y, direction, x2, y2))
+
+        count = len(self.l1)
+        self.start_x = self.x2.copy()
+        self.start_y = self.y2.copy()
+        self.target_x = self.x2.copy()
+        self.target_y = self.y2.copy()
+        self.move_start_time = np.zeros(count)
+        self.move_duration = np.zeros(count)
+
+        self.x1 = np.full(count, np.nan)
+        self.y1 = np.full(count, np.nan)
+        self.reachable = np.zeros(count, dtype=bool)
+        self.solve()
+
+    def __len__(self):
+        return len(self.l1)
+
+    def set_targets(self, arms, xt, yt, duration, now):
+        """
+        Start straight moves of some arms to new targets. Moves that are not valid for their arm are not started
+        :param arms: Index array (or boolean mask) of the arms to move
+        :param xt: Target x coordinates relative to each arm base, single value or array
+        :param yt: Target y coordinates relative to each arm base, single value or array
+        :param duration: The duration of the moves in seconds, single value or array
+        :param now: The current time in seconds
+        :return: Boolean array, True for every selected arm whose move was started
+        """
+        arms = np.arange(len(self))[arms]
+        # One value per selected arm, so that single values can be indexed with the valid moves
+        xt, yt, duration = (np.broadcast_to(np.asarray(values, dtype=float), arms.shape)
+                            for values in (xt, yt, duration))
+
+        status, _, _, _, _ = check_arm_moves_batch(self.l1[arms], self.l2[arms], self.x2[arms], self.y2[arms], xt, yt)
+        valid = status == MOVE_VALID
+        moving = arms[valid]
+
+        self.start_x[moving] = self.x2[moving]
+        self.start_y[moving] = self.y2[moving]
+        self.target_x[moving] = xt[valid]
+        self.target_y[moving] = yt[valid]
+        self.move_start_time[moving] = now
+        self.move_duration[moving] = duration[valid]
+
+        return valid
+
+    def is_moving(self, now):
+        """
+        :param now: The current time in seconds
+        :return: Boolean array, True for every arm that has not reached its target yet
+        """
+        return now < self.move_start_time + self.move_duration
+
+    def update(self, now):
+        """
+        Move every arm edge to its position for the given time and solve all arms with one vectorized IK call
+        :param now: The current time in seconds
+        """
+        elapsed = now - self.move_start_time
+        progress = np.clip(elapsed / np.where(self.move_duration > 0, self.move_duration, 1.0), 0.0, 1.0)
+        progress[self.move_duration <= 0] = 1.0
+
+        self.x2 = self.start_x + (self.target_x - self.start_x) * progress
+        self.y2 = self.start_y + (self.target_y - self.start_y) * progress
+        self.solve()
+
+    def solve(self):
+        """
+        Compute arm1 of every arm for the current edge positions
+        """
+        self.x1, self.y1, _, _, self.reachable = solve_arm_batch(self.l1, self.l2, self.x2, self.y2, self.direction)
+
+    def get_world_poses(self):
+        """
+        :return: A tuple (base_x, base_y, x1, y1, x2, y2) of arrays with all arm points in world coordinates
+        """
+        return (self.base_x, self.base_y, self.base_x + self.x1, self.base_y + self.y1,
+                self.base_x + self.x2, self.base_y + self.y2)
+
+
+def get_random_targets(l1, l2, rng):
+    """
+    Get one random point per arm inside its workspace ring, away from the workspace circles
+    :param l1: Array of arm lengths L1
+    :param l2: Array of arm lengths L2
+    :param rng: NumPy random Generator
+    :return: A tuple (x, y) of arrays with the points relative to each arm base
+    """
+    ext_r, int_r = l1 + l2, np.abs(l1 - l2)
+    margin = 0.05 * (ext_r - int_r)
+    radius = rng.uniform(int_r + margin, ext_r - margin)
+    angle = rng.uniform(0, 2 * math.pi, len(radius))
+    return radius * np.cos(angle), radius * np.sin(angle)
+
+
+def create_random_fleet(count, rng, spacing=200):
+    """
+    Create a fleet of arms with random lengths and directions, their bases on a square grid centered on (0, 0)
+    :param count: Number of arms
+    :param rng: NumPy random Generator
+    :param spacing: Distance between two neighbour bases, the arms reach up to 90 from their base
+    :return: The ArmFleet
+    """
+    columns = math.ceil(math.sqrt(count))
+    index = np.arange(count)
+    base_x = (index % columns - (columns - 1) / 2) * spacing
+    base_y = ((columns - 1) / 2 - index // columns) * spacing
+
+    l1 = rng.uniform(30, 60, count)
+    l2 = rng.uniform(10, 30, count)
+    x2, y2 = get_random_targets(l1, l2, rng)
+    return ArmFleet(l1, l2, base_x, base_y, rng.integers(0, 2, count), x2, y2)
+
+
+def retarget_fleet(fleet, rng, now, duration):
+    """
+    Start moves to random targets for all arms that reached their target. Targets whose straight move is not valid
+    are dropped, those arms get another chance on the next call
+    :param fleet: The ArmFleet
+    :param rng: NumPy random Generator
+    :param now: The current time in seconds, on the clock of the fleet moves
+    :param duration: The duration of the moves in seconds
+    :return: Number of started moves
+    """
+    arms = np.flatnonzero(~fleet.is_moving(now))
+    xt, yt = get_random_targets(fleet.l1[arms], fleet.l2[arms], rng)
+    return int(fleet.set_targets(arms, xt, yt, duration, now).sum())
+
+
+class FleetRenderer:
+    """
+    Draw an ArmFleet on a canvas with two lines per arm, updated from one timer callback for the whole fleet
+    """
+
+    def __init__(self, canvas, fleet, center_x, center_y, clock=time.monotonic, scale=1.0):
+        """
+        :param canvas: The canvas to draw on
+        :param fleet: The ArmFleet to draw
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param clock: Function returning the current time in seconds, the same clock used for the fleet moves
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.canvas = canvas
+        self.fleet = fleet
+        self.center_x = center_x
+        self.center_y = center_y
+        self.scale = scale
+        self.clock = clock
+
+        self.frames = 0
+        self.worst_frame_time = 0.0
+
+        self._fps = 0
+        self._start_time = None
+        self._last_tick = None
+        self._after_id = None
+
+        line_thickness = 2
+        self.arm1_lines = [canvas.create_line(0, 0, 0, 0, fill="black", width=line_thickness)
+                           for _ in range(len(fleet))]
+        self.arm2_lines = [canvas.create_line(0, 0, 0, 0, fill="black", width=line_thickness)
+                           for _ in range(len(fleet))]
+        self.draw()
+
+    def draw(self):
+        """
+        Push the current fleet poses to the canvas. Arms without a solution keep their previous drawing
+        """
+        base_x, base_y, x1, y1, x2, y2 = self.fleet.get_world_poses()
+
+        # Translate all arms to canvas coordinates at once and hand plain floats to tkinter
+        world_points = np.column_stack((base_x, base_y, x1, y1, x2, y2)) * self.scale
+        world_points[:, 0::2] += self.center_x
+        world_points[:, 1::2] *= -1
+        world_points[:, 1::2] += self.center_y
+        canvas_points = world_points.tolist()
+
+        for arm1, arm2, ok, (bx, by, cx1, cy1, cx2, cy2) in zip(self.arm1_lines, self.arm2_lines,
+                                                                self.fleet.reachable.tolist(), canvas_points):
+            if ok:
+                self.canvas.coords(arm1, bx, by, cx1, cy1)
+                self.canvas.coords(arm2, cx1, cy1, cx2, cy2)
+
+    def set_transform(self, center_x, center_y, scale):
+        """
+        Draw the next frames with a new world to canvas transform, e.g. as a Viewport listener
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.center_x, self.center_y, self.scale = center_x, center_y, scale
+
+    def start(self, fps):
+        """
+        Start the render loop - Every tick updates the whole fleet for the current time and draws it
+        :param fps: The target frame rate
+        """
+        self.stop()
+
+        self._fps = fps
+        self.frames = 0
+        self.worst_frame_time = 0.0
+        self._start_time = self.clock()
+        self._last_tick = None
+        self._tick()
+
+    def stop(self):
+        """
+        Stop the render loop
+        """
+        if self._after_id is not None:
+            self.canvas.after_cancel(self._after_id)
+            self._after_id = None
+
+    def get_stats(self):
+        """
+        :return: A dict with the drawn frames, the achieved fps and the worst time between two frames in seconds
+        """
+        elapsed = self.clock() - self._start_time if self._start_time is not None else 0.0
+
+        return {
+            "frames": self.frames,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "worst_frame_time": self.worst_frame_time,
+        }
+
+    def _tick(self):
+        now = self.clock()
+        if self._last_tick is not None:
+            self.worst_frame_time = max(self.worst_frame_time, now - self._last_tick)
+        self._last_tick = now
+
+        if instrumentation.enabled:
+            start = instrumentation.now()
+            self.fleet.update(now)
+            solved = instrumentation.now()
+            self.draw()
+            drawn = instrumentation.now()
+            instrumentation.record("fleet.update", start, solved - start, {"arms": len(self.fleet)})
+            instrumentation.record("canvas.coords", solved, drawn - solved, {"arms": len(self.fleet)})
+            instrumentation.record("frame", start, drawn - start, {"frame": self.frames})
+        else:
+            self.fleet.update(now)
+            self.draw()
+        self.frames += 1
+
+        # Wake up at the start of the next frame on the clock, so that slow frames do not add up
+        next_frame = math.floor((now - self._start_time) * self._fps) + 1
+        next_time = self._start_time + next_frame / self._fps
+        delay = max(0, math.ceil((next_time - self.clock()) * 1000))
+        self._after_id = self.canvas.after(delay, self._tick)
+
+
+def run_fleet_demo(count=200, seconds=10.0, fps=60, seed=0):
+    """
+    Open a window with a random fleet moving to random targets, and print the achieved frame rate when done
+    :param count: Number of arms
+    :param seconds: How long the fleet runs before the window closes
+    :param fps: The target frame rate
+    :param seed: The seed of the random fleet and targets
+    """
+    # The GUI helpers are only needed here, keep the fleet module importable without a display
+    import FinalProjectRobotics as gui
+
+    rng = np.random.default_rng(seed)
+    fleet = create_random_fleet(count, rng)
+
+    gui.root, gui.canvas = gui.create_root_and_canvas()
+    gui.root.update()
+    gui.get_viewport().bind_mouse()
+    gui.viewport.fit(float(np.hypot(fleet.base_x, fleet.base_y).max()) + 90)
+
+    center_x, center_y = gui.get_center_xy()
+    renderer = FleetRenderer(gui.canvas, fleet, center_x, center_y, scale=gui.viewport.scale)
+    gui.set_move_listener(renderer.set_transform)
+
+    # Give the arms that arrived new targets a few times per second
+    def retarget():
+        retarget_fleet(fleet, rng, renderer.clock(), 1.0)
+        gui.root.after(250, retarget)
+
+    def finish():
+        renderer.stop()
+        stats = renderer.get_stats()
+        print(f"Fleet: {len(fleet)} arms, {stats['frames']} frames at {stats['fps']:.1f} FPS, "
+              f"worst frame time {stats['worst_frame_time'] * 1000:.1f} ms")
+        gui.root.destroy()
+
+    retarget()
+    renderer.start(fps)
+    gui.root.after(int(seconds * 1000), finish)
+    gui.root.mainloop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a fleet of robotic arms on one canvas and report the frame rate")
+    parser.add_argument("--arms", type=int, default=200, help="Number of arms")
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long the fleet runs")
+    parser.add_argument("--fps", type=float, default=60, help="Target frame rate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random fleet and targets")
+    args = parser.parse_args()
+
+    run_fleet_demo(args.arms, args.seconds, args.fps, args.seed)
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+
+from kinematics import are_coords_inside_workspace, get_arm1_coords, get_single_arm1_coords_from_direction
+
+
+class IKCache:
+    """
+    Bounded LRU cache in front of get_arm1_coords and get_single_arm1_coords_from_direction
+    Targets are quantized to a grid of `quantum` units, so repeated targets that differ only by rounding noise share
+    one cached solution. The solution is computed for the quantized target
+    """
+
+    def __init__(self, quantum=1e-6, max_size=4096):
+        """
+        :param quantum: The grid size targets are rounded to before looking them up
+        :param max_size: The maximum number of cached solutions, the least recently used one is evicted when full
+        """
+        if quantum <= 0:
+            raise ValueError("quantum must be greater than 0")
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+
+        self.quantum = quantum
+        self.max_size = max_size
+
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def solve(self, l1, l2, x2, y2, direction):
+        """
+        Get arm1 coordinates for the arm edge at (x2, y2), from the cache if possible
+        :param l1: The arm length L1
+        :param l2: The arm length L2
+        :param x2: The x2 coordinate of arm2
+        :param y2: The y2 coordinate of arm2
+        :param direction: The picked direction - 1 for clockwise and 0 for counterclockwise
+        :return: A tuple (x1, y1) representing arm1's coordinates, or (None, None) if (x2, y2) is not inside workspace
+        """
+        qx = round(x2 / self.quantum)
+        qy = round(y2 / self.quantum)
+        key = (l1, l2, direction, qx, qy)
+
+        solution = self._entries.get(key)
+        if solution is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return solution
+
+        self.misses += 1
+        solution = self._compute(l1, l2, qx * self.quantum, qy * self.quantum, direction)
+
+        self._entries[key] = solution
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return solution
+
+    @staticmethod
+    def _compute(l1, l2, x2, y2, direction):
+        if not are_coords_inside_workspace(l1, l2, x2, y2):
+            return None, None
+
+        x1a, y1a, x1b, y1b = get_arm1_coords(l1, l2, x2, y2, verbose=False)
+        return get_single_arm1_coords_from_direction(x2, y2, x1a, y1a, x1b, y1b, direction, verbose=False)
+
+    def get_stats(self):
+        """
+        Get the cache counters, to size the cache under real load
+        :return: A dict with the size, max_size, hits, misses, evictions and hit_rate of the cache
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """
+        Remove all cached solutions and reset the counters
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from kinematics import MOVE_VALID, get_workspace_radius
+from kinematics_batch import check_arm_moves_batch, solve_arm_batch
+
+# Requests that are solved in vectorized batches and the fields each one needs
+BATCH_OPS = {
+    "workspace": ("l1", "l2", "x", "y"),
+    "ik": ("l1", "l2", "x2", "y2", "direction"),
+    "move": ("l1", "l2", "x2", "y2", "xt", "yt"),
+}
+
+
+class LatencyHistogram:
+    """
+    Histogram of request latencies with power of 2 microsecond buckets
+    """
+
+    def __init__(self, buckets=24):
+        """
+        :param buckets: Number of buckets, the last one also counts all slower requests
+        """
+        self.counts = [0] * buckets
+        self.total = 0
+        self.max_latency = 0.0
+
+    def record(self, seconds):
+        """
+        Add one latency to the histogram
+        :param seconds: The latency in seconds
+        """
+        micros = int(seconds * 1e6)
+        index = min(micros.bit_length(), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        self.max_latency = max(self.max_latency, seconds)
+
+    def get_percentile(self, percent):
+        """
+        :param percent: The percentile in [0, 100]
+        :return: The upper bound in microseconds of the bucket holding the percentile, 0 if nothing is recorded
+        """
+        if self.total == 0:
+            return 0
+
+        needed = self.total * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= needed:
+                return 2 ** index
+        return 2 ** (len(self.counts) - 1)
+
+    def to_dict(self):
+        """
+        :return: A JSON friendly dict of the histogram
+        """
+        return {
+            "count": self.total,
+            "buckets_us": {f"<{2 ** index}": count for index, count in enumerate(self.counts) if count},
+            "p50_us": self.get_percentile(50),
+            "p99_us": self.get_percentile(99),
+            "max_us": round(self.max_latency * 1e6),
+        }
+
+
+class IKServer:
+    """
+    Line delimited JSON server for workspace checks, IK and straight move validation
+    Every request is a JSON object on its own line with an "op" field and an optional "id" that is echoed back.
+    Requests arriving within `batch_window` seconds are coalesced and solved with one vectorized call per (op, L1, L2)
+    """
+
+    def __init__(self, batch_window=0.001, max_batch_size=8192, max_pending=65536, max_in_flight=1024):
+        """
+        :param batch_window: Seconds to wait for more requests after the first one of a batch
+        :param max_batch_size: Maximum number of requests solved in one batch
+        :param max_pending: Maximum number of requests waiting for a batch, more requests are rejected as busy
+        :param max_in_flight: Maximum number of unanswered requests per connection, the connection is not read further
+        until some of them are answered
+        """
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+
+        self._queue = None
+        self._batch_task = None
+        self._server = None
+
+    async def start_tcp(self, host, port):
+        """
+        Start listening on a TCP address
+        :param host: The host to bind, use 127.0.0.1 to only serve the local machine
+        :param port: The port to bind
+        """
+        self._start_batching()
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+
+    async def start_unix(self, path):
+        """
+        Start listening on a Unix socket
+        :param path: The path of the socket
+        """
+        self._start_batching()
+        self._server = await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stop listening and stop the batching task
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+
+    def _start_batching(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        self._batch_task = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve one client connection until it is closed
+        :param reader: The asyncio stream reader of the connection
+        :param writer: The asyncio stream writer of the connection
+        """
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        async def answer(line):
+            try:
+                response = await self.submit(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                # Backpressure - Stop reading from the socket while too many requests are unanswered
+                await in_flight.acquire()
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def submit(self, line):
+        """
+        Handle one request line
+        :param line: The JSON request as bytes or str
+        :return: The response dict
+        """
+        start = time.perf_counter()
+        self.requests += 1
+
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+        except (ValueError, AttributeError):
+            return {"error": "invalid JSON object"}
+
+        response = {"id": request.get("id")}
+
+        if op == "stats":
+            response.update(self.get_stats())
+            return response
+
+        if op not in BATCH_OPS:
+            response["error"] = f"unknown op {op!r}"
+            return response
+
+        try:
+            values = tuple(float(request[field]) for field in BATCH_OPS[op])
+        except (KeyError, TypeError, ValueError):
+            response["error"] = f"op {op!r} needs numeric fields {', '.join(BATCH_OPS[op])}"
+            return response
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((op, values, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            response["error"] = "server busy"
+            return response
+
+        response.update(await future)
+        self.histogram.record(time.perf_counter() - start)
+        return response
+
+    def get_stats(self):
+        """
+        :return: A dict with the request counters and the latency histogram
+        """
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "latency": self.histogram.to_dict(),
+        }
+
+    async def _batch_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # Give other requests a small time window to join the batch
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self.batches += 1
+            try:
+                solve_batch(batch)
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result({"error": f"solver failed: {error}"})
+
+
+def solve_batch(batch):
+    """
+    Solve a batch of requests with one vectorized call per (op, L1, L2) group and resolve their futures
+    :param batch: List of tuples (op, values, future) where values holds the BATCH_OPS fields of op
+    """
+    groups = {}
+    for op, values, future in batch:
+        groups.setdefault((op, values[0], values[1]), []).append((values[2:], future))
+
+    for (op, l1, l2), items in groups.items():
+        columns = np.array([values for values, _ in items], dtype=float).T
+        futures = [future for _, future in items]
+
+        if op == "workspace":
+            ext_r, int_r = get_workspace_radius(l1, l2)
+            dist_sq = columns[0] ** 2 + columns[1] ** 2
+            inside = (dist_sq < ext_r ** 2) & (dist_sq > int_r ** 2)
+            results = [{"inside": value} for value in inside.tolist()]
+
+        elif op == "ik":
+            x1, y1, shoulder, elbow, reachable = solve_arm_batch(l1, l2, columns[0], columns[1], columns[2])
+            results = [
+                {"reachable": ok, "x1": values[0], "y1": values[1], "shoulder": values[2], "elbow": values[3]}
+                if ok else {"reachable": False}
+                for ok, values in zip(reachable.tolist(), np.column_stack((x1, y1, shoulder, elbow)).tolist())
+            ]
+
+        else:
+            status, xs1, ys1, xs2, ys2 = check_arm_moves_batch(l1, l2, *columns)
+            results = [
+                {"status": code, "valid": code == MOVE_VALID,
+                 "intersections": None if np.isnan(points[0]) else [points[0:2], points[2:4]]}
+                for code, points in zip(status.tolist(), np.column_stack((xs1, ys1, xs2, ys2)).tolist())
+            ]
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def main(args):
+    server = IKServer(args.batch_window / 1000, args.max_batch_size, args.max_pending, args.max_in_flight)
+
+    if args.unix:
+        await server.start_unix(args.unix)
+        print(f"IK server listening on {args.unix}")
+    else:
+        await server.start_tcp(args.host, args.port)
+        print(f"IK server listening on {args.host}:{args.port}")
+
+    await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local line delimited JSON server for the robotic arm kinematics")
+    parser.add_argument("--unix", help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host to bind")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to bind")
+    parser.add_argument("--batch-window", type=float, default=1.0, help="Batching time window in ms")
+    parser.add_argument("--max-batch-size", type=int, default=8192, help="Maximum requests per batch")
+    parser.add_argument("--max-pending", type=int, default=65536, help="Maximum queued requests before rejecting")
+    parser.add_argument("--max-in-flight", type=int, default=1024, help="Maximum unanswered requests per connection")
+
+    asyncio.run(main(parser.parse_args()))
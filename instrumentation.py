@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+
+# Instrumentation is opt-in - Instrumented code checks this flag before taking any timestamps, so when disabled the
+# only cost is one global lookup
+enabled = False
+
+# Clock of all recorded events, in seconds
+now = time.perf_counter
+
+# Per name statistics as [count, total_seconds, max_seconds]
+_stats = {}
+
+# Chrome trace events, bounded by _max_events
+_events = []
+_max_events = 0
+_dropped_events = 0
+_trace_origin = 0.0
+
+
+def enable(trace=True, max_events=1000000):
+    """
+    Start recording
+    :param trace: If True keep every event for write_chrome_trace, otherwise only the per name statistics
+    :param max_events: Maximum number of kept trace events, later events are only counted in the statistics
+    """
+    global enabled, _max_events, _trace_origin
+
+    reset()
+    _max_events = max_events if trace else 0
+    _trace_origin = now()
+    enabled = True
+
+
+def disable():
+    """
+    Stop recording, keeping what was recorded so far
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Drop all recorded statistics and events
+    """
+    global _dropped_events
+
+    _stats.clear()
+    _events.clear()
+    _dropped_events = 0
+
+
+def record(name, start, duration, args=None):
+    """
+    Record one timed event
+    :param name: The event name, e.g. "canvas.coords"
+    :param start: The start time of the event as returned by now()
+    :param duration: The duration of the event in seconds
+    :param args: Optional dict of extra values shown with the event in the trace
+    """
+    global _dropped_events
+
+    stats = _stats.get(name)
+    if stats is None:
+        _stats[name] = [1, duration, duration]
+    else:
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+
+    if len(_events) < _max_events:
+        event = {"name": name, "ph": "X", "ts": (start - _trace_origin) * 1e6, "dur": duration * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        _events.append(event)
+    elif _max_events:
+        _dropped_events += 1
+
+
+def get_stats():
+    """
+    :return: A dict of name to a dict with the count, total_ms, mean_us and max_us of its events
+    """
+    return {
+        name: {
+            "count": count,
+            "total_ms": total * 1e3,
+            "mean_us": total / count * 1e6,
+            "max_us": maximum * 1e6,
+        }
+        for name, (count, total, maximum) in _stats.items()
+    }
+
+
+def print_stats():
+    """
+    Console print the per name statistics
+    """
+    for name, stats in sorted(get_stats().items()):
+        print(f"{name:<24} count {stats['count']:>8}  total {stats['total_ms']:>10.3f} ms  "
+              f"mean {stats['mean_us']:>10.1f} us  max {stats['max_us']:>10.1f} us")
+    if _dropped_events:
+        print(f"{_dropped_events} trace events dropped")
+
+
+def write_chrome_trace(path):
+    """
+    Write the recorded events as a Chrome trace JSON file, viewable in chrome://tracing or Perfetto
+    :param path: The output file path
+    """
+    with open(path, "w") as file:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms",
+                   "otherData": {"dropped_events": _dropped_events}}, file)
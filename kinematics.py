@@ -0,0 +1,384 @@
+import math
+
+# Possible results of the straight move validation done by check_arm_move
+MOVE_VALID = 0
+MOVE_OUTSIDE_WORKSPACE = 1
+MOVE_CROSSES_ORIGIN = 2
+MOVE_INTERSECTS_INNER_CIRCLE = 3
+# Set by obstacles.check_arm_move_obstacles when a link of the moving arm hits an obstacle
+MOVE_COLLIDES_OBSTACLE = 4
+
+
+def get_workspace_radius(l1, l2):
+    """
+    Calculate the external R and internal r radius for workspace
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :return: A tuple (ext_r, int_r) representing the external and internal workspace radius accordingly
+    """
+    ext_r = l1 + l2
+    int_r = abs(l1 - l2)
+
+    return ext_r, int_r
+
+
+def check_arm_lengths_fit_size(l1, l2, width, height):
+    """
+    Check if the provided arm lengths fit a drawing area of the given size
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param width: The width of the drawing area
+    :param height: The height of the drawing area
+    :return: Boolean True if arm lengths fit the area or False if not
+    """
+    # Check if L1 and L2 are smaller than the area size when stretched
+    return (l1 + l2) <= width / 2 and (l1 + l2) <= height / 2
+
+
+def are_coords_inside_workspace(l1, l2, x, y):
+    """
+    Check if provided (x, y) coordinate is inside workspace
+    :param l1: The arm1 length
+    :param l2: The arm2 length
+    :param x: The x coordinate to check
+    :param y: The y coordinate to check
+    :return: Boolean True if provided (x, y) is inside workspace or False if not
+    """
+    # Retrieve the R and r radius
+    ext_r, int_r = get_workspace_radius(l1, l2)
+
+    # Check booleans by computing specific functions for R and r
+    is_lower_ext_radius = x ** 2 + y ** 2 < ext_r ** 2
+    is_higher_int_radius = x ** 2 + y ** 2 > int_r ** 2
+
+    if is_lower_ext_radius and is_higher_int_radius:
+        return True
+    else:
+        return False
+
+
+def get_arm1_coords(l1, l2, x2, y2, verbose=True):
+    """
+    Compute the 2 different coordinate solutions for arm1
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param x2: The coordinate x2 from arm2
+    :param y2: The coordinate y2 from arm2
+    :param verbose: If True console print the solutions
+    :return: A tuple (x1a, y1a, x1b, y1b) representing the different coordinate solutions for arm1
+    """
+    # Compute the variable c from provided lab notes
+    c = (y2 ** 2 + x2 ** 2 + l1 ** 2 - l2 ** 2) / 2
+
+    # Compute the 2 possible coordinate solutions from provided lab notes
+    if x2 != 0:
+        # Compute delta from provided lab notes
+        delta = (4 * c ** 2 * y2 ** 2) - 4 * ((y2 ** 2 + x2 ** 2) * (c ** 2 - (l1 ** 2 * x2 ** 2)))
+
+        y1a = (2 * c * y2 + math.sqrt(delta)) / (2 * (x2 ** 2 + y2 ** 2))
+        x1a = calculate_arm1_x1(c, y1a, x2, y2)
+
+        y1b = (2 * c * y2 - math.sqrt(delta)) / (2 * (x2 ** 2 + y2 ** 2))
+        x1b = calculate_arm1_x1(c, y1b, x2, y2)
+    else:
+        # We are safe from arm_y2 = 0, as arm_x2 is already 0 and this combination (0, 0) has already been excluded
+        # in previous step
+        y1a = c / y2
+        x1a = math.sqrt(l1 ** 2 - (c ** 2 / y2 ** 2))
+
+        y1b = y1a
+        x1b = -x1a
+
+    if verbose:
+        print(f"Coordinate solution (x1a, y1a): ({x1a}, {y1a})")
+        print(f"Coordinate solution (x1b, y1b): ({x1b}, {y1b})")
+    return x1a, y1a, x1b, y1b
+
+
+def calculate_arm1_x1(c, y1, x2, y2):
+    """
+    Compute arm1 x1 coordinate when x2 from arm2 is not 0
+    :param c: The stable c number as defined in robotics lab notes
+    :param y1: The coordinate y1 from arm1
+    :param x2: The coordinate x2 from arm2
+    :param y2: The coordinate y2 from arm2
+    :return: The coordinate x1 from arm1
+    """
+    return (c - (y2 * y1)) / x2
+
+
+def get_single_arm1_coords_from_direction(x2, y2, x1a, y1a, x1b, y1b, direction, verbose=True):
+    """
+    Pick a single arm1 coordinates from the double coordinate solutions according to user's desire
+    :param x2: The x2 coordinate of arm2
+    :param y2: The y2 coordinate of arm2
+    :param x1a: The x1a coordinate of arm1
+    :param y1a: The y1a coordinate of arm1
+    :param x1b: The x1b coordinate of arm1
+    :param y1b: The y1b coordinate of arm1
+    :param direction: The user's picked direction
+    :param verbose: If True console print the picked coordinates
+    :return: A tuple (x1, y1) representing arm1's coordinates
+    """
+    # Calculate negative f1 for (arm_x1b, arm_y1b)
+    f1 = - atn2(x1b, y1b)
+
+    # Calculate new coordinates in the new system - First move and then rotate
+    x2_move = x2 - x1b
+    y2_move = y2 - y1b
+
+    x2_rot = (x2_move * math.cos(f1)) - (y2_move * math.sin(f1))
+    y2_rot = (x2_move * math.sin(f1)) + (y2_move * math.cos(f1))
+
+    # Calculate f2 for (x2_rot, y2_rot) - Enough to make final decision on arm1 coordinates
+    f2 = atn2(x2_rot, y2_rot)
+
+    # Check if f2 is left or right turn view
+    if 0 < f2 < math.pi:
+        # Counterclockwise
+        turn_view = 0
+    else:
+        # Clockwise
+        turn_view = 1
+
+    # Check what the user picked as desired direction
+    if direction == turn_view:
+        x1, y1 = x1b, y1b
+    else:
+        x1, y1 = x1a, y1a
+
+    if verbose:
+        print_arm1_coordinates(x1, y1)
+    return x1, y1
+
+
+def print_arm1_coordinates(x1, x2):
+    """
+    Console print the arm1 coordinates
+    :param x1: The x1 coordinate of arm1
+    :param x2: The y1 coordinate of arm1
+    """
+    print(f"Coordinates (x1, y1): ({x1}, {x2})")
+
+
+def check_arm_move(l1, l2, x2, y2, xt, yt):
+    """
+    Check if a straight move of the arm edge from (x2, y2) to (xt, yt) is valid, i.e. (xt, yt) is inside workspace
+    and the move path does not cross the internal workspace circle
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param x2: The x coordinate of arm2
+    :param y2: The y coordinate of arm2
+    :param xt: The desired x coordinate to move to
+    :param yt: The desired y coordinate to move to
+    :return: A tuple (status, xs1, ys1, xs2, ys2) with one of the MOVE_* status values and the intersection points
+    of the move line with the internal circle. The intersection points are None if they were not computed
+    """
+    # Init check if new desired (xt, yt) is inside workspace
+    if not are_coords_inside_workspace(l1, l2, xt, yt):
+        return MOVE_OUTSIDE_WORKSPACE, None, None, None, None
+
+    if xt != x2:
+        # Calculate a and b constant values
+        a = (yt - y2) / (xt - x2)
+        b = y2 - a * x2
+        delta = (4 * a ** 2 * b ** 2) - (4 * ((a ** 2 + 1) * (b ** 2 - (l1 - l2) ** 2)))
+
+        # Check delta
+        if delta <= 0:
+            # Check special case where L1 = L2 and move path goes through (0 , 0) coordinate point
+            # This should be treated as invalid move
+            if l1 == l2 and x2 == xt * (-1) and y2 == yt * (-1):
+                return MOVE_CROSSES_ORIGIN, None, None, None, None
+            return MOVE_VALID, None, None, None, None
+
+        # Find the 2 intersection points (xs1, ys1) and (xs2, ys2)
+        xs1 = ((-2 * a * b) + math.sqrt(delta)) / (2 * (a ** 2 + 1))
+        ys1 = (a * xs1) + b
+
+        xs2 = ((-2 * a * b) - math.sqrt(delta)) / (2 * (a ** 2 + 1))
+        ys2 = (a * xs2) + b
+    else:
+        if abs(x2) > abs(l1 - l2):
+            return MOVE_VALID, None, None, None, None
+
+        # Find the 2 intersection points (xs1, ys1) and (xs2, ys2)
+        xs1 = x2
+        ys1 = math.sqrt((l1 - l2) ** 2 - xs1 ** 2)
+
+        xs2 = x2
+        ys2 = -ys1
+
+    # Check intersection distances and define if valid move
+    if is_valid_arm_move_as_for_distances_check(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
+        return MOVE_VALID, xs1, ys1, xs2, ys2
+    return MOVE_INTERSECTS_INNER_CIRCLE, xs1, ys1, xs2, ys2
+
+
+def check_joint_move(l1, l2, xt, yt):
+    """
+    Check if a joint space move of the arm to (xt, yt) is valid, see trajectory.plan_joint_move. All poses between
+    two reachable poses are reachable in joint space, so only (xt, yt) must be inside workspace
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param xt: The desired x coordinate to move to
+    :param yt: The desired y coordinate to move to
+    :return: MOVE_VALID or MOVE_OUTSIDE_WORKSPACE
+    """
+    if not are_coords_inside_workspace(l1, l2, xt, yt):
+        return MOVE_OUTSIDE_WORKSPACE
+    return MOVE_VALID
+
+
+def is_valid_arm_move_as_for_distances_check(x2, y2, xt, yt, xs1, ys1, xs2, ys2):
+    """
+    Check if an arm move is valid as for calculated distances between arm edge coordinates,
+    new desired coordinates, and the intersection points with the small round circle r
+    :param x2: The x2 coordinate of arm2
+    :param y2: The y2 coordinate of arm2
+    :param xt: The desired x coordinate to move to
+    :param yt: The desired y coordinate to move to
+    :param xs1: The x coordinate of intersection 1 with small round circle r
+    :param ys1: The y coordinate of intersection 1 with small round circle r
+    :param xs2: The x coordinate of intersection 2 with small round circle r
+    :param ys2: The y coordinate of intersection 2 with small round circle r
+    :return: Boolean True if move is valid or False if not
+    """
+    # Compute different distances between arm points and intersections
+    dis_2t = math.sqrt((yt - y2) ** 2 + (xt - x2) ** 2)
+    dis_2s1 = math.sqrt((ys1 - y2) ** 2 + (xs1 - x2) ** 2)
+    dis_2s2 = math.sqrt((ys2 - y2) ** 2 + (xs2 - x2) ** 2)
+    dis_ts1 = math.sqrt((ys1 - yt) ** 2 + (xs1 - xt) ** 2)
+    dis_ts2 = math.sqrt((ys2 - yt) ** 2 + (xs2 - xt) ** 2)
+
+    # Find min between dis_2s1 and dis_2s2
+    min_dis_2s = min(dis_2s1, dis_2s2)
+
+    # Find min between dis_ts1 and dis_ts2
+    min_dis_ts = min(dis_ts1, dis_ts2)
+
+    # Find max between min_dis_2s and min_dis_ts
+    max_dis = max(min_dis_2s, min_dis_ts)
+
+    # Compare max_dis to dis_2t
+    if max_dis > dis_2t:
+        # Valid move
+        return True
+    else:
+        return False
+
+
+def atn2(x, y):
+    """
+    Angle of arm and axis OX in RAD - Copied from robotics lab notes
+    :param x: The x arm coordinate
+    :param y: The y arm coordinate
+    :return: The angle of arm in RAD
+    """
+    # if the value of X moves to infinity on the y-axis
+    if abs(x) < 0.0001:
+        if y > 0:  # 90o or P/2
+            return math.pi / 2
+        else:  # 270o - P/2
+            return 3 * math.pi / 2
+    else:  # x greater than 0.0001
+        if x > 0 and y >= 0:  # 1st quarter
+            return math.atan(y / x)
+        elif x > 0 > y:  # 4th quarter
+            return math.atan(y / x) + 2 * math.pi
+        else:
+            return math.atan(y / x) + math.pi
+
+
+def calculate_first_arm(x2, y2, l1, l2, direction):
+    """
+    Calculate the movement of the arm1 (x1, y1) while arm2 takes a new position
+    :param x2: The updated x coordinate of arm2
+    :param y2: The updated y coordinate of arm2
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param direction: The chosen direction from User - 1 for clockwise and 0 for counterclockwise
+    :return: A tuple (x1, y1) representing the updated coordinates of arm1
+    """
+    # Calculate the distance from the origin (0,0) to the second arm's endpoint
+    distance = math.sqrt(x2 ** 2 + y2 ** 2)
+
+    # Check if the point is reachable
+    if distance > l1 + l2 or distance < abs(l1 - l2):
+        return None, None  # The point is not reachable
+
+    # Angle between the line connecting origin (0,0) with the second arm's endpoint and X axis
+    angle_to_endpoint = math.atan2(y2, x2)
+
+    # Use the law of cosines to find the angle between the first arm
+    # and the line connecting origin (0,0) with second arm endpoint
+    # Clamp to [-1, 1] to absorb rounding on the workspace boundaries
+    cos_angle = (l1 ** 2 + distance ** 2 - l2 ** 2) / (2 * l1 * distance)
+    angle1 = math.acos(min(max(cos_angle, -1.0), 1.0))
+
+    # Based on User's picked arm direction, the final angle between first arm and X axis will be either
+    # the subtraction of angle1 from angle_to_endpoint in case of counterclockwise
+    # Or the sum of angle1 and angle_to_endpoint in case of clockwise
+    if direction == 0:
+        # For counterclockwise
+        final_angle = angle_to_endpoint - angle1
+    else:
+        # For clockwise
+        final_angle = angle_to_endpoint + angle1
+
+    # Calculate the new (x1, y1) for the first arm
+    x1 = l1 * math.cos(final_angle)
+    y1 = l1 * math.sin(final_angle)
+
+    return x1, y1
+
+
+def get_joint_angles(x1, y1, x2, y2):
+    """
+    Compute the shoulder and elbow joint angles of the robotic arm
+    :param x1: The x1 coordinate of arm1
+    :param y1: The y1 coordinate of arm1
+    :param x2: The x2 coordinate of arm2
+    :param y2: The y2 coordinate of arm2
+    :return: A tuple (shoulder, elbow) in RAD. Shoulder is the angle of arm1 and axis OX, elbow is the angle of arm2
+    relative to arm1, both in (-pi, pi]
+    """
+    shoulder = math.atan2(y1, x1)
+
+    # The elbow angle follows from the cross and dot products of arm1 and arm2 vectors
+    dx = x2 - x1
+    dy = y2 - y1
+    elbow = math.atan2(x1 * dy - y1 * dx, x1 * dx + y1 * dy)
+
+    return shoulder, elbow
+
+
+def iterate_arm_move(direction, x2, y2, xt, yt, l1, l2, steps):
+    """
+    Step the arm edge in a straight line from (x2, y2) to (xt, yt) and compute arm1 on every step
+    The iteration stops early if a step reaches an unreachable point
+    :param direction: The chosen direction from User - 1 for clockwise and 0 for counterclockwise
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate of robotic movement
+    :param yt: The final target y coordinate of robotic movement
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps for the move
+    :return: A generator of tuples (x1, y1, x2, y2) representing the arm pose on every step
+    """
+    # Calculate the increments for each step
+    dx = (xt - x2) / steps
+    dy = (yt - y2) / steps
+
+    for _ in range(steps):
+        # Update the positions
+        x2 += dx
+        y2 += dy
+
+        # Calculate the new position for the first arm
+        x1, y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+        if x1 is None or y1 is None:
+            return
+
+        yield x1, y1, x2, y2
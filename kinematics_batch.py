@@ -0,0 +1,316 @@
+import math
+
+import numpy as np
+
+from kinematics import (MOVE_VALID, MOVE_OUTSIDE_WORKSPACE, MOVE_CROSSES_ORIGIN, MOVE_INTERSECTS_INNER_CIRCLE,
+                        get_workspace_radius)
+
+# Number of points solved at once by the batch solvers, the temporary arrays of a chunk stay in the CPU caches
+CHUNK_SIZE = 8192
+
+
+def atn2_batch(x, y):
+    """
+    Vectorized version of atn2 - Angle of arm and axis OX in RAD in the range [0, 2*pi)
+    :param x: Array of x arm coordinates
+    :param y: Array of y arm coordinates
+    :return: Array of arm angles in RAD
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Silence the division for the x ~ 0 entries, they are replaced below by pi/2 or 3*pi/2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = np.arctan(y / x)
+
+    # 1st quarter keeps atan as is, 4th quarter adds 2*pi, 2nd and 3rd quarter add pi
+    angle = np.where(x > 0, np.where(y >= 0, base, base + 2 * np.pi), base + np.pi)
+
+    # If the value of X moves to infinity on the y-axis
+    return np.where(np.abs(x) < 0.0001, np.where(y > 0, np.pi / 2, 3 * np.pi / 2), angle)
+
+
+def get_reachable_mask(l1, l2, x2, y2):
+    """
+    Compute which (x2, y2) points can be reached by the arm edge
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param x2: Array of x2 coordinates of arm2
+    :param y2: Array of y2 coordinates of arm2
+    :return: Boolean array, True where (x2, y2) is between the internal and external radius and not (0, 0)
+    """
+    x2 = np.asarray(x2, dtype=float)
+    y2 = np.asarray(y2, dtype=float)
+    dist_sq = x2 ** 2 + y2 ** 2
+
+    # Same closed boundaries as calculate_first_arm, while (0, 0) is excluded as in get_arm2_coordinates
+    return (dist_sq <= (l1 + l2) ** 2) & (dist_sq >= (l1 - l2) ** 2) & (dist_sq > 0)
+
+
+def apply_in_chunks(function, *arrays):
+    """
+    Call a function of arrays on chunks of CHUNK_SIZE points and join its output arrays. For large arrays every NumPy
+    operation would go through memory and allocate new memory for its result, while the temporary arrays of a chunk
+    are reused from the CPU caches
+    :param function: Function of the chunk arrays returning a tuple of arrays of the chunk shape
+    :param arrays: The input arrays, broadcast together. Single values are passed to every chunk as they are
+    :return: The tuple of joined output arrays, of the broadcast shape
+    """
+    arrays = [np.asarray(array, dtype=float) for array in arrays]
+    shape = np.broadcast_shapes(*(array.shape for array in arrays))
+    size = math.prod(shape)
+    if size <= CHUNK_SIZE:
+        return function(*arrays)
+
+    flat = [array if array.ndim == 0 else np.broadcast_to(array, shape).reshape(-1) for array in arrays]
+    outputs = None
+    for start in range(0, size, CHUNK_SIZE):
+        results = function(*(array if array.ndim == 0 else array[start:start + CHUNK_SIZE] for array in flat))
+        if outputs is None:
+            outputs = [np.empty(size, dtype=result.dtype) for result in results]
+        for output, result in zip(outputs, results):
+            output[start:start + CHUNK_SIZE] = result
+
+    return tuple(output.reshape(shape) for output in outputs)
+
+
+def get_arm1_frame_batch(l1, l2, x2, y2):
+    """
+    Solve arm1 in the frame of the arm edge - arm1 is (k * x2 - h * y2, k * y2 + h * x2), the point at k times the
+    edge vector moved by h times the edge vector turned by pi/2, and the sign of h picks one of the 2 solutions.
+    Only arithmetic and one square root per point, without trigonometric functions or per point selections
+    :param l1: The arm length L1, single value or array
+    :param l2: The arm length L2, single value or array
+    :param x2: Array of x2 coordinates of arm2
+    :param y2: Array of y2 coordinates of arm2
+    :return: A tuple (k, h, dist_sq, reachable) of arrays with h >= 0, the squared edge distance to (0, 0) and the
+    reachability mask. k and h are NaN for unreachable points
+    """
+    x2, y2 = np.broadcast_arrays(np.asarray(x2, dtype=float), np.asarray(y2, dtype=float))
+    dist_sq = x2 * x2 + y2 * y2
+
+    # Same closed boundaries as calculate_first_arm, while (0, 0) is excluded as in get_arm2_coordinates
+    reachable = (dist_sq <= (l1 + l2) ** 2) & (dist_sq >= (l1 - l2) ** 2) & (dist_sq > 0)
+
+    # Unreachable points get NaN, which goes through all the following math without invalid value warnings
+    with np.errstate(divide='ignore'):
+        inv_dist_sq = np.asarray(1.0 / dist_sq)
+    inv_dist_sq[~reachable] = np.nan
+
+    # Law of cosines - k * |edge| is the projection of arm1 on the edge and h * |edge| the height of arm1 over it
+    k = inv_dist_sq * (0.5 * (l1 ** 2 - l2 ** 2))
+    k += 0.5
+    h = inv_dist_sq * l1 ** 2
+    h -= k * k
+
+    # Clip tiny negative values caused by rounding on the workspace boundaries, NaN is kept
+    h = np.sqrt(np.maximum(h, 0.0))
+
+    return k, h, dist_sq, reachable
+
+
+def get_direction_sign_batch(direction):
+    """
+    :param direction: The picked direction - 1 for clockwise and 0 for counterclockwise, single value or array
+    :return: The sign of h of get_arm1_frame_batch for the direction, -1 for counterclockwise and 1 for clockwise
+    """
+    if np.ndim(direction) == 0:
+        return -1.0 if direction == 0 else 1.0
+    return np.where(np.asarray(direction) == 0, -1.0, 1.0)
+
+
+def get_arm1_coords_batch(l1, l2, x2, y2):
+    """
+    Vectorized version of get_arm1_coords - Compute the 2 different coordinate solutions for arm1
+    Unreachable points get NaN coordinates
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param x2: Array of x2 coordinates of arm2
+    :param y2: Array of y2 coordinates of arm2
+    :return: A tuple (x1a, y1a, x1b, y1b, reachable) of arrays with the solutions for arm1 and the reachability mask
+    """
+    def solve_chunk(x2, y2, l1, l2):
+        k, h, _, reachable = get_arm1_frame_batch(l1, l2, x2, y2)
+
+        # Solution a of the lab notes is on the side of sign(x2), or of -sign(y2) for x2 = 0
+        h = h * np.where(x2 != 0, np.sign(x2), -np.sign(y2))
+        kx = k * x2
+        ky = k * y2
+        hx = h * x2
+        hy = h * y2
+
+        return kx - hy, ky + hx, kx + hy, ky - hx, reachable
+
+    return apply_in_chunks(solve_chunk, x2, y2, l1, l2)
+
+
+def get_single_arm1_coords_from_direction_batch(x2, y2, x1a, y1a, x1b, y1b, direction):
+    """
+    Vectorized version of get_single_arm1_coords_from_direction - Pick a single arm1 solution for every point
+    :param x2: Array of x2 coordinates of arm2
+    :param y2: Array of y2 coordinates of arm2
+    :param x1a: Array of x1a coordinates of arm1
+    :param y1a: Array of y1a coordinates of arm1
+    :param x1b: Array of x1b coordinates of arm1
+    :param y1b: Array of y1b coordinates of arm1
+    :param direction: The picked direction, either a single 0/1 value or an array of them
+    :return: A tuple (x1, y1) of arrays representing arm1's coordinates
+    """
+    # The rotated y2 of get_single_arm1_coords_from_direction is the cross product of arm1 b and the edge over |arm1 b|.
+    # It is positive for the left (0) turn view, otherwise it is the right (1) turn view
+    turn_view = np.where(x1b * y2 - y1b * x2 > 0, 0, 1)
+
+    # Keep solution b where the user's direction matches its turn view, otherwise solution a
+    pick_b = np.asarray(direction) == turn_view
+    x1 = np.where(pick_b, x1b, x1a)
+    y1 = np.where(pick_b, y1b, y1a)
+
+    return x1, y1
+
+
+def get_joint_angles_batch(x1, y1, x2, y2):
+    """
+    Compute the shoulder and elbow joint angles of the robotic arm
+    :param x1: Array of x1 coordinates of arm1
+    :param y1: Array of y1 coordinates of arm1
+    :param x2: Array of x2 coordinates of arm2
+    :param y2: Array of y2 coordinates of arm2
+    :return: A tuple (shoulder, elbow) of arrays in RAD. Shoulder is the angle of arm1 and axis OX in (-pi, pi],
+    elbow is the angle of arm2 relative to arm1 in (-pi, pi]
+    """
+    shoulder = np.arctan2(y1, x1)
+
+    # The elbow angle follows from the cross and dot products of arm1 and arm2 vectors
+    dx = x2 - x1
+    dy = y2 - y1
+    elbow = np.arctan2(x1 * dy - y1 * dx, x1 * dx + y1 * dy)
+
+    return shoulder, elbow
+
+
+def forward_kinematics_batch(l1, l2, shoulder, elbow):
+    """
+    Compute the arm points from the joint angles
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param shoulder: Array of angles of arm1 and axis OX in RAD
+    :param elbow: Array of angles of arm2 relative to arm1 in RAD
+    :return: A tuple (x1, y1, x2, y2) of arrays
+    """
+    x1 = l1 * np.cos(shoulder)
+    y1 = l1 * np.sin(shoulder)
+
+    arm2_angle = shoulder + elbow
+    x2 = x1 + l2 * np.cos(arm2_angle)
+    y2 = y1 + l2 * np.sin(arm2_angle)
+
+    return x1, y1, x2, y2
+
+
+def solve_arm_batch(l1, l2, x2, y2, direction):
+    """
+    Solve the inverse kinematics for many (x2, y2) targets at once, with the same semantics as get_arm1_coords
+    followed by get_single_arm1_coords_from_direction
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param x2: Array of x2 target coordinates of arm2
+    :param y2: Array of y2 target coordinates of arm2
+    :param direction: The picked direction - 1 for clockwise and 0 for counterclockwise, single value or array
+    :return: A tuple (x1, y1, shoulder, elbow, reachable) of arrays. Unreachable points have NaN coordinates and angles
+    """
+    def solve_chunk(x2, y2, direction, l1, l2):
+        k, h, dist_sq, reachable = get_arm1_frame_batch(l1, l2, x2, y2)
+        h = h * get_direction_sign_batch(direction)
+
+        x1 = k * x2 - h * y2
+        y1 = k * y2 + h * x2
+
+        # Joint angles as in get_joint_angles_batch, the cross product of arm1 and arm2 is -h * dist_sq and their
+        # dot product is (dist_sq - L1^2 - L2^2) / 2
+        shoulder = np.arctan2(y1, x1)
+        elbow = np.arctan2(-2 * h * dist_sq, dist_sq - (l1 ** 2 + l2 ** 2))
+
+        return x1, y1, shoulder, elbow, reachable
+
+    return apply_in_chunks(solve_chunk, x2, y2, direction, l1, l2)
+
+
+def calculate_first_arm_batch(x2, y2, l1, l2, direction):
+    """
+    Vectorized version of calculate_first_arm - Calculate arm1 (x1, y1) for many arm2 positions
+    :param x2: Array of x coordinates of arm2
+    :param y2: Array of y coordinates of arm2
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise, single value or array
+    :return: A tuple (x1, y1, reachable) of arrays. Unreachable points have NaN coordinates
+    """
+    def solve_chunk(x2, y2, direction, l1, l2):
+        # The final angle atan2(y2, x2) -/+ acos(...) of calculate_first_arm gives the solution of get_arm1_frame_batch
+        # on the side of the direction, which is found without trigonometric functions
+        k, h, _, reachable = get_arm1_frame_batch(l1, l2, x2, y2)
+        h = h * get_direction_sign_batch(direction)
+
+        return k * x2 - h * y2, k * y2 + h * x2, reachable
+
+    return apply_in_chunks(solve_chunk, x2, y2, direction, l1, l2)
+
+
+def check_arm_moves_batch(l1, l2, x2, y2, xt, yt):
+    """
+    Vectorized straight move validation - Check many moves of the arm edge from (x2, y2) to (xt, yt) at once
+    A move is valid if both of its ends are inside workspace and the closest point of the segment to (0, 0) is not
+    inside the internal circle. For L1 = L2 every segment going through (0, 0) is rejected
+    :param l1: The length L1 of arm1, single value or array
+    :param l2: The length L2 of arm2, single value or array
+    :param x2: Array of start x coordinates of arm2
+    :param y2: Array of start y coordinates of arm2
+    :param xt: Array of target x coordinates
+    :param yt: Array of target y coordinates
+    :return: A tuple (status, xs1, ys1, xs2, ys2) of arrays with the MOVE_* status of every move and the intersection
+    points of the move line with the internal circle. Intersection points are NaN if the line does not cross it
+    """
+    x2, y2, xt, yt = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x2, y2, xt, yt)))
+    ext_r, int_r = get_workspace_radius(np.asarray(l1, dtype=float), np.asarray(l2, dtype=float))
+
+    # Both ends strictly inside workspace, as in are_coords_inside_workspace - The outer circle is convex, so the
+    # whole segment is then inside it
+    start_sq = x2 ** 2 + y2 ** 2
+    target_sq = xt ** 2 + yt ** 2
+    inside = ((start_sq < ext_r ** 2) & (start_sq > int_r ** 2) &
+              (target_sq < ext_r ** 2) & (target_sq > int_r ** 2))
+
+    # Closest point of the segment (x2, y2) + t * (dx, dy), t in [0, 1], to (0, 0)
+    dx = xt - x2
+    dy = yt - y2
+    len_sq = dx ** 2 + dy ** 2
+    dot = x2 * dx + y2 * dy
+    safe_len_sq = np.where(len_sq > 0, len_sq, 1.0)
+    t = np.clip(-dot / safe_len_sq, 0.0, 1.0)
+    min_dist_sq = (x2 + t * dx) ** 2 + (y2 + t * dy) ** 2
+
+    # Touching the internal circle is accepted, as for the tangent (delta = 0) lines of check_arm_move
+    crosses_inner = min_dist_sq < int_r ** 2
+
+    # The segment goes through (0, 0) if the ends are collinear with it and on opposite sides of it. The cross
+    # product is used instead of the distance so that integer inputs are checked exactly
+    crosses_origin = (np.asarray(l1) == np.asarray(l2)) & (x2 * yt - y2 * xt == 0) & (x2 * xt + y2 * yt <= 0)
+
+    status = np.full(x2.shape, MOVE_VALID, dtype=np.int8)
+    status[crosses_inner] = MOVE_INTERSECTS_INNER_CIRCLE
+    status[crosses_origin] = MOVE_CROSSES_ORIGIN
+    status[~inside] = MOVE_OUTSIDE_WORKSPACE
+
+    # Intersections of the move line with the internal circle - |p + s * d| = r solved for s
+    disc = dot ** 2 - len_sq * (start_sq - int_r ** 2)
+    has_points = (disc > 0) & (len_sq > 0)
+    sqrt_disc = np.sqrt(np.where(has_points, disc, 0.0))
+    s1 = np.where(has_points, (-dot + sqrt_disc) / safe_len_sq, np.nan)
+    s2 = np.where(has_points, (-dot - sqrt_disc) / safe_len_sq, np.nan)
+
+    xs1 = x2 + s1 * dx
+    ys1 = y2 + s1 * dy
+    xs2 = x2 + s2 * dx
+    ys2 = y2 + s2 * dy
+
+    return status, xs1, ys1, xs2, ys2
@@ -0,0 +1,351 @@
+import cmath
+import math
+
+import numpy as np
+
+from kinematics import MOVE_OUTSIDE_WORKSPACE, MOVE_VALID, calculate_first_arm, check_arm_move
+from trajectory import Trajectory
+
+# Number of FABRIK iterations of a solve before switching to damped Newton steps, which converge much faster close
+# to the solution but need a good first guess
+FABRIK_ITERATIONS = 10
+
+
+def get_chain_workspace_radius(lengths):
+    """
+    Calculate the external R and internal r radius for the workspace of a planar arm with any number of links
+    :param lengths: Sequence of the link lengths, from the base to the edge
+    :return: A tuple (ext_r, int_r) - The edge reaches every point of the ring between them. int_r is 0 unless one
+    link is longer than all the others together, for 2 links it is |L1 - L2| as get_workspace_radius gives
+    """
+    ext_r = sum(lengths)
+    int_r = max(0.0, 2 * max(lengths) - ext_r)
+
+    return ext_r, int_r
+
+
+def get_equivalent_arm_lengths(lengths):
+    """
+    Get the 2-link arm lengths with the same workspace ring as a chain, so that the 2-link move checks like
+    check_arm_move can be used for it
+    :param lengths: Sequence of the link lengths
+    :return: A tuple (l1, l2) with l1 + l2 = ext_r and l1 - l2 = int_r
+    """
+    ext_r, int_r = get_chain_workspace_radius(lengths)
+    return (ext_r + int_r) / 2, (ext_r - int_r) / 2
+
+
+def are_coords_inside_chain_workspace(lengths, x, y):
+    """
+    Check if provided (x, y) coordinate is inside the workspace of a chain
+    :param lengths: Sequence of the link lengths
+    :param x: The x coordinate to check
+    :param y: The y coordinate to check
+    :return: Boolean True if provided (x, y) is inside workspace or False if not. As for 2 links the external circle
+    is excluded, the internal one too unless its radius is 0
+    """
+    ext_r, int_r = get_chain_workspace_radius(lengths)
+    distance_sq = x ** 2 + y ** 2
+
+    return distance_sq < ext_r ** 2 and (distance_sq > int_r ** 2 or int_r == 0)
+
+
+def check_chain_move(lengths, x, y, xt, yt):
+    """
+    Check if a straight move of the chain edge from (x, y) to (xt, yt) is valid, with the same workspace ring checks
+    as check_arm_move does for 2 links. A chain of more than 2 links with an internal radius of 0 folds to reach
+    (0, 0), so its moves may go through (0, 0), which check_arm_move rejects for L1 = L2
+    :return: A tuple (status, xs1, ys1, xs2, ys2) as check_arm_move returns
+    """
+    ext_r, int_r = get_chain_workspace_radius(lengths)
+    if int_r == 0 and len(lengths) > 2:
+        if not are_coords_inside_chain_workspace(lengths, xt, yt):
+            return MOVE_OUTSIDE_WORKSPACE, None, None, None, None
+        return MOVE_VALID, None, None, None, None
+
+    l1, l2 = get_equivalent_arm_lengths(lengths)
+    return check_arm_move(l1, l2, x, y, xt, yt)
+
+
+def forward_chain(lengths, angles):
+    """
+    Compute the joint points of a chain from its joint angles
+    :param lengths: Sequence of the link lengths
+    :param angles: Sequence of the joint angles in RAD, the first one relative to axis OX and every other one
+    relative to the previous link, as get_joint_angles gives for 2 links
+    :return: A tuple (x1, y1, ..., xn, yn) with the end point of every link
+    """
+    pose = []
+    x = y = heading = 0.0
+    for length, angle in zip(lengths, angles):
+        heading += angle
+        x += length * math.cos(heading)
+        y += length * math.sin(heading)
+        pose += [x, y]
+
+    return tuple(pose)
+
+
+def get_chain_joint_angles(pose):
+    """
+    Compute the joint angles of a chain pose, the inverse of forward_chain
+    :param pose: Sequence (x1, y1, ..., xn, yn) of the link end points
+    :return: A tuple of the joint angles in RAD, each in (-pi, pi]
+    """
+    angles = []
+    x = y = heading = 0.0
+    for i in range(0, len(pose), 2):
+        link_heading = math.atan2(pose[i + 1] - y, pose[i] - x)
+        angles.append((link_heading - heading + math.pi) % (2 * math.pi) - math.pi if i else link_heading)
+        heading = link_heading
+        x, y = pose[i], pose[i + 1]
+
+    return tuple(angles)
+
+
+class ChainIKSolver:
+    """
+    IK for a planar arm of N links. 2 links are solved in closed form with calculate_first_arm, longer chains with
+    FABRIK (Forward And Backward Reaching Inverse Kinematics): every iteration drags the links from the edge to the
+    target and back from the base to (0, 0), keeping every link length, until the edge is within `tolerance` of
+    the target.
+
+    Every solve starts from the previous solved pose (warm start). Along a path the edge only moves a little between
+    two solves, so a few iterations are enough and the chain keeps its bends instead of jumping to another of the
+    infinitely many solutions. The first solve, or the one after reset, starts from an arc with all joints bent by the
+    same angle to the side of the chosen direction - clockwise for direction 1, as calculate_first_arm does for 2
+    links - which already reaches the target unless it is closer to (0, 0) than the most folded arc.
+
+    With the default tolerance of 1e-6, warm started solves along a dense path and cold started solves take well below
+    a millisecond for up to 6 links, about 0.1 to 0.2 ms at the 99th percentile. benchmarks.py fails if a solve stays
+    above a millisecond, see run_chain_benchmarks
+    """
+
+    def __init__(self, lengths, direction, tolerance=1e-6, max_iterations=500):
+        """
+        :param lengths: Sequence of at least 2 link lengths, from the base to the edge
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param tolerance: Largest accepted distance of the edge to the target, in the unit of the lengths
+        :param max_iterations: Largest number of FABRIK iterations of one solve
+        """
+        if len(lengths) < 2:
+            raise ValueError("A chain needs at least 2 links")
+        if any(length <= 0 for length in lengths):
+            raise ValueError("Link lengths must be greater than 0")
+
+        self.lengths = [float(length) for length in lengths]
+        self.direction = direction
+        self.max_iterations = max_iterations
+
+        ext_r, int_r = get_chain_workspace_radius(self.lengths)
+        self.tolerance = tolerance
+        self._ext_r = ext_r
+        self._int_r = int_r
+        self._damping = (1e-4 * ext_r) ** 2
+
+        # Current pose as a list [x1, y1, ..., xn, yn], None until the first solve
+        self.pose = None
+
+        self.solves = 0
+        self.iterations = 0
+        self.unconverged = 0
+
+    def reset(self):
+        """
+        Forget the current pose, the next solve starts from the arc of the chosen direction
+        """
+        self.pose = None
+
+    def solve(self, x, y):
+        """
+        Get the link end points for the chain edge at (x, y)
+        :param x: The x coordinate of the edge
+        :param y: The y coordinate of the edge
+        :return: A tuple (x1, y1, ..., xn, yn), or None if (x, y) is not reachable. If FABRIK did not reach the
+        tolerance in max_iterations the closest pose is returned, and counted as unconverged
+        """
+        distance = math.sqrt(x ** 2 + y ** 2)
+        if distance > self._ext_r or distance < self._int_r:
+            return None
+
+        self.solves += 1
+        if len(self.lengths) == 2:
+            x1, y1 = calculate_first_arm(x, y, self.lengths[0], self.lengths[1], self.direction)
+            if x1 is None:
+                return None
+            self.pose = [x1, y1, x, y]
+            return tuple(self.pose)
+
+        if self.pose is None:
+            self.pose = self._get_start_pose(x, y)
+
+        self.pose = self._fabrik(self.pose, x, y)
+        return tuple(self.pose)
+
+    def get_stats(self):
+        """
+        :return: A dict with the number of solves, the FABRIK iterations and the solves that did not converge
+        """
+        return {"solves": self.solves, "iterations": self.iterations, "unconverged": self.unconverged}
+
+    def _get_start_pose(self, x, y):
+        # An arc of links all turning by the same bend to the side of the direction. Its reach goes down from the
+        # total length as the bend grows, the bend with the reach of the target distance is found by bisection, then
+        # the arc is turned to the target. Only targets closer than the arcs reach are left to FABRIK
+        distance = math.sqrt(x * x + y * y)
+        sign = -1 if self.direction == 1 else 1
+
+        low, high = 0.0, math.pi
+        if abs(self._get_arc_edge(high)) > distance:
+            # The fully folded arc is a straight line, that FABRIK cannot unfold towards a target on the same line.
+            # Use the least reaching arc bent less instead
+            high = min((k * math.pi / 16 for k in range(1, 16)), key=lambda k_bend: abs(self._get_arc_edge(k_bend)))
+
+        bend = high
+        if abs(self._get_arc_edge(high)) <= distance:
+            while high - low > 1e-15:
+                bend = (low + high) / 2
+                reach = abs(self._get_arc_edge(bend))
+                if abs(reach - distance) <= self.tolerance / 4:
+                    break
+                if reach > distance:
+                    low = bend
+                else:
+                    high = bend
+
+        heading = math.atan2(y, x) - cmath.phase(self._get_arc_edge(sign * bend))
+        angles = [sign * bend] * len(self.lengths)
+        angles[0] = heading
+
+        return list(forward_chain(self.lengths, angles))
+
+    def _get_arc_edge(self, bend):
+        # Edge of the arc with its first link on axis OX, as a complex number
+        return sum(cmath.rect(length, i * bend) for i, length in enumerate(self.lengths))
+
+    def _fabrik(self, pose, x, y):
+        lengths = self.lengths
+        count = len(lengths)
+        tolerance_sq = self.tolerance ** 2
+
+        # Joint points including the base (0, 0)
+        px = [0.0] + pose[0::2]
+        py = [0.0] + pose[1::2]
+
+        iteration = 0
+        while (px[count] - x) ** 2 + (py[count] - y) ** 2 > tolerance_sq:
+            if iteration == self.max_iterations:
+                self.unconverged += 1
+                break
+            iteration += 1
+
+            if iteration > FABRIK_ITERATIONS:
+                self._newton_step(px, py, x, y)
+                continue
+
+            # Backward - Put the edge on the target and drag every link towards it
+            px[count] = x
+            py[count] = y
+            for i in range(count - 1, -1, -1):
+                dx = px[i] - px[i + 1]
+                dy = py[i] - py[i + 1]
+                # A zero length gap keeps the joint where it is, as there is no direction to drag it to
+                ratio = lengths[i] / (math.sqrt(dx * dx + dy * dy) or 1.0)
+                px[i] = px[i + 1] + dx * ratio
+                py[i] = py[i + 1] + dy * ratio
+
+            # Forward - Put the base back on (0, 0) and drag every link towards it
+            px[0] = py[0] = 0.0
+            for i in range(count):
+                dx = px[i + 1] - px[i]
+                dy = py[i + 1] - py[i]
+                ratio = lengths[i] / (math.sqrt(dx * dx + dy * dy) or 1.0)
+                px[i + 1] = px[i] + dx * ratio
+                py[i + 1] = py[i] + dy * ratio
+
+        self.iterations += iteration
+
+        pose = [0.0] * (2 * count)
+        pose[0::2] = px[1:]
+        pose[1::2] = py[1:]
+        return pose
+
+    def _newton_step(self, px, py, x, y):
+        # Damped least squares step on the link headings h: the edge moves by sum(l * (-sin h, cos h) * dh), the
+        # smallest dh moving it onto the target is J^T (J J^T + damping I)^-1 (target - edge) with a 2x2 J J^T
+        count = len(self.lengths)
+        ja = []
+        jb = []
+        for i in range(count):
+            # The derivative of a link end point over its heading is the link turned by 90 degrees
+            ja.append(py[i] - py[i + 1])
+            jb.append(px[i + 1] - px[i])
+
+        aa = sum(a * a for a in ja) + self._damping
+        bb = sum(b * b for b in jb) + self._damping
+        ab = sum(a * b for a, b in zip(ja, jb))
+        ex = x - px[count]
+        ey = y - py[count]
+        det = aa * bb - ab * ab
+        wx = (bb * ex - ab * ey) / det
+        wy = (aa * ey - ab * ex) / det
+
+        # Turn every link by its heading change, keeping its length exactly
+        for i in range(count):
+            turn = ja[i] * wx + jb[i] * wy
+            cos_turn = math.cos(turn)
+            sin_turn = math.sin(turn)
+            px[i + 1] = px[i] + jb[i] * cos_turn + ja[i] * sin_turn
+            py[i + 1] = py[i] - ja[i] * cos_turn + jb[i] * sin_turn
+
+
+class ChainTrajectory(Trajectory):
+    """
+    Precomputed poses of a chain move, stored as a (steps, 2 * N) array of (x1, y1, ..., xn, yn) rows. The x1, y1,
+    x2, y2 properties are the end points of the first two links, get_canvas_frames works for any N
+    """
+
+    def __init__(self, lengths, direction, poses):
+        """
+        :param lengths: Sequence of the link lengths
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param poses: Array-like of shape (steps, 2 * N) with the pose of every step
+        """
+        self.lengths = list(lengths)
+        # The base class keeps the first two lengths and the frame cache, the poses have 2 * N columns here
+        super().__init__(self.lengths[0], self.lengths[1], direction, ())
+        self.poses = np.ascontiguousarray(poses, dtype=float).reshape(-1, 2 * len(self.lengths))
+
+    @property
+    def edge_x(self):
+        return self.poses[:, -2]
+
+    @property
+    def edge_y(self):
+        return self.poses[:, -1]
+
+
+def plan_chain_move(solver, x, y, xt, yt, steps):
+    """
+    Compute up front all chain poses of a straight move of the edge from (x, y) to (xt, yt), every step warm
+    started from the previous one. As plan_straight_move, the trajectory ends before the first unreachable step
+    :param solver: The ChainIKSolver, (x, y) is solved first if it is not its current edge position
+    :param x: The initial x coordinate of the edge
+    :param y: The initial y coordinate of the edge
+    :param xt: The final target x coordinate of the edge
+    :param yt: The final target y coordinate of the edge
+    :param steps: Number of steps for the move
+    :return: The ChainTrajectory of the move
+    """
+    if solver.pose is None or solver.pose[-2:] != [x, y]:
+        solver.solve(x, y)
+
+    poses = []
+    for step in range(1, steps + 1):
+        fraction = step / steps
+        pose = solver.solve(x + (xt - x) * fraction, y + (yt - y) * fraction)
+        if pose is None:
+            break
+        poses.append(pose)
+
+    return ChainTrajectory(solver.lengths, solver.direction, poses)
@@ -0,0 +1,299 @@
+import json
+
+import numpy as np
+
+from kinematics import MOVE_VALID, MOVE_COLLIDES_OBSTACLE, calculate_first_arm, check_arm_move, check_joint_move
+from trajectory import Trajectory, plan_move
+
+
+def expand_ranges(starts, counts):
+    """
+    Expand ranges [start, start + count) of many owners into flat arrays, without a Python loop
+    :param starts: Array of range starts
+    :param counts: Array of range lengths
+    :return: A tuple (owners, positions) with the owner index and the position of every element of every range
+    """
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+
+def segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+    """
+    Vectorized test of segments (a, b) against segments (c, d), touching segments included
+    :return: Boolean array, True where the two segments share at least one point
+    """
+    d1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d2 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    d3 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d4 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+
+    # Each segment has the end points of the other on both sides of its line, or on it
+    crossing = (d1 * d2 <= 0) & (d3 * d4 <= 0)
+
+    # Collinear segments only meet if their boxes overlap
+    collinear = (d1 == 0) & (d2 == 0)
+    overlap = ((np.minimum(ax, bx) <= np.maximum(cx, dx)) & (np.minimum(cx, dx) <= np.maximum(ax, bx)) &
+               (np.minimum(ay, by) <= np.maximum(cy, dy)) & (np.minimum(cy, dy) <= np.maximum(ay, by)))
+
+    return crossing & (~collinear | overlap)
+
+
+class ObstacleMap:
+    """
+    Polygon obstacles in arm coordinates, indexed with a uniform grid. Every grid cell lists the polygon edges and
+    the polygons whose boxes overlap it, so a query only tests the few edges near each segment or point.
+    Links collide with a polygon if they cross one of its edges or lie inside it
+    """
+
+    def __init__(self, polygons, cell_size=None):
+        """
+        :param polygons: Sequence of polygons, each a sequence of at least 3 (x, y) vertices. Polygons may be
+        concave, the closing edge from the last to the first vertex is implied
+        :param cell_size: The grid cell size, by default the mean size of the polygon boxes, so that a polygon only
+        covers a few cells and a link only meets the edges close to it
+        """
+        self.polygons = [np.asarray(polygon, dtype=float).reshape(-1, 2) for polygon in polygons]
+        if any(len(polygon) < 3 for polygon in self.polygons):
+            raise ValueError("Polygons need at least 3 vertices")
+
+        # All edges in flat arrays, edges of polygon k are edge_start[k]:edge_start[k + 1]
+        counts = np.array([len(polygon) for polygon in self.polygons], dtype=np.int64)
+        self.edge_start = np.concatenate(([0], np.cumsum(counts)))
+        vertices = np.concatenate(self.polygons) if self.polygons else np.empty((0, 2))
+        next_vertices = (np.concatenate([np.roll(polygon, -1, axis=0) for polygon in self.polygons])
+                         if self.polygons else np.empty((0, 2)))
+        self.edge_x0, self.edge_y0 = vertices[:, 0], vertices[:, 1]
+        self.edge_x1, self.edge_y1 = next_vertices[:, 0], next_vertices[:, 1]
+        self.edge_owner = np.repeat(np.arange(len(self.polygons)), counts)
+
+        # Polygon boxes
+        self.box = np.array([[polygon[:, 0].min(), polygon[:, 1].min(), polygon[:, 0].max(), polygon[:, 1].max()]
+                             for polygon in self.polygons]).reshape(-1, 4)
+
+        # Grid over the box of all obstacles
+        if len(self.polygons):
+            self.origin_x, self.origin_y = self.box[:, 0].min(), self.box[:, 1].min()
+            extent_x = self.box[:, 2].max() - self.origin_x
+            extent_y = self.box[:, 3].max() - self.origin_y
+        else:
+            self.origin_x = self.origin_y = extent_x = extent_y = 0.0
+        if cell_size is None:
+            sizes = np.maximum(self.box[:, 2] - self.box[:, 0], self.box[:, 3] - self.box[:, 1])
+            cell_size = float(sizes.mean()) if len(sizes) else 1.0
+        self.cell_size = max(cell_size, max(extent_x, extent_y) / 4096, 1e-9)
+        self.grid_nx = int(extent_x // self.cell_size) + 1
+        self.grid_ny = int(extent_y // self.cell_size) + 1
+
+        edge_box = np.column_stack((np.minimum(self.edge_x0, self.edge_x1), np.minimum(self.edge_y0, self.edge_y1),
+                                    np.maximum(self.edge_x0, self.edge_x1), np.maximum(self.edge_y0, self.edge_y1)))
+        self._edge_cells = self._build_cells(edge_box)
+        self._polygon_cells = self._build_cells(self.box)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def _get_cell_ranges(self, x_min, y_min, x_max, y_max):
+        # Cell index ranges covered by boxes, clipped to the grid - Boxes outside it get empty ranges
+        ix0 = np.maximum(np.floor((x_min - self.origin_x) / self.cell_size), 0).astype(np.int64)
+        iy0 = np.maximum(np.floor((y_min - self.origin_y) / self.cell_size), 0).astype(np.int64)
+        ix1 = np.minimum(np.floor((x_max - self.origin_x) / self.cell_size), self.grid_nx - 1).astype(np.int64)
+        iy1 = np.minimum(np.floor((y_max - self.origin_y) / self.cell_size), self.grid_ny - 1).astype(np.int64)
+
+        width = np.maximum(ix1 - ix0 + 1, 0)
+        counts = width * np.maximum(iy1 - iy0 + 1, 0)
+        return ix0, iy0, width, counts
+
+    def _get_box_cells(self, boxes):
+        # (box, cell) pairs of every cell overlapped by every box
+        ix0, iy0, width, counts = self._get_cell_ranges(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+        owners, local = expand_ranges(np.zeros(len(counts), dtype=np.int64), counts)
+        cells = (iy0[owners] + local // width[owners]) * self.grid_nx + ix0[owners] + local % width[owners]
+        return owners, cells
+
+    def _build_cells(self, boxes):
+        # Compressed cell lists - Items of cell c are items[start[c]:start[c + 1]]
+        items, cells = self._get_box_cells(boxes)
+        order = np.argsort(cells, kind="stable")
+        counts = np.bincount(cells, minlength=self.grid_nx * self.grid_ny)
+        return np.concatenate(([0], np.cumsum(counts))), items[order]
+
+    def _get_segment_cells(self, x0, y0, x1, y1):
+        # (segment, cell) pairs of every cell a segment passes through - Column by column, with the rows between
+        # the heights of the segment at the two sides of the column, which is far less than its whole box for the
+        # long diagonal links
+        x_min, x_max = np.minimum(x0, x1), np.maximum(x0, x1)
+        ix0, _, columns, _ = self._get_cell_ranges(x_min, np.minimum(y0, y1), x_max, np.maximum(y0, y1))
+        segments, local = expand_ranges(np.zeros(len(x0), dtype=np.int64), columns)
+        column = ix0[segments] + local
+
+        # Part of the segment inside the column
+        sx0, sy0, sx1, sy1 = x0[segments], y0[segments], x1[segments], y1[segments]
+        left = np.maximum(self.origin_x + column * self.cell_size, x_min[segments])
+        right = np.minimum(self.origin_x + (column + 1) * self.cell_size, x_max[segments])
+        dx = sx1 - sx0
+        slope = np.where(dx != 0, (sy1 - sy0) / np.where(dx != 0, dx, 1.0), 0.0)
+        y_left = np.where(dx != 0, sy0 + (left - sx0) * slope, sy0)
+        y_right = np.where(dx != 0, sy0 + (right - sx0) * slope, sy1)
+
+        iy0 = np.maximum(np.floor((np.minimum(y_left, y_right) - self.origin_y) / self.cell_size), 0)
+        iy1 = np.minimum(np.floor((np.maximum(y_left, y_right) - self.origin_y) / self.cell_size), self.grid_ny - 1)
+        rows = np.maximum(iy1 - iy0 + 1, 0).astype(np.int64)
+
+        owners, row = expand_ranges(iy0.astype(np.int64), rows)
+        return segments[owners], row * self.grid_nx + column[owners]
+
+    def _get_candidates(self, index, queries, cells):
+        # (query, item) pairs of the items listed in the cells of every query. An item covering several cells of a
+        # query is listed more than once
+        start, items = index
+        owners, positions = expand_ranges(start[cells], start[cells + 1] - start[cells])
+        return queries[owners], items[positions]
+
+    def get_points_inside(self, x, y):
+        """
+        Find the polygon containing every point, with an even-odd crossing test of the polygons near the point
+        :param x: Array of x coordinates
+        :param y: Array of y coordinates
+        :return: Integer array with the smallest index of a polygon containing the point, -1 for none
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        x, y = x.ravel(), y.ravel()
+        hit = np.full(len(x), len(self.polygons), dtype=np.int64)
+
+        if len(self.polygons) and len(x):
+            # A point is in a single cell, so every polygon is listed once per point
+            points, cells = self._get_box_cells(np.column_stack((x, y, x, y)))
+            points, polygons = self._get_candidates(self._polygon_cells, points, cells)
+
+            # Keep the polygons whose box holds the point, then test every edge of them
+            box = self.box[polygons]
+            inside_box = (x[points] >= box[:, 0]) & (x[points] <= box[:, 2]) & \
+                         (y[points] >= box[:, 1]) & (y[points] <= box[:, 3])
+            points, polygons = points[inside_box], polygons[inside_box]
+
+            pairs, edges = expand_ranges(self.edge_start[polygons], self.edge_start[polygons + 1] -
+                                         self.edge_start[polygons])
+            px, py = x[points[pairs]], y[points[pairs]]
+            xa, ya, xb, yb = self.edge_x0[edges], self.edge_y0[edges], self.edge_x1[edges], self.edge_y1[edges]
+
+            # Edges crossing the horizontal ray from the point to +x
+            straddle = (ya > py) != (yb > py)
+            safe_dy = np.where(straddle, yb - ya, 1.0)
+            crosses = straddle & (px < xa + (py - ya) * (xb - xa) / safe_dy)
+
+            inside = np.bincount(pairs, weights=crosses, minlength=len(points)) % 2 == 1
+            np.minimum.at(hit, points[inside], polygons[inside])
+
+        return np.where(hit == len(self.polygons), -1, hit)
+
+    def get_segments_hit(self, x0, y0, x1, y1):
+        """
+        Find the polygon hit by every segment, i.e. crossing one of its edges or lying inside it
+        :param x0: Array of x coordinates of the segment starts
+        :param y0: Array of y coordinates of the segment starts
+        :param x1: Array of x coordinates of the segment ends
+        :param y1: Array of y coordinates of the segment ends
+        :return: Integer array with the smallest index of a polygon hit by the segment, -1 for none
+        """
+        x0, y0, x1, y1 = (values.ravel() for values in
+                          np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x0, y0, x1, y1))))
+        hit = np.full(len(x0), len(self.polygons), dtype=np.int64)
+
+        if len(self.polygons) and len(x0):
+            segments, cells = self._get_segment_cells(x0, y0, x1, y1)
+            segments, edges = self._get_candidates(self._edge_cells, segments, cells)
+
+            crossing = segments_intersect(x0[segments], y0[segments], x1[segments], y1[segments],
+                                          self.edge_x0[edges], self.edge_y0[edges],
+                                          self.edge_x1[edges], self.edge_y1[edges])
+            np.minimum.at(hit, segments[crossing], self.edge_owner[edges[crossing]])
+
+            # A segment crossing no edge is either fully inside or fully outside every polygon
+            inside = self.get_points_inside(x0, y0)
+            hit = np.where(inside >= 0, np.minimum(hit, inside), hit)
+
+        return np.where(hit == len(self.polygons), -1, hit)
+
+    def check_poses(self, x1, y1, x2, y2):
+        """
+        Check both links of many arm poses - arm1 from (0, 0) to (x1, y1) and arm2 from (x1, y1) to (x2, y2)
+        :param x1: Array of x1 coordinates of arm1
+        :param y1: Array of y1 coordinates of arm1
+        :param x2: Array of x2 coordinates of arm2
+        :param y2: Array of y2 coordinates of arm2
+        :return: A tuple (arm1_hit, arm2_hit) of integer arrays with the index of the polygon hit by each link, -1
+        for none
+        """
+        x1, y1, x2, y2 = (np.asarray(v, dtype=float).ravel() for v in (x1, y1, x2, y2))
+        count = len(x1)
+
+        # Both links checked with one query
+        hit = self.get_segments_hit(np.concatenate((np.zeros(count), x1)), np.concatenate((np.zeros(count), y1)),
+                                    np.concatenate((x1, x2)), np.concatenate((y1, y2)))
+        return hit[:count], hit[count:]
+
+
+def load_obstacles(path, cell_size=None):
+    """
+    Read obstacles from a JSON file holding a list of polygons, each a list of [x, y] vertices in arm coordinates
+    :param path: The JSON file path
+    :param cell_size: Optional grid cell size
+    :return: The ObstacleMap
+    """
+    with open(path) as file:
+        return ObstacleMap(json.load(file), cell_size)
+
+
+def find_trajectory_collision(obstacles, trajectory):
+    """
+    Find the first pose of a trajectory where a link hits an obstacle
+    :param obstacles: The ObstacleMap
+    :param trajectory: The Trajectory to check
+    :return: A tuple (step, polygon) with the first colliding step and the polygon hit, (None, None) if the
+    trajectory is free
+    """
+    arm1_hit, arm2_hit = obstacles.check_poses(trajectory.x1, trajectory.y1, trajectory.x2, trajectory.y2)
+    colliding = np.flatnonzero((arm1_hit >= 0) | (arm2_hit >= 0))
+    if len(colliding) == 0:
+        return None, None
+
+    step = int(colliding[0])
+    return step, int(arm1_hit[step] if arm1_hit[step] >= 0 else arm2_hit[step])
+
+
+def check_arm_move_obstacles(obstacles, direction, l1, l2, x2, y2, xt, yt, steps=300, path=None, reject=True,
+                             joint=False):
+    """
+    Validate a move as check_arm_move, or check_joint_move for a joint move, does, then check every pose of the move,
+    and the start pose, against the obstacles
+    :param obstacles: The ObstacleMap
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param x2: The start x coordinate of arm2
+    :param y2: The start y coordinate of arm2
+    :param xt: The target x coordinate
+    :param yt: The target y coordinate
+    :param steps: Number of steps the move is checked at, as animated
+    :param path: Optional PlannedPath followed instead of the straight line, e.g. an accepted detour
+    :param reject: If True a colliding move gets the MOVE_COLLIDES_OBSTACLE status, otherwise it keeps MOVE_VALID
+    and the collision is only reported
+    :param joint: If True and there is no path, check the joint space move of plan_joint_move
+    :return: A tuple (status, step, polygon) - The MOVE_* status, then the first colliding step (0 for the start
+    pose, i for the i-th step of the move) and the polygon hit, or None and None if the move is free
+    """
+    if path is None:
+        status = check_joint_move(l1, l2, xt, yt) if joint else check_arm_move(l1, l2, x2, y2, xt, yt)[0]
+        if status != MOVE_VALID:
+            return status, None, None
+    trajectory = plan_move(direction, x2, y2, xt, yt, l1, l2, steps, path, joint)
+
+    # Prepend the start pose, so that an arm already touching an obstacle is reported too
+    x1, y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+    poses = np.vstack(([x1, y1, x2, y2], trajectory.poses))
+    step, polygon = find_trajectory_collision(obstacles, Trajectory(l1, l2, direction, poses))
+
+    if step is not None and reject:
+        return MOVE_COLLIDES_OBSTACLE, step, polygon
+    return MOVE_VALID, step, polygon
@@ -0,0 +1,313 @@
+import argparse
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kinematics import MOVE_VALID, calculate_first_arm, check_arm_move, get_workspace_radius
+from trajectory import plan_straight_move
+
+# RGB values of the tkinter colors used by the GUI
+COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+}
+
+# Scene shared by the worker processes, set once per worker by init_worker
+_background = None
+_center = None
+_file_format = None
+
+
+def create_image(width, height, color="white"):
+    """
+    :return: A (height, width, 3) uint8 RGB image filled with the given color
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = COLORS[color]
+    return image
+
+
+def get_box(image, x_min, y_min, x_max, y_max):
+    """
+    Clip a box to the image, so that shapes only compute the pixels they may cover
+    :return: A tuple (region, ys, xs) with the image view of the box and its pixel coordinate grids, or None if the
+    box is outside the image
+    """
+    height, width = image.shape[:2]
+    left = max(int(np.floor(x_min)), 0)
+    top = max(int(np.floor(y_min)), 0)
+    right = min(int(np.ceil(x_max)) + 1, width)
+    bottom = min(int(np.ceil(y_max)) + 1, height)
+    if left >= right or top >= bottom:
+        return None
+
+    ys, xs = np.ogrid[top:bottom, left:right]
+    return image[top:bottom, left:right], ys, xs
+
+
+def draw_line(image, x0, y0, x1, y1, color, width=1):
+    """
+    Draw a line segment as canvas.create_line does, by filling the pixels closer to the segment than width / 2
+    :param image: The RGB image
+    :param x0: The x pixel coordinate of the first point
+    :param y0: The y pixel coordinate of the first point
+    :param x1: The x pixel coordinate of the second point
+    :param y1: The y pixel coordinate of the second point
+    :param color: The COLORS name
+    :param width: The line width in pixels
+    """
+    half = max(width / 2, 0.5)
+    box = get_box(image, min(x0, x1) - half, min(y0, y1) - half, max(x0, x1) + half, max(y0, y1) + half)
+    if box is None:
+        return
+    region, ys, xs = box
+
+    # Distance of every pixel of the box to the segment
+    dx = x1 - x0
+    dy = y1 - y0
+    len_sq = dx * dx + dy * dy
+    t = np.clip(((xs - x0) * dx + (ys - y0) * dy) / len_sq, 0.0, 1.0) if len_sq > 0 else 0.0
+    dist_sq = (xs - x0 - t * dx) ** 2 + (ys - y0 - t * dy) ** 2
+
+    region[dist_sq <= half * half] = COLORS[color]
+
+
+def draw_polyline(image, points, color, width=1):
+    """
+    Draw a line through a sequence of points
+    :param points: Sequence of (x, y) pixel coordinates
+    """
+    for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+        draw_line(image, x0, y0, x1, y1, color, width)
+
+
+def draw_circle(image, cx, cy, radius, outline=None, fill=None, width=1):
+    """
+    Draw a circle as canvas.create_oval does for a square box
+    :param image: The RGB image
+    :param cx: The x pixel coordinate of the center
+    :param cy: The y pixel coordinate of the center
+    :param radius: The radius in pixels
+    :param outline: The COLORS name of the outline, None for no outline
+    :param fill: The COLORS name of the inside, None for an empty circle
+    :param width: The outline width in pixels
+    """
+    half = max(width / 2, 0.5)
+    box = get_box(image, cx - radius - half, cy - radius - half, cx + radius + half, cy + radius + half)
+    if box is None:
+        return
+    region, ys, xs = box
+
+    dist = np.sqrt((xs - cx) ** 2 + (ys - cy) ** 2)
+    if fill is not None:
+        region[dist <= radius] = COLORS[fill]
+    if outline is not None:
+        region[np.abs(dist - radius) <= half] = COLORS[outline]
+
+
+def render_scene(width, height, l1, l2, move_points=None, intersections=()):
+    """
+    Render the static part of the GUI scene - the axes of draw_axes, the circles of draw_workspace_circles and the
+    move line of draw_move_scene or draw_path_scene, all drawn around the center of the image
+    :param width: The image width in pixels
+    :param height: The image height in pixels
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param move_points: Optional sequence of (x, y) points of the move path in arm coordinates
+    :param intersections: Sequence of (x, y) intersection points of the move with the internal circle
+    :return: The RGB image
+    """
+    image = create_image(width, height)
+    center_x, center_y = width // 2, height // 2
+
+    # Axes
+    draw_line(image, width / 2, 0, width / 2, height, "green")
+    draw_line(image, 0, height / 2, width, height / 2, "green")
+
+    # Workspace circles - The internal one filled with yellow
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    draw_circle(image, center_x, center_y, int_r, outline="blue", fill="yellow")
+    draw_circle(image, center_x, center_y, ext_r, outline="blue")
+
+    if move_points is not None:
+        draw_polyline(image, [(center_x + x, center_y - y) for x, y in move_points], "red")
+
+    for x, y in intersections:
+        draw_circle(image, center_x + x, center_y - y, 3, outline="blue", fill="blue")
+
+    return image
+
+
+def render_frame(background, center_x, center_y, pose):
+    """
+    Draw the robotic arm of one pose, as draw_robotic_arm does without its points, on a copy of the scene
+    :param background: The RGB image of the static scene
+    :param center_x: The x pixel coordinate of the (0, 0) point
+    :param center_y: The y pixel coordinate of the (0, 0) point
+    :param pose: The (x1, y1, x2, y2) pose, or (x1, y1, ..., xn, yn) for an arm of N links
+    :return: The RGB image of the frame
+    """
+    image = background.copy()
+
+    # Every link starts where the previous one ends
+    x0, y0 = center_x, center_y
+    for i in range(0, len(pose), 2):
+        x1, y1 = center_x + pose[i], center_y - pose[i + 1]
+        draw_line(image, x0, y0, x1, y1, "black", 3)
+        x0, y0 = x1, y1
+
+    return image
+
+
+def write_ppm(path, image):
+    """
+    Write an RGB image as binary PPM (P6)
+    :param path: The file path
+    :param image: The (height, width, 3) uint8 RGB image
+    """
+    height, width = image.shape[:2]
+    with open(path, "wb") as file:
+        file.write(f"P6 {width} {height} 255\n".encode("ascii"))
+        file.write(np.ascontiguousarray(image).tobytes())
+
+
+def write_png(path, image, level=6):
+    """
+    Write an RGB image as PNG, compressed with zlib
+    :param path: The file path
+    :param image: The (height, width, 3) uint8 RGB image
+    :param level: The zlib compression level
+    """
+    height, width = image.shape[:2]
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # Every row starts with its filter type, 0 for none
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), level)))
+        file.write(chunk(b"IEND", b""))
+
+
+def init_worker(background, center, file_format):
+    """
+    Keep the static scene in the worker process, so that it is not sent again with every chunk of frames
+    """
+    global _background, _center, _file_format
+    _background = background
+    _center = center
+    _file_format = file_format
+
+
+def render_chunk(frames):
+    """
+    Render and write a chunk of frames in a worker process
+    :param frames: List of (path, pose) tuples
+    :return: Number of written frames
+    """
+    write = write_png if _file_format == "png" else write_ppm
+    for path, pose in frames:
+        write(path, render_frame(_background, *_center, pose))
+
+    return len(frames)
+
+
+def render_trajectory(poses, background, output_dir, file_format="png", chunk_size=16, workers=None):
+    """
+    Render every pose on the scene and write the frames as numbered image files, frame_000000.png and so on. Frames
+    only depend on their own pose, so chunks of them are rendered across a process pool
+    :param poses: Array-like of (x1, y1, x2, y2) poses, e.g. Trajectory.poses, or of N-link poses
+    :param background: The RGB image of the static scene from render_scene
+    :param output_dir: The directory of the frames, created if needed
+    :param file_format: "png" or "ppm"
+    :param chunk_size: Number of frames per chunk of work
+    :param workers: Number of worker processes, None for one per CPU, 0 to render in this process
+    :return: The list of written frame paths
+    """
+    if file_format not in ("png", "ppm"):
+        raise ValueError(f"Unknown frame format {file_format}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    height, width = background.shape[:2]
+    center = (width // 2, height // 2)
+    frames = [(os.path.join(output_dir, f"frame_{index:06d}.{file_format}"), tuple(pose))
+              for index, pose in enumerate(np.asarray(poses, dtype=float).tolist())]
+    chunks = [frames[start:start + chunk_size] for start in range(0, len(frames), chunk_size)]
+
+    if workers == 0:
+        init_worker(background, center, file_format)
+        for chunk in chunks:
+            render_chunk(chunk)
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(background, center, file_format)) as executor:
+            for _ in executor.map(render_chunk, chunks):
+                pass
+
+    return [path for path, _ in frames]
+
+
+def render_move(l1, l2, direction, x2, y2, xt, yt, steps, width, height, output_dir, file_format="png",
+                workers=None):
+    """
+    Render the frames of a straight move as the GUI animates it, with the move line and the intersection points
+    :return: The list of written frame paths, empty if the move is not valid
+    """
+    status, xs1, ys1, xs2, ys2 = check_arm_move(l1, l2, x2, y2, xt, yt)
+    intersections = [(xs1, ys1), (xs2, ys2)] if xs1 is not None else []
+    background = render_scene(width, height, l1, l2, [(x2, y2), (xt, yt)], intersections)
+    if status != MOVE_VALID:
+        return []
+
+    # The first frame shows the initial pose, then every step of the move
+    x1, y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+    trajectory = plan_straight_move(direction, x2, y2, xt, yt, l1, l2, steps)
+    poses = np.vstack(([x1, y1, x2, y2], trajectory.poses))
+
+    return render_trajectory(poses, background, output_dir, file_format, workers=workers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render robotic arm moves to PNG/PPM frames without a display. "
+                                                 "A video can be made from them with e.g. ffmpeg -i "
+                                                 "frames/frame_%%06d.png move.mp4")
+    parser.add_argument("--recording", help="Render the drawn poses of a recording file")
+    parser.add_argument("--move", type=float, nargs=7, metavar=("L1", "L2", "DIRECTION", "X2", "Y2", "XT", "YT"),
+                        help="Render a straight move")
+    parser.add_argument("--steps", type=int, default=300, help="Steps of --move")
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 600), metavar=("WIDTH", "HEIGHT"),
+                        help="Frame size in pixels")
+    parser.add_argument("--format", choices=("png", "ppm"), default="png", help="Frame file format")
+    parser.add_argument("--output", default="frames", help="Directory of the frames")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, 0 for none")
+    args = parser.parse_args()
+
+    width, height = args.size
+    if args.recording:
+        from recording import TrajectoryRecording
+
+        recording = TrajectoryRecording(args.recording)
+        trajectory, _ = recording.get_trajectory()
+        background = render_scene(width, height, recording.l1, recording.l2)
+        paths = render_trajectory(trajectory.poses, background, args.output, args.format, workers=args.workers)
+    elif args.move:
+        l1, l2, direction, x2, y2, xt, yt = args.move
+        paths = render_move(l1, l2, int(direction), x2, y2, xt, yt, args.steps, width, height, args.output,
+                            args.format, args.workers)
+    else:
+        parser.error("one of --recording or --move is required")
+
+    print(f"Wrote {len(paths)} frames to {args.output}")
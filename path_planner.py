@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+
+from kinematics import get_workspace_radius
+
+
+class PlannedPath:
+    """
+    Path of the arm edge made of a tangent segment, an arc around the internal circle and a second tangent segment.
+    A straight move is a path with an empty arc, where the tangent points are the target itself
+    """
+
+    def __init__(self, x2, y2, xt, yt, radius, arc_start, arc_sweep):
+        """
+        :param x2: The start x coordinate
+        :param y2: The start y coordinate
+        :param xt: The target x coordinate
+        :param yt: The target y coordinate
+        :param radius: The radius of the arc around (0, 0)
+        :param arc_start: The angle in RAD where the arc starts, None for a straight path
+        :param arc_sweep: The signed angle in RAD swept by the arc, positive for counterclockwise
+        """
+        self.x2 = x2
+        self.y2 = y2
+        self.xt = xt
+        self.yt = yt
+        self.radius = radius
+        self.arc_start = arc_start
+        self.arc_sweep = arc_sweep
+
+        if arc_start is None:
+            # Straight path - Both tangent points are the target
+            self.xa = self.xb = xt
+            self.ya = self.yb = yt
+            self.arc_sweep = 0.0
+        else:
+            arc_end = arc_start + arc_sweep
+            self.xa = radius * math.cos(arc_start)
+            self.ya = radius * math.sin(arc_start)
+            self.xb = radius * math.cos(arc_end)
+            self.yb = radius * math.sin(arc_end)
+
+        self.first_length = math.hypot(self.xa - x2, self.ya - y2)
+        self.arc_length = radius * abs(self.arc_sweep)
+        self.last_length = math.hypot(xt - self.xb, yt - self.yb)
+        self.length = self.first_length + self.arc_length + self.last_length
+
+    def is_detour(self):
+        """
+        :return: Boolean True if the path goes around the internal circle, False for a straight move
+        """
+        return self.arc_start is not None
+
+    def sample(self, count):
+        """
+        Get `count` points evenly spaced along the path. As for the straight moves of plan_straight_move, the start
+        point is not included and the last point is the target
+        :param count: Number of points
+        :return: A tuple (x, y) of arrays
+        """
+        distance = self.length * np.arange(1, count + 1) / count
+
+        # Position along each of the 3 parts of the path, clipped so that every part only moves inside its range
+        first = np.clip(distance / self.first_length, 0.0, 1.0) if self.first_length > 0 else np.ones(count)
+        arc = np.clip((distance - self.first_length) / self.arc_length, 0.0, 1.0) if self.arc_length > 0 else None
+        last_start = self.first_length + self.arc_length
+        last = np.clip((distance - last_start) / self.last_length, 0.0, 1.0) if self.last_length > 0 else None
+
+        x = self.x2 + (self.xa - self.x2) * first
+        y = self.y2 + (self.ya - self.y2) * first
+
+        if arc is not None:
+            angle = self.arc_start + self.arc_sweep * arc
+            on_arc = (distance > self.first_length) & (distance <= last_start)
+            x = np.where(on_arc, self.radius * np.cos(angle), x)
+            y = np.where(on_arc, self.radius * np.sin(angle), y)
+
+        if last is not None:
+            on_last = distance > last_start
+            x = np.where(on_last, self.xb + (self.xt - self.xb) * last, x)
+            y = np.where(on_last, self.yb + (self.yt - self.yb) * last, y)
+
+        return x, y
+
+
+def is_segment_blocked(x2, y2, xt, yt, radius):
+    """
+    Check if the straight segment from (x2, y2) to (xt, yt) passes inside the circle of given radius around (0, 0)
+    :param x2: The start x coordinate
+    :param y2: The start y coordinate
+    :param xt: The target x coordinate
+    :param yt: The target y coordinate
+    :param radius: The circle radius
+    :return: Boolean True if the closest point of the segment to (0, 0) is closer than radius
+    """
+    dx = xt - x2
+    dy = yt - y2
+    len_sq = dx ** 2 + dy ** 2
+    t = min(max(-(x2 * dx + y2 * dy) / len_sq, 0.0), 1.0) if len_sq > 0 else 0.0
+
+    return (x2 + t * dx) ** 2 + (y2 + t * dy) ** 2 < radius ** 2
+
+
+def plan_detour_move(l1, l2, x2, y2, xt, yt, clearance=1e-3):
+    """
+    Plan the shortest path of the arm edge from (x2, y2) to (xt, yt) that does not enter the internal workspace
+    circle. If the straight move is blocked, it is replaced by the tangent segments from both points to the circle
+    plus the shorter arc between the tangent points, all computed in closed form
+    :param l1: The length L1 of arm1
+    :param l2: The length L2 of arm2
+    :param x2: The start x coordinate of arm2
+    :param y2: The start y coordinate of arm2
+    :param xt: The target x coordinate
+    :param yt: The target y coordinate
+    :param clearance: Distance kept from the internal circle, which also keeps the path away from (0, 0) for L1 = L2
+    :return: The PlannedPath, or None if one of the points is not outside the circle of radius r + clearance or not
+    inside the external circle
+    """
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    radius = int_r + clearance
+
+    start_dist = math.hypot(x2, y2)
+    target_dist = math.hypot(xt, yt)
+    if not (radius < start_dist < ext_r and radius < target_dist < ext_r):
+        return None
+
+    if not is_segment_blocked(x2, y2, xt, yt, radius):
+        return PlannedPath(x2, y2, xt, yt, radius, None, None)
+
+    # The tangent from a point at distance d touches the circle at +-acos(r / d) from the point's own angle
+    start_angle = math.atan2(y2, x2)
+    target_angle = math.atan2(yt, xt)
+    start_offset = math.acos(radius / start_dist)
+    target_offset = math.acos(radius / target_dist)
+
+    # Going around counterclockwise the arc runs from start_angle + start_offset to target_angle - target_offset,
+    # clockwise from start_angle - start_offset to target_angle + target_offset. Keep the shorter arc
+    ccw_start = start_angle + start_offset
+    ccw_sweep = (target_angle - target_offset - ccw_start) % (2 * math.pi)
+    cw_start = start_angle - start_offset
+    cw_sweep = (cw_start - target_angle - target_offset) % (2 * math.pi)
+
+    if ccw_sweep <= cw_sweep:
+        return PlannedPath(x2, y2, xt, yt, radius, ccw_start, ccw_sweep)
+    return PlannedPath(x2, y2, xt, yt, radius, cw_start, -cw_sweep)
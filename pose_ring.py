@@ -0,0 +1,243 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from kinematics import MOVE_OUTSIDE_WORKSPACE, MOVE_VALID
+from time_scaling import scale_trajectory
+from trajectory import plan_move
+
+RING_MAGIC = 0x474E4952534F50  # "POSRING"
+
+# Header - uint64 words on 3 cache lines, so that the words written by the producer and by the consumer do not share
+# a cache line: magic and capacity, then the producer write count, then the consumer read count and counters
+HEADER_WORDS = 24
+HEAD = 8        # Number of records written, only written by the producer
+TAIL = 16       # Number of records consumed, only written by the consumer
+OVERRUNS = 17   # Records overwritten by the producer before the consumer read them
+UNDERRUNS = 18  # Reads that found no new record
+SKIPPED = 19    # Records passed over by read_latest to get to the newest one
+
+RING_DTYPE = np.dtype([
+    ("time", "<f8"),    # time.monotonic of the producer, the same clock in all processes of the machine
+    ("x1", "<f8"),
+    ("y1", "<f8"),
+    ("x2", "<f8"),
+    ("y2", "<f8"),
+    ("status", "<i4"),  # One of the MOVE_* status values
+    ("flags", "<u4"),   # FLAG_* bits
+])
+
+# Record flags - The last pose of a move
+FLAG_LAST = 1
+
+
+class PoseRing:
+    """
+    Lock-free single producer / single consumer ring buffer of arm poses in shared memory, to hand the poses computed
+    by a worker process to the GUI process without pickling. The producer only writes the HEAD word and the consumer
+    only writes the TAIL word and its counters, so no lock is needed. A record is published by increasing HEAD after
+    its fields are written, which relies on stores becoming visible in program order, as on x86-64.
+
+    The producer never waits - when the consumer falls behind, the oldest records are overwritten. The consumer
+    detects this from HEAD, also while it copies records, drops the overwritten ones and counts them as overruns
+    """
+
+    def __init__(self, name=None, capacity=4096, create=True):
+        """
+        :param name: The shared memory name, a unique name is chosen if None and create is True
+        :param capacity: Number of records, only used when creating the ring
+        :param create: Boolean True to create a new ring, False to attach to the existing ring `name`
+        """
+        if create:
+            if capacity <= 0:
+                raise ValueError("capacity must be greater than 0")
+            size = HEADER_WORDS * 8 + capacity * RING_DTYPE.itemsize
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+
+        self._header = np.ndarray((HEADER_WORDS,), dtype="<u8", buffer=self.shm.buf)
+        if create:
+            self._header[:] = 0
+            self._header[1] = capacity
+            self._header[0] = RING_MAGIC
+        elif self._header[0] != RING_MAGIC:
+            self._header = None
+            self.shm.close()
+            raise ValueError(f"{name} is not a pose ring")
+
+        self.name = self.shm.name
+        self.capacity = int(self._header[1])
+        self._records = np.ndarray((self.capacity,), dtype=RING_DTYPE, buffer=self.shm.buf, offset=HEADER_WORDS * 8)
+
+    def write(self, timestamp, x1, y1, x2, y2, status=MOVE_VALID, flags=0):
+        """
+        Append one pose, overwriting the oldest record if the ring is full. Producer side only
+        :param timestamp: The pose time in seconds, e.g. time.monotonic()
+        :param x1: The x1 coordinate of arm1
+        :param y1: The y1 coordinate of arm1
+        :param x2: The x2 coordinate of arm2
+        :param y2: The y2 coordinate of arm2
+        :param status: One of the MOVE_* status values
+        :param flags: FLAG_* bits
+        """
+        head = int(self._header[HEAD])
+        self._records[head % self.capacity] = (timestamp, x1, y1, x2, y2, status, flags)
+        self._header[HEAD] = head + 1
+
+    def write_many(self, times, poses, status=MOVE_VALID, flags=0):
+        """
+        Append many poses at once and publish them together. Producer side only
+        :param times: Array of the pose times in seconds
+        :param poses: Array of shape (count, 4) of (x1, y1, x2, y2) poses
+        :param status: One of the MOVE_* status values, single value or array
+        :param flags: FLAG_* bits, single value or array
+        """
+        poses = np.asarray(poses, dtype=float)
+        count = len(poses)
+        if count == 0:
+            return
+
+        head = int(self._header[HEAD])
+        batch = np.empty(count, dtype=RING_DTYPE)
+        batch["time"] = times
+        batch["x1"], batch["y1"], batch["x2"], batch["y2"] = poses.T
+        batch["status"] = status
+        batch["flags"] = flags
+
+        # Only the newest records fit, the older ones count as overwritten
+        skip = max(0, count - self.capacity)
+        slots = np.arange(head + skip, head + count) % self.capacity
+        self._records[slots] = batch[skip:]
+        self._header[HEAD] = head + count
+
+    def read(self, max_count=None):
+        """
+        Take the records written since the last read, oldest first. Consumer side only
+        :param max_count: Largest number of records to take, the others are left for the next read
+        :return: A structured array of RING_DTYPE records, empty if there is nothing new
+        """
+        head = int(self._header[HEAD])
+        tail = self._skip_overrun(head)
+        if head == tail:
+            self._header[UNDERRUNS] += 1
+            return np.empty(0, dtype=RING_DTYPE)
+
+        count = head - tail if max_count is None else min(head - tail, max_count)
+        records = self._records.take(np.arange(tail, tail + count), mode="wrap")
+
+        # Records overwritten by the producer while they were copied are dropped. The producer may already be writing
+        # record HEAD, whose slot is the one of record HEAD - capacity
+        lost = min(count, int(self._header[HEAD]) - self.capacity + 1 - tail)
+        if lost > 0:
+            self._header[OVERRUNS] += lost
+            records = records[lost:]
+
+        self._header[TAIL] = tail + count
+        return records
+
+    def read_latest(self):
+        """
+        Take the newest record and pass over the older ones, e.g. to draw the current pose once per frame. Consumer
+        side only
+        :return: A tuple (time, x1, y1, x2, y2, status, flags), or None if nothing was written since the last read
+        """
+        while True:
+            head = int(self._header[HEAD])
+            tail = self._skip_overrun(head)
+            if head == tail:
+                self._header[UNDERRUNS] += 1
+                return None
+
+            record = self._records[(head - 1) % self.capacity].item()
+            # Retry if the producer went around the whole ring while the record was copied
+            if int(self._header[HEAD]) - self.capacity + 1 < head:
+                self._header[SKIPPED] += head - 1 - tail
+                self._header[TAIL] = head
+                return record
+
+    def get_stats(self):
+        """
+        :return: A dict with the written and consumed records, the records waiting to be read and the overrun,
+        underrun and skipped counters
+        """
+        head = int(self._header[HEAD])
+        tail = int(self._header[TAIL])
+        return {
+            "written": head,
+            "consumed": tail,
+            "pending": min(head - tail, self.capacity),
+            "overruns": int(self._header[OVERRUNS]),
+            "underruns": int(self._header[UNDERRUNS]),
+            "skipped": int(self._header[SKIPPED]),
+        }
+
+    def close(self):
+        """
+        Detach from the shared memory, the ring can not be used anymore in this process
+        """
+        # The array views must be released before the shared memory buffer can be closed
+        self._header = None
+        self._records = None
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Free the shared memory once all processes closed it, called once by the process that created the ring
+        """
+        self.shm.unlink()
+
+    def _skip_overrun(self, head):
+        tail = int(self._header[TAIL])
+        if head - tail > self.capacity:
+            self._header[OVERRUNS] += head - tail - self.capacity
+            tail = head - self.capacity
+            self._header[TAIL] = tail
+        return tail
+
+
+def stream_move(ring_name, direction, x2, y2, xt, yt, l1, l2, steps, duration, path=None, joint_limits=None,
+                start_pose=None, joint=False):
+    """
+    Worker process function - Compute a move and write its poses into a PoseRing at the time each one is due, so
+    that the GUI process only has to draw the newest pose. A joint move with an end point outside workspace only
+    writes the start pose, with the MOVE_OUTSIDE_WORKSPACE status and FLAG_LAST
+    :param ring_name: The shared memory name of the PoseRing
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate
+    :param yt: The final target y coordinate
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps of the move
+    :param duration: The duration of the move in seconds, unless joint_limits are given
+    :param path: Optional PlannedPath to follow instead of the straight line to (xt, yt)
+    :param joint_limits: Optional tuple (max_velocity, max_acceleration) to time the steps with scale_trajectory
+    :param start_pose: The (x1, y1, x2, y2) pose the move starts from, needed with joint_limits
+    :param joint: If True and there is no path, interpolate the joint angles instead of moving the edge straight
+    """
+    ring = PoseRing(ring_name, create=False)
+    try:
+        trajectory = plan_move(direction, x2, y2, xt, yt, l1, l2, steps, path, joint)
+        if trajectory is None:
+            # The arm stays where it is, the consumer still gets the last pose of the move
+            if start_pose is not None:
+                ring.write(time.monotonic(), *start_pose, MOVE_OUTSIDE_WORKSPACE, FLAG_LAST)
+            return
+
+        poses = trajectory.poses.tolist()
+        if joint_limits is not None and poses:
+            times = scale_trajectory(trajectory, *joint_limits, start_pose=start_pose).tolist()
+        else:
+            times = [index * duration / max(len(poses) - 1, 1) for index in range(len(poses))]
+
+        start = time.monotonic()
+        for index, (pose, pose_time) in enumerate(zip(poses, times)):
+            delay = start + pose_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            ring.write(time.monotonic(), *pose, MOVE_VALID, FLAG_LAST if index == len(poses) - 1 else 0)
+    finally:
+        ring.close()
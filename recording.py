@@ -0,0 +1,266 @@
+import argparse
+import bisect
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+from kinematics import get_joint_angles
+from trajectory import Trajectory
+
+# File layout - A 64 bytes header followed by fixed 64 bytes records, all little endian
+RECORDING_MAGIC = b"ARMREC\x00\x01"
+RECORDING_VERSION = 1
+
+# magic, version, header size, record size, L1, L2, direction, wall clock start time in seconds since the epoch
+HEADER_FORMAT = "<8sHHIddi4xd16x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),      # Seconds since the start of the recording
+    ("x1", "<f8"),
+    ("y1", "<f8"),
+    ("x2", "<f8"),
+    ("y2", "<f8"),
+    ("shoulder", "<f8"),  # Angle of arm1 and axis OX in RAD
+    ("elbow", "<f8"),     # Angle of arm2 relative to arm1 in RAD
+    ("kind", "<i4"),      # RECORD_POSE or RECORD_TARGET
+    ("move", "<i4"),      # Number of the move the record belongs to, 0 before the first target
+])
+
+# Record kinds - A pose drawn on the canvas, or a target commanded by the User with its IK solution
+RECORD_POSE = 0
+RECORD_TARGET = 1
+
+
+class TrajectoryRecorder:
+    """
+    Append arm poses to a recording file. Records are buffered in memory and written in blocks, the file can be read
+    by TrajectoryRecording while it is still being written, up to the last flushed record
+    """
+
+    def __init__(self, path, l1, l2, direction, buffer_size=4096, clock=time.monotonic):
+        """
+        :param path: The recording file, overwritten if it exists
+        :param l1: The fixed arm1 length L1
+        :param l2: The fixed arm2 length L2
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param buffer_size: Number of records kept in memory before being written
+        :param clock: Function returning the current time in seconds, used for the record timestamps
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.clock = clock
+
+        self.move = 0
+        self.count = 0
+        self._buffer = []
+
+        self._file = open(path, "wb")
+        self._file.write(struct.pack(HEADER_FORMAT, RECORDING_MAGIC, RECORDING_VERSION, HEADER_SIZE,
+                                     RECORD_DTYPE.itemsize, l1, l2, direction, time.time()))
+        self._start = clock()
+
+    def record(self, x1, y1, x2, y2, kind=RECORD_POSE):
+        """
+        Add a record for the current time. The joint angles are computed from the given points
+        :param x1: The x1 coordinate of arm1, None if there is no solution for (x2, y2)
+        :param y1: The y1 coordinate of arm1, None if there is no solution for (x2, y2)
+        :param x2: The x2 coordinate of arm2
+        :param y2: The y2 coordinate of arm2
+        :param kind: RECORD_POSE for a drawn pose, RECORD_TARGET for a commanded target, which starts a new move
+        """
+        if kind == RECORD_TARGET:
+            self.move += 1
+
+        if x1 is None:
+            x1 = y1 = shoulder = elbow = math.nan
+        else:
+            shoulder, elbow = get_joint_angles(x1, y1, x2, y2)
+
+        self._buffer.append((self.clock() - self._start, x1, y1, x2, y2, shoulder, elbow, kind, self.move))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the file
+        """
+        if self._buffer:
+            self._file.write(np.array(self._buffer, dtype=RECORD_DTYPE).tobytes())
+            self.count += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        """
+        Write the buffered records and close the file
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TrajectoryRecording:
+    """
+    Read only view of a recording file. The records are memory mapped, so only the parts that are accessed are read
+    from disk, whatever the size of the file. A trailing partial record, e.g. after a crash, is ignored
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The recording file
+        """
+        with open(path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a recording, the header is incomplete")
+
+        magic, version, header_size, record_size, l1, l2, direction, start_time = struct.unpack(HEADER_FORMAT, header)
+        if magic != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        if version != RECORDING_VERSION or header_size != HEADER_SIZE or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} has unsupported recording version {version}")
+
+        self.path = path
+        self.l1 = l1
+        self.l2 = l2
+        self.direction = direction
+        self.start_time = start_time
+
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            # An empty file cannot be memory mapped
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        """
+        :param index: A record index, slice or index array
+        :return: The structured record(s), a slice is a view into the mapped file
+        """
+        return self.records[index]
+
+    def get_duration(self):
+        """
+        :return: The time of the last record in seconds
+        """
+        return float(self.records["time"][-1]) if len(self) else 0.0
+
+    def seek(self, seconds):
+        """
+        Find the first record at or after a time, with a binary search that only reads a few records
+        :param seconds: The time since the start of the recording
+        :return: The record index, len(self) if all records are earlier
+        """
+        return bisect.bisect_left(self.records["time"], seconds)
+
+    def get_time_slice(self, start_seconds, stop_seconds):
+        """
+        :param start_seconds: The start time
+        :param stop_seconds: The stop time, excluded
+        :return: View of the records in [start_seconds, stop_seconds)
+        """
+        return self.records[self.seek(start_seconds):self.seek(stop_seconds)]
+
+    def get_trajectory(self, start=0, stop=None):
+        """
+        Build a Trajectory from the drawn poses of a range of records
+        :param start: The first record index
+        :param stop: The record index to stop at, excluded, by default the end of the recording
+        :return: A tuple (trajectory, times) with the Trajectory and the array of times of its steps
+        """
+        records = self.records[start:stop]
+        records = records[records["kind"] == RECORD_POSE]
+
+        poses = np.column_stack((records["x1"], records["y1"], records["x2"], records["y2"]))
+        return Trajectory(self.l1, self.l2, self.direction, poses), np.array(records["time"])
+
+    def replay(self, player, start=0, stop=None, speed=1.0, fps=60, on_done=None):
+        """
+        Replay the drawn poses of a range of records with a TrajectoryPlayer, keeping their recorded timing
+        :param player: The TrajectoryPlayer drawing the arm
+        :param start: The first record index
+        :param stop: The record index to stop at, excluded, by default the end of the recording
+        :param speed: Replay speed factor, 2 plays twice as fast as recorded
+        :param fps: The target frame rate
+        :param on_done: Optional function called without arguments once the last pose is drawn
+        :return: The FrameScheduler running the replay, or None if there is no pose to replay
+        """
+        trajectory, times = self.get_trajectory(start, stop)
+        if len(trajectory) == 0:
+            if on_done is not None:
+                on_done()
+            return None
+
+        times = (times - times[0]) / speed
+        return player.play_timed(trajectory, times[-1], fps, on_done, times)
+
+
+def replay_recording(path, start_seconds=0.0, stop_seconds=math.inf, speed=1.0):
+    """
+    Open a window with the workspace of a recording and replay its poses
+    :param path: The recording file
+    :param start_seconds: The time to start the replay at
+    :param stop_seconds: The time to stop the replay at
+    :param speed: Replay speed factor
+    """
+    # The GUI helpers are only needed here, keep the recording module importable without a display
+    import FinalProjectRobotics as gui
+    from animation import TrajectoryPlayer
+
+    recording = TrajectoryRecording(path)
+    start = recording.seek(start_seconds)
+    stop = recording.seek(stop_seconds)
+    trajectory, _ = recording.get_trajectory(start, stop)
+    if len(trajectory) == 0:
+        print("No pose to replay")
+        return
+
+    gui.root, gui.canvas = gui.create_root_and_canvas()
+    gui.root.update()
+    gui.get_viewport().bind_mouse()
+    if not gui.check_arm_lengths_fit_canvas(recording.l1, recording.l2):
+        gui.viewport.fit(recording.l1 + recording.l2)
+    gui.draw_axes()
+    gui.draw_workspace_circles(recording.l1, recording.l2)
+    arm1, arm2, oval1, oval2 = gui.draw_robotic_arm(*trajectory.poses[0].tolist())
+    gui.clear_from_canvas(oval1)
+    gui.clear_from_canvas(oval2)
+
+    center_x, center_y = gui.get_center_xy()
+    player = TrajectoryPlayer(gui.canvas, arm1, arm2, center_x, center_y, scale=gui.viewport.scale)
+    gui.set_move_listener(player.set_transform)
+    recording.replay(player, start, stop, speed)
+
+    gui.root.mainloop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show or replay a robotic arm recording")
+    parser.add_argument("path", help="The recording file")
+    parser.add_argument("--replay", action="store_true", help="Replay the poses in a window")
+    parser.add_argument("--start", type=float, default=0.0, help="Start time in seconds")
+    parser.add_argument("--stop", type=float, default=math.inf, help="Stop time in seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor")
+    args = parser.parse_args()
+
+    recording = TrajectoryRecording(args.path)
+    print(f"L1 {recording.l1}, L2 {recording.l2}, direction {recording.direction}, "
+          f"started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.start_time))}")
+    print(f"{len(recording)} records over {recording.get_duration():.3f} seconds")
+
+    if args.replay:
+        replay_recording(args.path, args.start, args.stop, args.speed)
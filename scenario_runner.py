@@ -0,0 +1,416 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ik_cache import IKCache
+from kinematics import (MOVE_VALID, MOVE_OUTSIDE_WORKSPACE, MOVE_CROSSES_ORIGIN, MOVE_INTERSECTS_INNER_CIRCLE,
+                        MOVE_COLLIDES_OBSTACLE,
+                        are_coords_inside_workspace, calculate_first_arm, check_arm_lengths_fit_size, check_arm_move,
+                        check_joint_move)
+from obstacles import find_trajectory_collision, load_obstacles
+from path_planner import plan_detour_move
+from trajectory import Trajectory, plan_joint_move, plan_path_move, plan_straight_move
+
+# Names of the move status codes in the results
+MOVE_STATUS_NAMES = {
+    MOVE_VALID: "valid",
+    MOVE_OUTSIDE_WORKSPACE: "outside_workspace",
+    MOVE_CROSSES_ORIGIN: "crosses_origin",
+    MOVE_INTERSECTS_INNER_CIRCLE: "intersects_inner_circle",
+    MOVE_COLLIDES_OBSTACLE: "collides_obstacle",
+}
+
+# CSV scenario columns - Consecutive rows with the same id are the targets of one scenario. The mode column is
+# optional, read from the first row of a scenario
+CSV_COLUMNS = ["id", "l1", "l2", "direction", "x2", "y2", "xt", "yt", "mode"]
+
+# Move modes - The arm edge follows the straight line to the target, or the joint angles are interpolated
+MOVE_MODES = ("straight", "joint")
+
+
+def open_text(path, mode):
+    """
+    Open a text file, "-" being stdin or stdout, which are left open when the returned context exits
+    :param path: The file path or "-"
+    :param mode: "r" or "w"
+    :return: Context manager giving the file object
+    """
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, newline="")
+
+
+def read_scenarios(file, file_format):
+    """
+    Read scenarios one at a time, so that large files and streams are never loaded at once
+    JSON scenarios are objects {"id", "l1", "l2", "direction", "start": [x2, y2], "targets": [[xt, yt], ...]}, with
+    an optional "mode" of MOVE_MODES, either as JSON Lines with one object per line or as a single JSON array.
+    CSV scenarios use the CSV_COLUMNS header with one row per target, their values are kept as strings and converted
+    by run_scenario.
+    Malformed input does not stop the reading - A JSON line that can not be parsed is yielded as its ValueError, and
+    run_scenario reports it and malformed CSV values as invalid scenarios
+    :param file: The open text file
+    :param file_format: "jsonl", "json" or "csv"
+    :return: Generator of scenario dicts
+    """
+    if file_format == "json":
+        yield from json.load(file)
+    elif file_format == "jsonl":
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    yield error
+    elif file_format == "csv":
+        scenario = None
+        for row in csv.DictReader(file):
+            if scenario is None or row.get("id") != scenario["id"]:
+                if scenario is not None:
+                    yield scenario
+                scenario = {"id": row.get("id"), "l1": row.get("l1"), "l2": row.get("l2"),
+                            "direction": row.get("direction"), "start": [row.get("x2"), row.get("y2")],
+                            "targets": []}
+                if row.get("mode"):
+                    scenario["mode"] = row["mode"]
+            if row.get("xt") not in (None, "") and row.get("yt") not in (None, ""):
+                scenario["targets"].append([row["xt"], row["yt"]])
+        if scenario is not None:
+            yield scenario
+    else:
+        raise ValueError(f"Unknown scenario format {file_format}")
+
+
+def get_file_format(path):
+    """
+    :param path: The scenario file path, "-" for stdin
+    :return: The format from the file extension, JSON Lines for stdin and unknown extensions
+    """
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith(".json"):
+        return "json"
+    return "jsonl"
+
+
+def run_scenario(scenario, width=None, height=None, detour=False, steps=300, obstacles=None, ik_cache=None):
+    """
+    Run one scenario through the same checks and IK as run_robotic_system, without any dialog. Invalid input is
+    reported instead of asked again, and an invalid move leaves the arm where it is for the next target. In the
+    "joint" mode the joint angles are interpolated as by plan_joint_move, only the target must be inside workspace
+    and detours are never needed
+    :param scenario: The scenario dict, see read_scenarios
+    :param width: Optional canvas width the stretched arm must fit in, as check_arm_lengths_fit_canvas
+    :param height: Optional canvas height the stretched arm must fit in
+    :param detour: If True follow the detour around the internal circle for blocked moves, as if the User accepted it
+    :param steps: Number of animation steps of every move
+    :param obstacles: Optional ObstacleMap, moves where a link hits an obstacle are not done and get the
+    "collides_obstacle" status with the "obstacle" polygon and the "collision_step"
+    :param ik_cache: Optional IKCache the arm1 of the start pose is looked up in, for streams that start many
+    scenarios from the same stations
+    :return: The result dict with the scenario id, the error if the scenario is invalid, the initial arm1 and one
+    entry per target
+    """
+    if not isinstance(scenario, dict):
+        reason = scenario if isinstance(scenario, ValueError) else "not a JSON object"
+        return {"id": None, "error": f"invalid scenario: {reason!s}"}
+
+    result = {"id": scenario.get("id"), "error": None}
+
+    try:
+        l1 = abs(float(scenario["l1"]))
+        l2 = abs(float(scenario["l2"]))
+        direction = int(float(scenario["direction"]))
+        x2, y2 = (float(value) for value in scenario["start"])
+        targets = [(float(xt), float(yt)) for xt, yt in scenario.get("targets", [])]
+        mode = scenario.get("mode", "straight")
+    except (KeyError, TypeError, ValueError) as error:
+        result["error"] = f"invalid scenario: {error!r}"
+        return result
+
+    # Same checks as get_arm_lengths_input, get_arm_direction_input and get_arm2_coordinates
+    if l1 == 0 or l2 == 0:
+        result["error"] = "arm length is 0"
+    elif width is not None and height is not None and not check_arm_lengths_fit_size(l1, l2, width, height):
+        result["error"] = "arm lengths do not fit the canvas"
+    elif direction not in (0, 1):
+        result["error"] = "direction must be 0 or 1"
+    elif mode not in MOVE_MODES:
+        result["error"] = "mode must be straight or joint"
+    elif (x2, y2) == (0, 0):
+        result["error"] = "start coordinates cannot be (0, 0)"
+    elif not are_coords_inside_workspace(l1, l2, x2, y2):
+        result["error"] = "start coordinates not inside workspace"
+    if result["error"] is not None:
+        return result
+
+    # Same arm1 as get_arm1_coords and get_single_arm1_coords_from_direction, but robust to the rounding of float
+    # start points on the workspace circles - A start that the cache quantizes onto a circle is solved here too
+    x1 = y1 = None
+    if ik_cache is not None:
+        x1, y1 = ik_cache.solve(l1, l2, x2, y2, direction)
+    if x1 is None:
+        x1, y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+    result["x1"] = x1
+    result["y1"] = y1
+
+    moves = []
+    for xt, yt in targets:
+        if mode == "joint":
+            status = check_joint_move(l1, l2, xt, yt)
+        else:
+            status, _, _, _, _ = check_arm_move(l1, l2, x2, y2, xt, yt)
+        move = {"xt": xt, "yt": yt, "status": MOVE_STATUS_NAMES[status], "detour": False, "mode": mode}
+
+        trajectory = None
+        if status == MOVE_VALID and mode == "joint":
+            trajectory = plan_joint_move(direction, x2, y2, xt, yt, l1, l2, steps)
+        elif status == MOVE_VALID:
+            trajectory = plan_straight_move(direction, x2, y2, xt, yt, l1, l2, steps)
+        elif detour and status in (MOVE_CROSSES_ORIGIN, MOVE_INTERSECTS_INNER_CIRCLE):
+            path = plan_detour_move(l1, l2, x2, y2, xt, yt)
+            if path is not None:
+                trajectory = plan_path_move(direction, path, l1, l2, steps)
+                move["detour"] = True
+                move["path_length"] = path.length
+
+        if obstacles is not None and trajectory is not None:
+            # Step 0 is the start pose, as for check_arm_move_obstacles
+            poses = np.vstack(([x1, y1, x2, y2], trajectory.poses))
+            step, polygon = find_trajectory_collision(obstacles, Trajectory(l1, l2, direction, poses))
+            if step is not None:
+                move["status"] = MOVE_STATUS_NAMES[MOVE_COLLIDES_OBSTACLE]
+                move["obstacle"] = polygon
+                move["collision_step"] = step
+                trajectory = None
+
+        # The arm only moves if the whole move was computed, as the animation would end before an unreachable step
+        if trajectory is not None and len(trajectory) == steps:
+            x1, y1, x2, y2 = trajectory.poses[-1].tolist()
+            move["done"] = True
+        else:
+            move["done"] = False
+        move["x1"], move["y1"], move["x2"], move["y2"] = x1, y1, x2, y2
+        moves.append(move)
+
+    result["moves"] = moves
+    return result
+
+
+# IKCache of a worker process, kept over all chunks the worker runs, see init_worker
+worker_ik_cache = None
+
+
+def init_worker(ik_cache):
+    """
+    Set up a worker process of run_scenario_chunks
+    :param ik_cache: The IKCache the worker starts from, None for no cache
+    """
+    global worker_ik_cache
+    worker_ik_cache = ik_cache
+
+
+def run_chunk(scenarios, width, height, detour, steps, obstacles=None, ik_cache=None):
+    """
+    Run a chunk of scenarios in a worker process. A scenario that fails gets a result with the error instead of
+    failing the whole chunk
+    :param ik_cache: Optional IKCache, by default the one of the worker process
+    :return: The list of results, in the order of the scenarios
+    """
+    if ik_cache is None:
+        ik_cache = worker_ik_cache
+
+    results = []
+    for scenario in scenarios:
+        try:
+            results.append(run_scenario(scenario, width, height, detour, steps, obstacles, ik_cache))
+        except Exception as error:
+            scenario_id = scenario.get("id") if isinstance(scenario, dict) else None
+            results.append({"id": scenario_id, "error": f"scenario failed: {error!r}"})
+    return results
+
+
+def iterate_chunks(scenarios, chunk_size, stall_time=None):
+    """
+    Group scenarios into lists of chunk_size, reading them lazily
+    :param scenarios: Iterable of scenarios
+    :param chunk_size: Number of scenarios per chunk
+    :param stall_time: Optional seconds - Scenarios are then read on a thread, and when none arrives for stall_time
+    the scenarios read so far are yielded as a shorter chunk, an empty one if there are none, so that a slow stream
+    is run as it comes instead of waiting for full chunks
+    :return: Generator of lists of scenarios
+    """
+    if stall_time is None:
+        chunk = []
+        for scenario in scenarios:
+            chunk.append(scenario)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    # The end of the input, followed by the error that stopped the reading if any
+    end = object()
+    inputs = queue.Queue(chunk_size)
+
+    def read():
+        try:
+            for scenario in scenarios:
+                inputs.put(scenario)
+            inputs.put((end, None))
+        except Exception as error:
+            inputs.put((end, error))
+
+    threading.Thread(target=read, name="scenario-reader", daemon=True).start()
+
+    chunk = []
+    while True:
+        try:
+            scenario = inputs.get(timeout=stall_time)
+        except queue.Empty:
+            yield chunk
+            chunk = []
+            continue
+
+        if isinstance(scenario, tuple) and scenario[0] is end:
+            if scenario[1] is not None:
+                raise scenario[1]
+            break
+        chunk.append(scenario)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_scenario_chunks(scenarios, width=None, height=None, detour=False, steps=300, chunk_size=256, workers=None,
+                        obstacles=None, stall_time=0.1, ik_cache=None):
+    """
+    Run scenarios across a process pool and yield the results of every chunk in input order as soon as they are
+    ready. Only a few chunks per worker are read ahead, so that endless streams run in bounded memory
+    :param scenarios: Iterable of scenario dicts
+    :param width: Optional canvas width the stretched arm must fit in
+    :param height: Optional canvas height the stretched arm must fit in
+    :param detour: If True follow the detour around the internal circle for blocked moves
+    :param steps: Number of animation steps of every move
+    :param chunk_size: Number of scenarios per chunk of work
+    :param workers: Number of worker processes, None for one per CPU, 0 to run in this process
+    :param obstacles: Optional ObstacleMap the moves are checked against
+    :param stall_time: Seconds without new input after which the scenarios read so far are run as a shorter chunk,
+    None to always wait for full chunks, see iterate_chunks
+    :param ik_cache: Optional IKCache for the start poses. Worker processes each use a copy of it, so its counters
+    are only updated when the scenarios run in this process
+    :return: Generator of lists of result dicts
+    """
+    if workers == 0:
+        for chunk in iterate_chunks(scenarios, chunk_size, stall_time):
+            if chunk:
+                yield run_chunk(chunk, width, height, detour, steps, obstacles, ik_cache)
+        return
+
+    read_ahead = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(ik_cache,)) as executor:
+        # Start the worker processes before the reader thread of iterate_chunks, a process forked while that thread
+        # holds the lock of stdin would wait for the lock forever
+        executor.submit(int).result()
+
+        chunks = iterate_chunks(scenarios, chunk_size, stall_time)
+        pending = deque()
+
+        for chunk in chunks:
+            if chunk:
+                pending.append(executor.submit(run_chunk, chunk, width, height, detour, steps, obstacles))
+            # Hand over the finished chunks, and wait for the oldest one when too many are read ahead
+            while pending and (len(pending) >= read_ahead or pending[0].done()):
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_scenarios(scenarios, width=None, height=None, detour=False, steps=300, chunk_size=256, workers=None,
+                  obstacles=None, stall_time=0.1, ik_cache=None):
+    """
+    Run scenarios across a process pool and yield their results in input order as soon as they are ready, see
+    run_scenario_chunks for the parameters
+    :return: Generator of result dicts
+    """
+    for results in run_scenario_chunks(scenarios, width, height, detour, steps, chunk_size, workers, obstacles,
+                                       stall_time, ik_cache):
+        yield from results
+
+
+def run_scenario_file(path, output, file_format=None, width=None, height=None, detour=False, steps=300,
+                      chunk_size=256, workers=None, obstacles=None, ik_cache=None):
+    """
+    Run a scenario file or stream and write one JSON result per line, flushed after the results of every chunk
+    :param path: The scenario file, "-" for stdin
+    :param output: The result file, "-" for stdout
+    :param file_format: "jsonl", "json" or "csv", by default from the file extension
+    :return: A dict with the number of scenarios, invalid scenarios, moves and done moves, and the elapsed seconds
+    """
+    stats = {"scenarios": 0, "invalid": 0, "moves": 0, "done": 0}
+    start = time.perf_counter()
+
+    with open_text(path, "r") as source, open_text(output, "w") as target:
+        scenarios = read_scenarios(source, file_format or get_file_format(path))
+
+        for results in run_scenario_chunks(scenarios, width, height, detour, steps, chunk_size, workers, obstacles,
+                                           ik_cache=ik_cache):
+            for result in results:
+                stats["scenarios"] += 1
+                if result["error"] is not None:
+                    stats["invalid"] += 1
+                else:
+                    stats["moves"] += len(result["moves"])
+                    stats["done"] += sum(move["done"] for move in result["moves"])
+
+                target.write(json.dumps(result) + "\n")
+            target.flush()
+
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run robotic arm scenarios without the GUI and write JSON Lines "
+                                                 "results")
+    parser.add_argument("scenarios", help="Scenario file (.jsonl, .json or .csv), - for stdin")
+    parser.add_argument("--output", default="-", help="Result JSON Lines file, - for stdout")
+    parser.add_argument("--format", choices=("jsonl", "json", "csv"), help="Scenario format, default from extension")
+    parser.add_argument("--canvas", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"),
+                        help="Reject arms that do not fit a canvas of this size, as the GUI does")
+    parser.add_argument("--detour", action="store_true", help="Follow detours around the internal circle")
+    parser.add_argument("--steps", type=int, default=300, help="Animation steps of every move")
+    parser.add_argument("--obstacles", help="JSON file with a list of obstacle polygons the moves must not hit")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Number of scenarios per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, 0 for none")
+    parser.add_argument("--ik-cache", type=int, metavar="SIZE",
+                        help="Cache up to SIZE start pose IK solutions per process, see ik_cache.py")
+    parser.add_argument("--ik-quantum", type=float, default=1e-6, help="Grid size start poses are cached at")
+    args = parser.parse_args()
+
+    width, height = args.canvas if args.canvas else (None, None)
+    obstacles = load_obstacles(args.obstacles) if args.obstacles else None
+    ik_cache = IKCache(args.ik_quantum, args.ik_cache) if args.ik_cache else None
+    summary = run_scenario_file(args.scenarios, args.output, args.format, width, height, args.detour, args.steps,
+                                args.chunk_size, args.workers, obstacles, ik_cache)
+    print(f"{summary['scenarios']} scenarios ({summary['invalid']} invalid), {summary['done']}/{summary['moves']} "
+          f"moves done in {summary['elapsed']:.1f} s", file=sys.stderr)
+    if ik_cache is not None and args.workers == 0:
+        stats = ik_cache.get_stats()
+        print(f"IK cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+              f"hit rate {stats['hit_rate']:.1%}", file=sys.stderr)
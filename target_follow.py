@@ -0,0 +1,306 @@
+import math
+import threading
+import time
+
+import instrumentation
+from differential_ik import DifferentialIKSolver
+from ik_server import LatencyHistogram
+from kinematics import MOVE_OUTSIDE_WORKSPACE, MOVE_VALID, calculate_first_arm, check_arm_move
+
+
+class TargetFollower:
+    """
+    Solve a continuously moving target for the arm edge on a background thread. Targets can be submitted from any
+    thread at any rate, e.g. by mouse drag events on the Tk thread or by a feed reading a queue. Only the newest
+    target is kept - a target that is replaced before the solver takes it is dropped, so the solver never works
+    through a backlog of stale targets.
+
+    Every target is checked as a straight move from the current edge position with check_arm_move, as the moves
+    entered in the dialogs are, and solved with a DifferentialIKSolver warm started from the previous pose. Invalid
+    targets keep the arm where it is. Results are handed back through a single slot as well, read by the render loop
+    with get_latest, so a frame always draws the newest pose. Nothing in here touches tkinter
+    """
+
+    def __init__(self, l1, l2, direction, x2, y2, check_moves=True, clock=time.perf_counter):
+        """
+        :param l1: The fixed arm1 length L1
+        :param l2: The fixed arm2 length L2
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param x2: The initial x coordinate of arm2
+        :param y2: The initial y coordinate of arm2
+        :param check_moves: Boolean False to only check that targets are reachable, not that the straight move from
+        the current edge position is valid
+        :param clock: Function returning the current time in seconds, the same one must be used to measure latency
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.direction = direction
+        self.check_moves = check_moves
+        self.clock = clock
+        self.solver = DifferentialIKSolver(l1, l2, direction)
+        self.solver.solve(x2, y2)
+        self.x2 = x2
+        self.y2 = y2
+
+        self.submitted = 0
+        self.solved = 0
+        self.rejected = 0
+        self.dropped_targets = 0
+        self.dropped_results = 0
+        self.elbow_fallbacks = 0
+
+        self._condition = threading.Condition()
+        # Newest target (xt, yt, submit_time) not taken by the solver yet, and newest result not read yet
+        self._target = None
+        self._result = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """
+        Start the solver thread
+        """
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._solve_loop, name="target-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the solver thread, targets not solved yet are dropped
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, xt, yt):
+        """
+        Set a new target for the arm edge, replacing the previous one if it was not solved yet. Safe to call from
+        any thread
+        :param xt: The target x coordinate
+        :param yt: The target y coordinate
+        """
+        submit_time = self.clock()
+
+        with self._condition:
+            if self._target is not None:
+                self.dropped_targets += 1
+            self._target = (xt, yt, submit_time)
+            self.submitted += 1
+            self._condition.notify()
+
+    def follow_queue(self, queue):
+        """
+        Submit the (xt, yt) targets put into a queue, e.g. by another thread or a network feed, until None is put
+        :param queue: A queue.Queue of (xt, yt) tuples
+        :return: The started feeding thread
+        """
+        def feed():
+            while True:
+                target = queue.get()
+                if target is None:
+                    return
+                self.submit(*target)
+
+        thread = threading.Thread(target=feed, name="target-feed", daemon=True)
+        thread.start()
+        return thread
+
+    def get_latest(self):
+        """
+        Take the newest result, called by the render loop
+        :return: A tuple (x1, y1, x2, y2, status, submit_time) with the arm pose for the newest solved target, one of
+        the MOVE_* status values of the target and the time it was submitted, or None if nothing was solved since
+        the last call. The pose is the unchanged current pose if the target was rejected
+        """
+        with self._condition:
+            result = self._result
+            self._result = None
+        return result
+
+    def get_stats(self):
+        """
+        :return: A dict with the submitted, solved and rejected targets, the targets and results dropped as they were
+        replaced by newer ones, and the solves redone in closed form as the elbow was on the wrong side
+        """
+        return {
+            "submitted": self.submitted,
+            "solved": self.solved,
+            "rejected": self.rejected,
+            "dropped_targets": self.dropped_targets,
+            "dropped_results": self.dropped_results,
+            "elbow_fallbacks": self.elbow_fallbacks,
+        }
+
+    def _solve_loop(self):
+        while True:
+            with self._condition:
+                while self._target is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                xt, yt, submit_time = self._target
+                self._target = None
+
+            if instrumentation.enabled:
+                start = instrumentation.now()
+
+            result = self._solve(xt, yt) + (submit_time,)
+
+            if instrumentation.enabled:
+                instrumentation.record("follow_solve", start, instrumentation.now() - start)
+
+            with self._condition:
+                if self._result is not None:
+                    self.dropped_results += 1
+                self._result = result
+                self.solved += 1
+
+    def _solve(self, xt, yt):
+        if self.check_moves:
+            status = check_arm_move(self.l1, self.l2, self.x2, self.y2, xt, yt)[0]
+        else:
+            status = MOVE_VALID
+
+        if status == MOVE_VALID:
+            x1, y1 = self.solver.solve(xt, yt)
+            if x1 is not None and (x1 * yt - y1 * xt) * (-1 if self.direction == 1 else 1) <= 0:
+                # The elbow is not on the side of the direction - solve again in closed form
+                x1, y1 = calculate_first_arm(xt, yt, self.l1, self.l2, self.direction)
+                self.solver.reset()
+                self.elbow_fallbacks += 1
+            if x1 is None:
+                status = MOVE_OUTSIDE_WORKSPACE
+            else:
+                self.x2, self.y2 = xt, yt
+                return x1, y1, xt, yt, status
+
+        # The arm stays at its current pose
+        self.rejected += 1
+        if self.solver.x1 is None:
+            self.solver.solve(self.x2, self.y2)
+        return self.solver.x1, self.solver.y1, self.x2, self.y2, status
+
+
+class FollowRenderer:
+    """
+    Render loop of a TargetFollower on the Tk thread. Every frame draws the newest result of the follower, if any,
+    and measures its end-to-end latency from the submission of the target to the canvas update. Frames are scheduled
+    against a monotonic clock as in FrameScheduler, so that the rate stays at `fps` on average even though
+    tkinter.after only takes whole milliseconds
+    """
+
+    def __init__(self, canvas, arm1, arm2, center_x, center_y, follower, fps=120, recorder=None, scale=1.0):
+        """
+        :param canvas: The canvas the arm is drawn on
+        :param arm1: The robotic arm line 1
+        :param arm2: The robotic arm line 2
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param follower: The TargetFollower to draw
+        :param fps: The target frame rate
+        :param recorder: Optional TrajectoryRecorder every drawn pose is recorded to
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.canvas = canvas
+        self.arm1 = arm1
+        self.arm2 = arm2
+        self.center_x = center_x
+        self.center_y = center_y
+        self.scale = scale
+        self.follower = follower
+        self.fps = fps
+        self.recorder = recorder
+
+        self.histogram = LatencyHistogram()
+        self.frames = 0
+        self.updates = 0
+
+        self._start_time = None
+        self._frame = 0
+        self._after_id = None
+
+    def start(self):
+        """
+        Start the follower thread and the render loop
+        """
+        self.follower.start()
+        self._start_time = self.follower.clock()
+        self._frame = 0
+        self._tick()
+
+    def stop(self):
+        """
+        Stop the render loop and the follower thread
+        """
+        if self._after_id is not None:
+            self.canvas.after_cancel(self._after_id)
+            self._after_id = None
+        self.follower.stop()
+
+    def set_transform(self, center_x, center_y, scale):
+        """
+        Draw the next poses and map the mouse with a new world to canvas transform, e.g. as a Viewport listener
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit
+        """
+        self.center_x, self.center_y, self.scale = center_x, center_y, scale
+
+    def bind_mouse(self):
+        """
+        Follow the mouse while the left button is pressed or dragged on the canvas
+        """
+        def submit(event):
+            self.follower.submit((event.x - self.center_x) / self.scale, (self.center_y - event.y) / self.scale)
+
+        self.canvas.bind("<Button-1>", submit)
+        self.canvas.bind("<B1-Motion>", submit)
+
+    def get_stats(self):
+        """
+        :return: A dict with the follower counters, the drawn frames, the frames that updated the arm, the achieved
+        fps and the latency histogram from target submission to canvas update
+        """
+        clock = self.follower.clock
+        elapsed = clock() - self._start_time if self._start_time is not None else 0.0
+
+        stats = self.follower.get_stats()
+        stats.update({
+            "frames": self.frames,
+            "updates": self.updates,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "latency": self.histogram.to_dict(),
+        })
+        return stats
+
+    def _tick(self):
+        self._after_id = None
+        clock = self.follower.clock
+
+        result = self.follower.get_latest()
+        if result is not None:
+            x1, y1, x2, y2, status, submit_time = result
+            canvas_x1 = self.center_x + x1 * self.scale
+            canvas_y1 = self.center_y - y1 * self.scale
+            self.canvas.coords(self.arm1, self.center_x, self.center_y, canvas_x1, canvas_y1)
+            self.canvas.coords(self.arm2, canvas_x1, canvas_y1,
+                               self.center_x + x2 * self.scale, self.center_y - y2 * self.scale)
+
+            self.histogram.record(clock() - submit_time)
+            self.updates += 1
+            if self.recorder is not None:
+                self.recorder.record(x1, y1, x2, y2)
+        self.frames += 1
+
+        # Wake up at the start of the next frame, frames that are already late are not caught up
+        now = clock()
+        self._frame = max(self._frame + 1, int((now - self._start_time) * self.fps) + 1)
+        delay = max(0, math.ceil((self._start_time + self._frame / self.fps - now) * 1000))
+        self._after_id = self.canvas.after(delay, self._tick)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from animation import TrajectoryPlayer
+from trajectory import Trajectory
+
+
+class StubCanvas:
+    def __init__(self):
+        self.callbacks = []
+
+    def coords(self, item, *coords):
+        pass
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+        return len(self.callbacks)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class ListRecorder:
+    def __init__(self):
+        self.poses = []
+
+    def record(self, x1, y1, x2, y2):
+        self.poses.append((x1, y1, x2, y2))
+
+
+def test_timed_play_records_skipped_steps():
+    poses = np.column_stack([np.full(20, 100.0), np.zeros(20), np.linspace(100, 160, 20), np.linspace(0, 30, 20)])
+    canvas = StubCanvas()
+    recorder = ListRecorder()
+    player = TrajectoryPlayer(canvas, 1, 2, 300, 300, recorder=recorder)
+
+    done = []
+    scheduler = player.play_timed(Trajectory(100, 60, 0, poses), 1.0, 60, on_done=lambda: done.append(True))
+    start = scheduler._start_time
+
+    # Only 3 frames are drawn - the start, the middle and the end of the move
+    for elapsed in (0.5, 1.5):
+        scheduler.clock = lambda: start + elapsed
+        canvas.callbacks.pop()()
+
+    assert done and scheduler.frames == 3
+    assert recorder.poses == [tuple(pose) for pose in poses.tolist()]
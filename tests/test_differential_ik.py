@@ -0,0 +1,74 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from differential_ik import DifferentialIKSolver
+from kinematics import calculate_first_arm, get_workspace_radius
+
+
+def get_closed_path(l1, l2, count, margin):
+    """
+    :param margin: Part of the ring width kept from both workspace radii
+    :return: A tuple (x, y) of lists, a closed path going 3 times between the workspace radii
+    """
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    angle = np.linspace(0, 2 * math.pi, count)
+    radius = int_r + (ext_r - int_r) * (0.5 + (0.5 - margin) * np.sin(3 * angle))
+    return (radius * np.cos(angle)).tolist(), (radius * np.sin(angle)).tolist()
+
+
+def get_max_error(l1, l2, direction, x, y):
+    """
+    :return: The largest distance of arm1 from solve_path to the closed form solution, relative to L1 + L2
+    """
+    x1, y1 = DifferentialIKSolver(l1, l2, direction).solve_path(x, y)
+    closed_x1, closed_y1 = np.array([calculate_first_arm(x2, y2, l1, l2, direction) for x2, y2 in zip(x, y)]).T
+    return float(np.hypot(x1 - closed_x1, y1 - closed_y1).max()) / (l1 + l2)
+
+
+def test_jump_keeps_elbow_side():
+    # A jump where arm1 is almost perpendicular to the new edge passed the error estimate of the step
+    solver = DifferentialIKSolver(37.8, 115.9, 1)
+    solver.solve(-38.6, -71.2)
+    x1, y1 = solver.solve(-65.0, 85.6)
+    closed_x1, closed_y1 = calculate_first_arm(-65.0, 85.6, 37.8, 115.9, 1)
+    assert math.hypot(x1 - closed_x1, y1 - closed_y1) < 1e-9
+
+
+def test_random_jumps_match_closed_form():
+    rng = random.Random(5)
+    for _ in range(500):
+        l1, l2, direction = rng.uniform(5, 150), rng.uniform(5, 150), rng.randint(0, 1)
+        ext_r, int_r = get_workspace_radius(l1, l2)
+        solver = DifferentialIKSolver(l1, l2, direction)
+
+        for _ in range(40):
+            radius, angle = rng.uniform(int_r, ext_r), rng.uniform(0, 2 * math.pi)
+            x2, y2 = radius * math.cos(angle), radius * math.sin(angle)
+            x1, y1 = solver.solve(x2, y2)
+            closed_x1, closed_y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+            if closed_x1 is None:
+                assert x1 is None
+            else:
+                assert math.hypot(x1 - closed_x1, y1 - closed_y1) <= 1e-6 * (l1 + l2)
+
+
+@pytest.mark.parametrize("l1, l2", [(100, 60), (37.8, 115.9), (80, 80)])
+@pytest.mark.parametrize("direction", [0, 1])
+def test_dense_path_accuracy(l1, l2, direction):
+    x, y = get_closed_path(l1, l2, 100000, 0.05)
+    assert get_max_error(l1, l2, direction, x, y) <= 3e-8
+
+    x, y = get_closed_path(l1, l2, 100000, 1e-3)
+    assert get_max_error(l1, l2, direction, x, y) <= 2e-7
+
+
+def test_dense_path_stays_incremental():
+    x, y = get_closed_path(100, 60, 100000, 0.05)
+    solver = DifferentialIKSolver(100, 60, 1)
+    solver.solve_path(x, y)
+    stats = solver.get_stats()
+    assert stats["singular"] == 0
+    assert stats["anchors"] <= len(x) // 32 + 1 + stats["inaccurate"]
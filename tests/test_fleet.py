@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from fleet import ArmFleet, FleetRenderer
+from kinematics import MOVE_VALID, check_arm_move
+
+
+def get_fleet():
+    return ArmFleet([100, 80, 60, 100, 50], [60, 80, 40, 60, 50], np.arange(5) * 400.0, 0.0, [1, 0, 1, 0, 1],
+                    [150, 100, 90, 40, 80], [20, 50, 0, 110, 10])
+
+
+@pytest.mark.parametrize("xt, yt, duration", [
+    (140, 30, 1.0),
+    (np.full(5, 140.0), 30, np.full(5, 1.0)),
+    (140, np.full(5, 30.0), 1.0),
+])
+def test_set_targets_broadcasts_single_values(xt, yt, duration):
+    fleet = get_fleet()
+    x2, y2 = fleet.x2.copy(), fleet.y2.copy()
+    valid = fleet.set_targets(np.arange(5), xt, yt, duration, 0)
+
+    expected = [check_arm_move(l1, l2, x, y, 140, 30)[0] == MOVE_VALID
+                for l1, l2, x, y in zip(fleet.l1.tolist(), fleet.l2.tolist(), x2.tolist(), y2.tolist())]
+    assert valid.tolist() == expected
+
+    fleet.update(1.0)
+    assert np.allclose(fleet.x2[valid], 140) and np.allclose(fleet.y2[valid], 30)
+    assert np.array_equal(fleet.x2[~valid], x2[~valid]) and np.array_equal(fleet.y2[~valid], y2[~valid])
+
+
+def test_set_targets_of_some_arms():
+    fleet = get_fleet()
+    valid = fleet.set_targets(np.array([True, False, True, False, False]), [140, 60], 30, 2.0, 0)
+    assert valid.shape == (2,)
+    assert fleet.is_moving(1.0).tolist() == [valid[0], False, valid[1], False, False]
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.lines = {}
+
+    def create_line(self, *args, **kwargs):
+        self.lines[len(self.lines) + 1] = args[:4]
+        return len(self.lines)
+
+    def coords(self, item, *args):
+        self.lines[item] = args
+
+
+def test_renderer_draws_with_transform():
+    fleet = ArmFleet([100], [60], [10], [20], [1], [150], [20])
+    canvas = RecordingCanvas()
+    renderer = FleetRenderer(canvas, fleet, 400, 300, scale=2.0)
+    base_x, base_y, x1, y1, x2, y2 = (float(value[0]) for value in fleet.get_world_poses())
+    assert canvas.lines[1] == pytest.approx((400 + base_x * 2, 300 - base_y * 2, 400 + x1 * 2, 300 - y1 * 2))
+
+    renderer.set_transform(100, 50, 0.5)
+    renderer.draw()
+    assert canvas.lines[2] == pytest.approx((100 + x1 / 2, 50 - y1 / 2, 100 + x2 / 2, 50 - y2 / 2))
@@ -0,0 +1,64 @@
+import pytest
+
+from ik_cache import IKCache
+from kinematics import calculate_first_arm
+from scenario_runner import run_scenarios
+
+
+def test_hits_and_misses():
+    cache = IKCache(quantum=1e-3)
+    x1, y1 = cache.solve(100, 60, 120.0, 40.0, 1)
+    assert (x1, y1) == pytest.approx(calculate_first_arm(120.0, 40.0, 100, 60, 1))
+
+    # Rounding noise below the quantum is a hit, the other direction or arm lengths are not
+    assert cache.solve(100, 60, 120.0 + 1e-5, 40.0 - 1e-5, 1) == (x1, y1)
+    assert cache.solve(100, 60, 120.0, 40.0, 0) == pytest.approx(calculate_first_arm(120.0, 40.0, 100, 60, 0))
+    assert cache.solve(90, 60, 120.0, 40.0, 1) == pytest.approx(calculate_first_arm(120.0, 40.0, 90, 60, 1))
+    assert cache.solve(100, 60, 170.0, 0.0, 1) == (None, None)
+    assert cache.solve(100, 60, 170.0, 0.0, 1) == (None, None)
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 4, 0, 4)
+    assert stats["hit_rate"] == pytest.approx(2 / 6)
+
+
+def test_least_recently_used_is_evicted():
+    cache = IKCache(max_size=2)
+    cache.solve(100, 60, 120.0, 40.0, 1)
+    cache.solve(100, 60, 100.0, 50.0, 1)
+    # Use the first target again, so the second one is evicted by the third
+    cache.solve(100, 60, 120.0, 40.0, 1)
+    cache.solve(100, 60, 80.0, -60.0, 1)
+    assert len(cache) == 2 and cache.evictions == 1
+
+    cache.solve(100, 60, 120.0, 40.0, 1)
+    cache.solve(100, 60, 100.0, 50.0, 1)
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+
+    cache.clear()
+    assert len(cache) == 0 and cache.get_stats()["hit_rate"] == 0.0
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        IKCache(quantum=0)
+    with pytest.raises(ValueError):
+        IKCache(max_size=0)
+
+
+def test_scenarios_from_cached_stations():
+    stations = [(120.0, 40.0), (-90.0, 75.0), (10.0, -150.0)]
+    scenarios = [{"id": index, "l1": 100, "l2": 60, "direction": index % 2, "start": stations[index % 3],
+                  "targets": [[130, -20]]} for index in range(12)]
+
+    cache = IKCache()
+    cached = list(run_scenarios(scenarios, workers=0, stall_time=None, ik_cache=cache))
+    assert (cache.misses, cache.hits) == (6, 6)
+
+    # The cached arm1 comes from get_arm1_coords instead of calculate_first_arm, equal up to rounding
+    keys = ("x1", "y1", "x2", "y2")
+    for result, expected in zip(cached, run_scenarios(scenarios, workers=0, stall_time=None)):
+        assert [result[key] for key in keys[:2]] == pytest.approx([expected[key] for key in keys[:2]])
+        for move, expected_move in zip(result["moves"], expected["moves"]):
+            assert [move[key] for key in keys] == pytest.approx([expected_move[key] for key in keys])
+            assert (move["status"], move["done"]) == (expected_move["status"], expected_move["done"])
@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+import pytest
+
+from kinematics import (MOVE_CROSSES_ORIGIN, MOVE_INTERSECTS_INNER_CIRCLE, MOVE_OUTSIDE_WORKSPACE, MOVE_VALID,
+                        calculate_first_arm, check_arm_move, get_arm1_coords, get_single_arm1_coords_from_direction)
+from kinematics_batch import (CHUNK_SIZE, calculate_first_arm_batch, check_arm_moves_batch, get_arm1_coords_batch,
+                              get_joint_angles_batch, solve_arm_batch)
+
+
+def get_targets(l1, l2, count, seed=0):
+    """
+    :return: A tuple (x, y) of arrays spread over a disk 10% larger than the workspace, with points on the axes and
+    on both workspace radii
+    """
+    rng = np.random.default_rng(seed)
+    radius = rng.uniform(0, 1.1 * (l1 + l2), count)
+    angle = rng.uniform(0, 2 * math.pi, count)
+    x = np.concatenate([radius * np.cos(angle), [0, 0, l1 + l2, 0, abs(l1 - l2), 0]])
+    y = np.concatenate([radius * np.sin(angle), [l1 + l2, -(l1 + l2), 0, abs(l1 - l2) or 1, 0, 0]])
+    return x, y
+
+
+@pytest.mark.parametrize("l1, l2", [(100, 60), (60, 100), (80, 80), (37.8, 115.9)])
+def test_batch_matches_scalar(l1, l2):
+    # More points than CHUNK_SIZE, so that the chunks are joined
+    x, y = get_targets(l1, l2, CHUNK_SIZE + 1000)
+    direction = np.arange(len(x)) % 2
+    tolerance = 1e-6 * (l1 + l2)
+
+    x1, y1, shoulder, elbow, reachable = solve_arm_batch(l1, l2, x, y, direction)
+    first_x1, first_y1, first_reachable = calculate_first_arm_batch(x, y, l1, l2, direction)
+    x1a, y1a, x1b, y1b, coords_reachable = get_arm1_coords_batch(l1, l2, x, y)
+    joint_shoulder, joint_elbow = get_joint_angles_batch(x1, y1, x, y)
+
+    for index in range(0, len(x), 7):
+        x2, y2, point_direction = float(x[index]), float(y[index]), int(direction[index])
+        closed = calculate_first_arm(x2, y2, l1, l2, point_direction)
+        assert reachable[index] == first_reachable[index] == coords_reachable[index] == (closed[0] is not None)
+
+        if not reachable[index]:
+            assert np.isnan([x1[index], y1[index], shoulder[index], elbow[index], first_x1[index]]).all()
+            continue
+
+        coords = get_arm1_coords(l1, l2, x2, y2, verbose=False)
+        single = get_single_arm1_coords_from_direction(x2, y2, *coords, point_direction, verbose=False)
+        assert np.allclose([x1a[index], y1a[index], x1b[index], y1b[index]], coords, rtol=0, atol=tolerance)
+        assert np.allclose([x1[index], y1[index]], single, rtol=0, atol=tolerance)
+        assert np.allclose([first_x1[index], first_y1[index]], closed, rtol=0, atol=tolerance)
+        assert shoulder[index] == pytest.approx(joint_shoulder[index], abs=1e-9)
+        assert elbow[index] == pytest.approx(joint_elbow[index], abs=1e-9)
+
+
+def test_batch_shapes():
+    x, y = get_targets(100, 60, 2 * CHUNK_SIZE)
+    x1, y1, _, _, reachable = solve_arm_batch(100, 60, x[:-2].reshape(2, -1), y[:-2].reshape(2, -1), 1)
+    assert x1.shape == y1.shape == reachable.shape == (2, CHUNK_SIZE + 2)
+
+    x1, y1, reachable = calculate_first_arm_batch(100.0, 30.0, 100, 60, 0)
+    assert np.ndim(x1) == 0 and bool(reachable)
+    assert (float(x1), float(y1)) == pytest.approx(calculate_first_arm(100.0, 30.0, 100, 60, 0))
+
+
+@pytest.mark.parametrize("l1, l2", [(100, 60), (60, 100), (80, 80), (37.8, 115.9)])
+def test_check_moves_batch_matches_scalar(l1, l2):
+    rng = np.random.default_rng(1)
+    count = 2000
+    # Start poses inside the workspace, targets spread over a disk 10% larger than the workspace
+    radius = rng.uniform(abs(l1 - l2), l1 + l2, count)
+    angle = rng.uniform(0, 2 * math.pi, count)
+    x2, y2 = radius * np.cos(angle), radius * np.sin(angle)
+    xt, yt = get_targets(l1, l2, count, seed=2)
+    xt, yt = xt[:count], yt[:count]
+
+    status, xs1, ys1, xs2, ys2 = check_arm_moves_batch(l1, l2, x2, y2, xt, yt)
+    assert status.shape == xs1.shape == (count,)
+    assert {MOVE_VALID, MOVE_OUTSIDE_WORKSPACE} <= set(status.tolist())
+
+    for index in range(count):
+        scalar = check_arm_move(l1, l2, float(x2[index]), float(y2[index]), float(xt[index]), float(yt[index]))
+        assert status[index] == scalar[0]
+        if status[index] == MOVE_INTERSECTS_INNER_CIRCLE:
+            batch_points = sorted([(xs1[index], ys1[index]), (xs2[index], ys2[index])])
+            assert np.allclose(batch_points, sorted([scalar[1:3], scalar[3:5]]), rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("l1, l2, x2, y2, xt, yt, expected", [
+    # Vertical moves - through the inner circle, beside it and on a line that only cuts it outside the segment
+    (100, 60, 0, 70, 0, -70, MOVE_INTERSECTS_INNER_CIRCLE),
+    (100, 60, 30, 70, 30, -70, MOVE_INTERSECTS_INNER_CIRCLE),
+    (100, 60, 50, 70, 50, -70, MOVE_VALID),
+    (100, 60, 0, 70, 0, 120, MOVE_VALID),
+    (100, 60, 0, 70, 0, 170, MOVE_OUTSIDE_WORKSPACE),
+    # Moves through the origin - the inner circle for L1 != L2, the single unreachable point for L1 = L2
+    (100, 60, 70, 70, -70, -70, MOVE_INTERSECTS_INNER_CIRCLE),
+    (80, 80, 70, 70, -70, -70, MOVE_CROSSES_ORIGIN),
+    (80, 80, 100, 0, -100, 0, MOVE_CROSSES_ORIGIN),
+    (80, 80, 70, 70, -60, 80, MOVE_VALID),
+])
+def test_check_moves_batch_edge_cases(l1, l2, x2, y2, xt, yt, expected):
+    status, xs1, ys1, xs2, ys2 = check_arm_moves_batch(l1, l2, np.array([x2]), np.array([y2]), np.array([xt]),
+                                                       np.array([yt]))
+    assert status[0] == expected == check_arm_move(l1, l2, x2, y2, xt, yt)[0]
+    # The intersection points are those of the whole move line, so they exist whenever the line cuts the inner circle
+    if expected == MOVE_INTERSECTS_INNER_CIRCLE or (x2 == xt and abs(x2) < abs(l1 - l2)):
+        assert math.hypot(xs1[0], ys1[0]) == pytest.approx(abs(l1 - l2))
+        assert math.hypot(xs2[0], ys2[0]) == pytest.approx(abs(l1 - l2))
+    else:
+        assert np.isnan([xs1[0], ys1[0], xs2[0], ys2[0]]).all()
+
+
+def test_check_moves_batch_vertical_through_origin():
+    # For L1 = L2 a vertical move through (0, 0) is rejected by both, check_arm_move finds it through the degenerate
+    # inner circle of radius 0 and check_arm_moves_batch as a move through the origin
+    status, _, _, _, _ = check_arm_moves_batch(80, 80, np.array([0.0, 0.0]), np.array([100.0, 100.0]),
+                                               np.array([0.0, 0.0]), np.array([-100.0, 50.0]))
+    assert status.tolist() == [MOVE_CROSSES_ORIGIN, MOVE_VALID]
+    assert check_arm_move(80, 80, 0.0, 100.0, 0.0, -100.0)[0] == MOVE_INTERSECTS_INNER_CIRCLE
+    assert check_arm_move(80, 80, 0.0, 100.0, 0.0, 50.0)[0] == MOVE_VALID
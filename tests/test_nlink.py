@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from kinematics import MOVE_CROSSES_ORIGIN, MOVE_OUTSIDE_WORKSPACE, MOVE_VALID, check_arm_move
+from nlink import (ChainIKSolver, check_chain_move, get_chain_workspace_radius, get_equivalent_arm_lengths,
+                   plan_chain_move)
+
+
+@pytest.mark.parametrize("lengths", [[100, 60, 40], [100, 60, 50], [50, 50, 50, 50]])
+def test_folding_chain_moves_through_origin(lengths):
+    assert get_chain_workspace_radius(lengths)[1] == 0
+    assert check_chain_move(lengths, 120, 0, -120, 0)[0] == MOVE_VALID
+    assert check_chain_move(lengths, 120, 0, -500, 0)[0] == MOVE_OUTSIDE_WORKSPACE
+
+    solver = ChainIKSolver(lengths, 1)
+    trajectory = plan_chain_move(solver, 120, 0, -120, 0, 300)
+    assert len(trajectory) == 300
+    edge_x = 120 - 240 * np.arange(1, 301) / 300
+    assert np.hypot(trajectory.edge_x - edge_x, trajectory.edge_y).max() <= 1e-6
+
+
+def test_two_links_keep_the_scalar_check():
+    assert check_chain_move([80, 80], 120, 0, -120, 0)[0] == MOVE_CROSSES_ORIGIN
+
+
+@pytest.mark.parametrize("lengths", [[200, 60, 50], [100, 60]])
+def test_ring_chain_matches_scalar_check(lengths):
+    rng = np.random.default_rng(3)
+    l1, l2 = get_equivalent_arm_lengths(lengths)
+    for x, y, xt, yt in rng.uniform(-l1 - l2, l1 + l2, (500, 4)).tolist():
+        assert check_chain_move(lengths, x, y, xt, yt) == check_arm_move(l1, l2, x, y, xt, yt)
+
+
+@pytest.mark.parametrize("lengths", [[100, 60, 50], [1000, 600, 500, 400], [100, 60, 50, 40, 30, 20]])
+def test_tolerance_is_absolute(lengths):
+    rng = np.random.default_rng(4)
+    ext_r, int_r = get_chain_workspace_radius(lengths)
+    solver = ChainIKSolver(lengths, 0)
+    for radius, angle in zip(rng.uniform(int_r, ext_r, 200).tolist(), rng.uniform(0, 2 * math.pi, 200).tolist()):
+        solver.reset()
+        x, y = radius * math.cos(angle), radius * math.sin(angle)
+        pose = solver.solve(x, y)
+        assert math.hypot(pose[-2] - x, pose[-1] - y) <= 1e-6
+    assert solver.get_stats()["unconverged"] == 0
+
+
+def test_chain_trajectory():
+    solver = ChainIKSolver([100, 60, 50], 1)
+    trajectory = plan_chain_move(solver, 120, 40, -60, 120, 50)
+    assert (trajectory.l1, trajectory.l2, trajectory.direction) == (100, 60, 1)
+    assert len(trajectory) == 50 and trajectory.poses.shape == (50, 6)
+
+    x1, y1, x2, y2, x3, y3 = trajectory.poses[-1].tolist()
+    frames = trajectory.get_canvas_frames(400, 300, 2.0)
+    assert frames[-1] == pytest.approx((400 + x1 * 2, 300 - y1 * 2, 400 + x2 * 2, 300 - y2 * 2,
+                                        400 + x3 * 2, 300 - y3 * 2))
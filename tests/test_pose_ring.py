@@ -0,0 +1,28 @@
+from kinematics import MOVE_OUTSIDE_WORKSPACE, MOVE_VALID, calculate_first_arm
+from pose_ring import FLAG_LAST, PoseRing, stream_move
+
+
+def stream(start_pose, xt, yt):
+    ring = PoseRing(capacity=64)
+    try:
+        stream_move(ring.name, 0, start_pose[2], start_pose[3], xt, yt, 100, 60, 10, 0.0, start_pose=start_pose,
+                    joint=True)
+        return ring.read()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_joint_move_streams_all_poses():
+    start_pose = (*calculate_first_arm(150, 0, 100, 60, 0), 150, 0)
+    records = stream(start_pose, 0, 150)
+    assert len(records) == 10
+    assert (records["status"] == MOVE_VALID).all()
+    assert records["flags"].tolist() == [0] * 9 + [FLAG_LAST]
+
+
+def test_unreachable_joint_move_writes_last_start_pose():
+    start_pose = (*calculate_first_arm(150, 0, 100, 60, 0), 150, 0)
+    records = stream(start_pose, 500, 0)
+    assert len(records) == 1
+    assert records[0].item()[1:] == (*start_pose, MOVE_OUTSIDE_WORKSPACE, FLAG_LAST)
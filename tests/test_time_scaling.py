@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from time_scaling import get_joint_rates, time_optimal_scaling
+
+MAX_VELOCITY = (2.0, 3.0)
+MAX_ACCELERATION = (5.0, 8.0)
+
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_single_sample_takes_no_time(count):
+    assert time_optimal_scaling(np.zeros((count, 2)), MAX_VELOCITY, MAX_ACCELERATION).tolist() == [0.0] * count
+
+
+@pytest.mark.parametrize("end, duration", [
+    # The shoulder reaches its velocity limit: 1 / 2 + 2 / 5
+    ([1.0, 1.0], 0.9),
+    # Neither joint reaches its velocity limit, the elbow is the slowest: 2 * sqrt(0.2 / 8)
+    ([0.1, -0.2], 2 * np.sqrt(0.2 / 8)),
+])
+def test_two_samples_rest_to_rest(end, duration):
+    times = time_optimal_scaling(np.array([[0.0, 0.0], end]), MAX_VELOCITY, MAX_ACCELERATION)
+    assert np.isfinite(times).all()
+    assert times.tolist() == pytest.approx([0.0, duration])
+
+    # The dense path along the same segment ends at the same time
+    dense_times = time_optimal_scaling(np.linspace([0.0, 0.0], end, 2000), MAX_VELOCITY, MAX_ACCELERATION)
+    assert dense_times[-1] == pytest.approx(duration, rel=1e-3)
+
+
+def test_two_samples_after_still_samples():
+    angles = np.array([[0.0, 0.0], [0.0, 0.0], [1.0, 1.0], [1.0, 1.0]])
+    times = time_optimal_scaling(angles, MAX_VELOCITY, MAX_ACCELERATION)
+    assert times.tolist() == pytest.approx([0.0, 0.0, 0.9, 0.9])
+
+
+def test_dense_path_respects_limits():
+    shoulder = np.linspace(0, 3, 5000)
+    angles = np.column_stack((shoulder, np.sin(shoulder * 2)))
+    times = time_optimal_scaling(angles, MAX_VELOCITY, MAX_ACCELERATION)
+    velocity, acceleration = get_joint_rates(angles, times)
+    assert (velocity <= np.array(MAX_VELOCITY) * 1.01).all()
+    assert (acceleration <= np.array(MAX_ACCELERATION) * 1.05).all()
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from kinematics_batch import solve_arm_batch
+from workspace_raster import RASTER_REACHABLE, RASTER_SHOULDER, load_workspace_raster
+
+
+@pytest.fixture
+def raster(tmp_path):
+    # Grid points every 10 units from -160, so (40, 0) lies exactly on the internal circle
+    return load_workspace_raster(100, 60, 10, str(tmp_path))
+
+
+def test_interpolation_skips_boundary_points(raster):
+    row, col = raster._nearest_cells(40, 0)
+    assert raster.data[RASTER_REACHABLE, row, col] == 0
+    assert not np.isnan(raster.data[RASTER_SHOULDER[0], row, col])
+
+    # The cell around (44, 6) has (40, 0) as a corner, so the nearest grid point (40, 10) is used
+    nearest = raster.get_joint_angles(44, 6, 0)
+    assert raster.get_joint_angles(44, 6, 0, interpolate=True) == pytest.approx(nearest)
+    assert np.isnan(raster.get_joint_angles(40.5, 0.5, 0, interpolate=True)).all()
+
+
+def test_interpolation_inside_workspace(raster):
+    x = np.array([75.0, -93.3, 12.4])
+    y = np.array([31.0, 20.1, -118.7])
+    _, _, shoulder, elbow, _ = solve_arm_batch(100, 60, x, y, 1)
+    refined_shoulder, refined_elbow = raster.get_joint_angles(x, y, 1, interpolate=True)
+    assert np.allclose(refined_shoulder, shoulder, atol=1e-2)
+    assert np.allclose(refined_elbow, elbow, atol=1e-2)
+    assert raster.is_reachable(x, y).all()
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+
+from kinematics import calculate_first_arm, get_joint_angles
+from kinematics_batch import calculate_first_arm_batch, forward_kinematics_batch
+
+
+class Trajectory:
+    """
+    Precomputed robotic arm poses of a move, stored as a (steps, 4) array of (x1, y1, x2, y2) rows
+    """
+
+    def __init__(self, l1, l2, direction, poses):
+        """
+        :param l1: The fixed arm1 length L1
+        :param l2: The fixed arm2 length L2
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param poses: Array-like of shape (steps, 4) with the (x1, y1, x2, y2) pose of every step
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.direction = direction
+        self.poses = np.ascontiguousarray(poses, dtype=float).reshape(-1, 4)
+
+        # Canvas frames already computed for a canvas transform, see get_canvas_frames
+        self._frames_transform = None
+        self._frames = None
+
+    def __len__(self):
+        return len(self.poses)
+
+    @property
+    def x1(self):
+        return self.poses[:, 0]
+
+    @property
+    def y1(self):
+        return self.poses[:, 1]
+
+    @property
+    def x2(self):
+        return self.poses[:, 2]
+
+    @property
+    def y2(self):
+        return self.poses[:, 3]
+
+    def get_canvas_frames(self, center_x, center_y, scale=1.0):
+        """
+        Translate all poses to canvas coordinates once, so that they can be replayed without any computation
+        :param center_x: The x canvas coordinate of the (0, 0) point
+        :param center_y: The y canvas coordinate of the (0, 0) point
+        :param scale: Number of canvas pixels per world unit, see viewport.Viewport
+        :return: A list of tuples (canvas_x1, canvas_y1, canvas_x2, canvas_y2), one for every step
+        """
+        if self._frames_transform != (center_x, center_y, scale):
+            canvas_poses = np.empty_like(self.poses)
+            canvas_poses[:, 0::2] = center_x + self.poses[:, 0::2] * scale
+            canvas_poses[:, 1::2] = center_y - self.poses[:, 1::2] * scale
+
+            self._frames = [tuple(frame) for frame in canvas_poses.tolist()]
+            self._frames_transform = (center_x, center_y, scale)
+
+        return self._frames
+
+
+def plan_straight_move(direction, x2, y2, xt, yt, l1, l2, steps):
+    """
+    Compute up front all arm poses of a straight move of the arm edge from (x2, y2) to (xt, yt)
+    As in iterate_arm_move, the trajectory ends before the first unreachable step
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate of robotic movement
+    :param yt: The final target y coordinate of robotic movement
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps for the move
+    :return: The Trajectory of the move
+    """
+    # Arm2 positions of every step, the initial position itself is not part of the move
+    fractions = np.arange(1, steps + 1) / steps
+    path_x2 = x2 + (xt - x2) * fractions
+    path_y2 = y2 + (yt - y2) * fractions
+
+    path_x1, path_y1, reachable = calculate_first_arm_batch(path_x2, path_y2, l1, l2, direction)
+
+    # Keep the steps before the first unreachable one
+    count = steps if reachable.all() else int(np.argmin(reachable))
+
+    poses = np.column_stack((path_x1, path_y1, path_x2, path_y2))[:count]
+    return Trajectory(l1, l2, direction, poses)
+
+
+def plan_path_move(direction, path, l1, l2, steps):
+    """
+    Compute up front all arm poses of a move of the arm edge along a PlannedPath, e.g. a detour around the internal
+    circle from plan_detour_move. The steps are evenly spaced along the path length
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param path: The PlannedPath to follow
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps for the move
+    :return: The Trajectory of the move, ending before the first unreachable step
+    """
+    path_x2, path_y2 = path.sample(steps)
+    path_x1, path_y1, reachable = calculate_first_arm_batch(path_x2, path_y2, l1, l2, direction)
+
+    count = steps if reachable.all() else int(np.argmin(reachable))
+
+    poses = np.column_stack((path_x1, path_y1, path_x2, path_y2))[:count]
+    return Trajectory(l1, l2, direction, poses)
+
+
+def plan_joint_move(direction, x2, y2, xt, yt, l1, l2, steps):
+    """
+    Compute up front all arm poses of a joint space move from (x2, y2) to (xt, yt). IK is solved only for the two
+    end points, the shoulder and elbow angles are interpolated linearly and every step is computed by forward
+    kinematics. The arm edge does not follow a straight line, but every step is reachable by construction and the
+    elbow keeps the chosen direction, as the elbow angle never changes sign between two angles of the same sign
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate of robotic movement
+    :param yt: The final target y coordinate of robotic movement
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps for the move
+    :return: The Trajectory of the move, or None if one of the end points is not reachable
+    """
+    start_x1, start_y1 = calculate_first_arm(x2, y2, l1, l2, direction)
+    target_x1, target_y1 = calculate_first_arm(xt, yt, l1, l2, direction)
+    if start_x1 is None or target_x1 is None:
+        return None
+
+    start_shoulder, start_elbow = get_joint_angles(start_x1, start_y1, x2, y2)
+    target_shoulder, target_elbow = get_joint_angles(target_x1, target_y1, xt, yt)
+
+    # The shoulder turns the short way round, the elbow goes straight between its two angles
+    shoulder_turn = (target_shoulder - start_shoulder + math.pi) % (2 * math.pi) - math.pi
+
+    fractions = np.arange(1, steps + 1) / steps
+    shoulder = start_shoulder + shoulder_turn * fractions
+    elbow = start_elbow + (target_elbow - start_elbow) * fractions
+
+    path_x1, path_y1, path_x2, path_y2 = forward_kinematics_batch(l1, l2, shoulder, elbow)
+
+    poses = np.column_stack((path_x1, path_y1, path_x2, path_y2))
+    return Trajectory(l1, l2, direction, poses)
+
+
+def plan_move(direction, x2, y2, xt, yt, l1, l2, steps, path=None, joint=False):
+    """
+    Compute up front all arm poses of a move, the way it was accepted
+    :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+    :param x2: The initial x coordinate of arm2
+    :param y2: The initial y coordinate of arm2
+    :param xt: The final target x coordinate of robotic movement
+    :param yt: The final target y coordinate of robotic movement
+    :param l1: The fixed arm1 length L1
+    :param l2: The fixed arm2 length L2
+    :param steps: Number of steps for the move
+    :param path: Optional PlannedPath followed by the arm edge, see plan_path_move
+    :param joint: If True and there is no path, interpolate the joint angles, see plan_joint_move. Otherwise the arm
+    edge follows the straight line to (xt, yt), see plan_straight_move
+    :return: The Trajectory of the move, or None for a joint move whose end points are not reachable
+    """
+    if path is not None:
+        return plan_path_move(direction, path, l1, l2, steps)
+    if joint:
+        return plan_joint_move(direction, x2, y2, xt, yt, l1, l2, steps)
+    return plan_straight_move(direction, x2, y2, xt, yt, l1, l2, steps)
@@ -0,0 +1,191 @@
+class Viewport:
+    """
+    Cached world to canvas transform of a canvas. The canvas size is read once when the viewport is created, then
+    only updated by <Configure> events, so drawing and animation frames never query the window system.
+
+    The (0, 0) world point is drawn at the middle of the canvas moved by the pan offset, and one world unit is
+    `scale` canvas pixels, with the y axis pointing up. When the transform changes by a resize, a zoom or a pan, the
+    items already on the canvas are moved or scaled in one canvas.move or canvas.scale call instead of being drawn
+    again, and the listeners are called with the new transform so that running animations continue with it. Line
+    widths are not scaled, and point markers grow or shrink with the zoom as canvas.scale scales their bounding box
+    """
+
+    def __init__(self, canvas, scale=1.0, min_scale=1e-4, max_scale=1e4):
+        """
+        :param canvas: The tkinter canvas
+        :param scale: The initial number of canvas pixels per world unit
+        :param min_scale: The smallest scale zoom goes to
+        :param max_scale: The largest scale zoom goes to
+        """
+        self.canvas = canvas
+        self.scale = scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+        # Before the canvas is shown its size is the requested one, the first <Configure> event gives the real size
+        if canvas.winfo_ismapped():
+            self.width, self.height = canvas.winfo_width(), canvas.winfo_height()
+        else:
+            self.width, self.height = int(canvas.cget("width")), int(canvas.cget("height"))
+
+        # Pan offset of the (0, 0) point from the middle of the canvas, in canvas pixels
+        self.offset_x = 0
+        self.offset_y = 0
+        self.center_x = self.width // 2
+        self.center_y = self.height // 2
+
+        self.axes = None
+        self._listeners = []
+        self._drag_x = None
+        self._drag_y = None
+
+        canvas.bind("<Configure>", self._on_configure, add="+")
+
+    def get_center_xy(self):
+        """
+        :return: A tuple (center_x, center_y) with the canvas coordinates of the (0, 0) point
+        """
+        return self.center_x, self.center_y
+
+    def get_size(self):
+        """
+        :return: A tuple (width, height) with the cached canvas size
+        """
+        return self.width, self.height
+
+    def get_transform(self):
+        """
+        :return: A tuple (center_x, center_y, scale), the arguments the listeners are called with
+        """
+        return self.center_x, self.center_y, self.scale
+
+    def to_canvas(self, x, y):
+        """
+        :param x: The world x coordinate, single value or NumPy array
+        :param y: The world y coordinate, single value or NumPy array
+        :return: A tuple (canvas_x, canvas_y)
+        """
+        return self.center_x + x * self.scale, self.center_y - y * self.scale
+
+    def to_world(self, canvas_x, canvas_y):
+        """
+        :param canvas_x: The canvas x coordinate, e.g. of a mouse event
+        :param canvas_y: The canvas y coordinate
+        :return: A tuple (x, y) of world coordinates
+        """
+        return (canvas_x - self.center_x) / self.scale, (self.center_y - canvas_y) / self.scale
+
+    def set_axes(self, x_axis, y_axis):
+        """
+        Keep two lines as the X and Y axes, spanning the whole canvas through the (0, 0) point
+        :param x_axis: The X axis line
+        :param y_axis: The Y axis line
+        """
+        self.axes = (x_axis, y_axis)
+        self._update_axes()
+
+    def add_listener(self, listener):
+        """
+        :param listener: Function called with (center_x, center_y, scale) after every change of the transform, e.g.
+        TrajectoryPlayer.set_transform
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        :param listener: A function given to add_listener
+        """
+        self._listeners.remove(listener)
+
+    def zoom(self, factor, canvas_x=None, canvas_y=None):
+        """
+        Zoom in or out around a canvas point, which stays in place
+        :param factor: The scale factor, greater than 1 to zoom in. It is limited to the min_scale and max_scale
+        :param canvas_x: The x canvas coordinate to zoom around, by default the (0, 0) point
+        :param canvas_y: The y canvas coordinate to zoom around, by default the (0, 0) point
+        """
+        factor = min(max(self.scale * factor, self.min_scale), self.max_scale) / self.scale
+        if factor == 1:
+            return
+        if canvas_x is None:
+            canvas_x, canvas_y = self.center_x, self.center_y
+
+        self.canvas.scale("all", canvas_x, canvas_y, factor, factor)
+        self.scale *= factor
+        self.center_x = canvas_x + (self.center_x - canvas_x) * factor
+        self.center_y = canvas_y + (self.center_y - canvas_y) * factor
+        self.offset_x = self.center_x - self.width // 2
+        self.offset_y = self.center_y - self.height // 2
+        self._changed()
+
+    def pan(self, dx, dy):
+        """
+        Move the view, and all items, by a number of canvas pixels
+        :param dx: The x move in canvas pixels
+        :param dy: The y move in canvas pixels, positive down
+        """
+        if dx == 0 and dy == 0:
+            return
+
+        self.canvas.move("all", dx, dy)
+        self.offset_x += dx
+        self.offset_y += dy
+        self.center_x += dx
+        self.center_y += dy
+        self._changed()
+
+    def fit(self, radius, margin=0.9):
+        """
+        Zoom around the (0, 0) point so that a circle of the given world radius fills the smaller canvas dimension,
+        e.g. for arm lengths that do not fit the canvas at the current scale
+        :param radius: The world radius to show, e.g. L1 + L2
+        :param margin: Part of the half canvas size the radius takes
+        """
+        if radius > 0:
+            self.zoom(margin * min(self.width, self.height) / 2 / radius / self.scale)
+
+    def bind_mouse(self):
+        """
+        Zoom with the mouse wheel around the mouse position and pan by dragging with the right mouse button
+        """
+        def wheel(event):
+            # <MouseWheel> gives a delta on Windows and macOS, X11 sends buttons 4 and 5 instead
+            zoom_in = event.delta > 0 if event.num not in (4, 5) else event.num == 4
+            self.zoom(1.25 if zoom_in else 0.8, event.x, event.y)
+
+        def press(event):
+            self._drag_x, self._drag_y = event.x, event.y
+
+        def drag(event):
+            if self._drag_x is not None:
+                self.pan(event.x - self._drag_x, event.y - self._drag_y)
+                self._drag_x, self._drag_y = event.x, event.y
+
+        self.canvas.bind("<MouseWheel>", wheel, add="+")
+        self.canvas.bind("<Button-4>", wheel, add="+")
+        self.canvas.bind("<Button-5>", wheel, add="+")
+        self.canvas.bind("<ButtonPress-3>", press, add="+")
+        self.canvas.bind("<B3-Motion>", drag, add="+")
+
+    def _on_configure(self, event):
+        if (event.width, event.height) == (self.width, self.height):
+            return
+
+        # Keep the (0, 0) point at the middle of the canvas, moved by the pan offset
+        self.width, self.height = event.width, event.height
+        center_x = self.width // 2 + self.offset_x
+        center_y = self.height // 2 + self.offset_y
+        self.canvas.move("all", center_x - self.center_x, center_y - self.center_y)
+        self.center_x, self.center_y = center_x, center_y
+        self._changed()
+
+    def _update_axes(self):
+        if self.axes is not None:
+            x_axis, y_axis = self.axes
+            self.canvas.coords(x_axis, 0, self.center_y, self.width, self.center_y)
+            self.canvas.coords(y_axis, self.center_x, 0, self.center_x, self.height)
+
+    def _changed(self):
+        self._update_axes()
+        for listener in self._listeners:
+            listener(self.center_x, self.center_y, self.scale)
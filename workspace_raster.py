@@ -0,0 +1,218 @@
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from kinematics import get_workspace_radius
+from kinematics_batch import solve_arm_batch
+
+# Layers of the raster array - The reachability and the joint angles for direction 0 and 1
+RASTER_REACHABLE = 0
+RASTER_SHOULDER = (1, 3)
+RASTER_ELBOW = (2, 4)
+RASTER_LAYERS = 5
+
+# Number of raster rows computed at once while building, to bound the memory used
+BUILD_ROWS_CHUNK = 256
+
+
+class WorkspaceRaster:
+    """
+    Precomputed grid of reachability and both elbow solutions for fixed L1, L2. The grid covers the square
+    [-R, R] x [-R, R] around (0, 0) with one point every `resolution` units
+    """
+
+    def __init__(self, l1, l2, resolution, data):
+        """
+        :param l1: The arm length L1
+        :param l2: The arm length L2
+        :param resolution: The distance between two neighbour grid points
+        :param data: Array (or memory map) of shape (RASTER_LAYERS, size, size) indexed as [layer, row (y), col (x)]
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.resolution = resolution
+        self.data = data
+
+        ext_r, _ = get_workspace_radius(l1, l2)
+        self.origin = -ext_r
+        self.size = data.shape[1]
+
+    def _to_grid(self, x, y):
+        # Fractional grid coordinates of (x, y)
+        col = (np.asarray(x, dtype=float) - self.origin) / self.resolution
+        row = (np.asarray(y, dtype=float) - self.origin) / self.resolution
+        return col, row
+
+    def _nearest_cells(self, x, y):
+        col, row = self._to_grid(x, y)
+        col = np.rint(col)
+        row = np.rint(row)
+        on_grid = (col >= 0) & (col < self.size) & (row >= 0) & (row < self.size)
+
+        # Points off the grid read cell (0, 0), which is a corner of the square and never reachable
+        col = np.where(on_grid, col, 0).astype(np.intp)
+        row = np.where(on_grid, row, 0).astype(np.intp)
+        return row, col
+
+    def is_reachable(self, x, y):
+        """
+        Look up if (x, y) is inside workspace, using the nearest grid point
+        :param x: The x coordinate or array of x coordinates
+        :param y: The y coordinate or array of y coordinates
+        :return: Boolean or array of booleans, True if the nearest grid point is inside workspace
+        """
+        row, col = self._nearest_cells(x, y)
+        return self.data[RASTER_REACHABLE, row, col] > 0.5
+
+    def get_joint_angles(self, x, y, direction, interpolate=False):
+        """
+        Look up the shoulder and elbow angles of the arm edge at (x, y)
+        :param x: The x coordinate or array of x coordinates of arm2
+        :param y: The y coordinate or array of y coordinates of arm2
+        :param direction: The chosen direction - 1 for clockwise and 0 for counterclockwise
+        :param interpolate: If True refine the angles by bilinear interpolation of the 4 surrounding grid points,
+        falling back to the nearest grid point where one of them is not reachable
+        :return: A tuple (shoulder, elbow) in RAD, NaN where the grid point is not reachable
+        """
+        shoulder_layer = self.data[RASTER_SHOULDER[direction]]
+        elbow_layer = self.data[RASTER_ELBOW[direction]]
+
+        # The angle layers are solved on the closed workspace, while the reachable layer uses the open one as
+        # are_coords_inside_workspace - Grid points on the workspace circles have angles but are not reachable
+        row, col = self._nearest_cells(x, y)
+        reachable = self.data[RASTER_REACHABLE, row, col] > 0.5
+        shoulder = np.where(reachable, shoulder_layer[row, col], np.nan)
+        elbow = np.where(reachable, elbow_layer[row, col], np.nan)
+
+        if interpolate:
+            col_f, row_f = self._to_grid(x, y)
+            col0 = np.clip(np.floor(col_f), 0, self.size - 2).astype(np.intp)
+            row0 = np.clip(np.floor(row_f), 0, self.size - 2).astype(np.intp)
+            fx = np.clip(col_f - col0, 0.0, 1.0)
+            fy = np.clip(row_f - row0, 0.0, 1.0)
+
+            refined_shoulder = interpolate_angle(shoulder_layer, row0, col0, fx, fy)
+            refined_elbow = interpolate_angle(elbow_layer, row0, col0, fx, fy)
+            refined = get_cell_reachable(self.data[RASTER_REACHABLE], row0, col0) & reachable
+
+            shoulder = np.where(refined & ~np.isnan(refined_shoulder), refined_shoulder, shoulder)
+            elbow = np.where(refined & ~np.isnan(refined_elbow), refined_elbow, elbow)
+
+        return shoulder, elbow
+
+
+def get_cell_reachable(layer, row0, col0):
+    """
+    Check the 4 grid points of the cells with lower corners (row0, col0) in the reachable layer
+    :param layer: The 2D reachable layer
+    :param row0: Array of lower row indexes
+    :param col0: Array of lower column indexes
+    :return: Array of booleans, True where all 4 grid points are reachable
+    """
+    flat = layer.reshape(-1)
+    index00 = row0 * layer.shape[1] + col0
+    return ((flat.take(index00) > 0.5) & (flat.take(index00 + 1) > 0.5) &
+            (flat.take(index00 + layer.shape[1]) > 0.5) & (flat.take(index00 + layer.shape[1] + 1) > 0.5))
+
+
+def interpolate_angle(layer, row0, col0, fx, fy):
+    """
+    Bilinear interpolation of an angle layer, taking care of the wrap around at +-pi
+    :param layer: The 2D angle layer
+    :param row0: Array of lower row indexes
+    :param col0: Array of lower column indexes
+    :param fx: Array of fractional offsets in x within the cell
+    :param fy: Array of fractional offsets in y within the cell
+    :return: Array of interpolated angles in [-pi, pi], NaN where one of the 4 grid points is NaN
+    """
+    # Gather the 4 grid points through flat indexes, which is much cheaper than 2D fancy indexing
+    flat = layer.reshape(-1)
+    index00 = row0 * layer.shape[1] + col0
+    a00 = flat.take(index00).astype(float)
+    a01 = flat.take(index00 + 1).astype(float)
+    a10 = flat.take(index00 + layer.shape[1]).astype(float)
+    a11 = flat.take(index00 + layer.shape[1] + 1).astype(float)
+
+    # Interpolate the differences to a00 wrapped to [-pi, pi], so that angles next to +-pi do not average to 0
+    def wrap(angle):
+        return angle - 2 * np.pi * np.rint(angle / (2 * np.pi))
+
+    d01 = wrap(a01 - a00)
+    d10 = wrap(a10 - a00)
+    d11 = wrap(a11 - a00)
+
+    result = a00 + (1 - fy) * fx * d01 + fy * (1 - fx) * d10 + fy * fx * d11
+    return wrap(result)
+
+
+def get_raster_path(cache_dir, l1, l2, resolution):
+    """
+    Get the cache file of the raster for (L1, L2, resolution)
+    :param cache_dir: The directory of the cached rasters
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param resolution: The distance between two neighbour grid points
+    :return: The path of the raster file
+    """
+    # Same file for equal values of any type, e.g. 100, 100.0 and np.float64(100)
+    return os.path.join(cache_dir, f"workspace_{float(l1)!r}_{float(l2)!r}_{float(resolution)!r}.npy")
+
+
+def build_workspace_raster(l1, l2, resolution, path):
+    """
+    Compute the raster for (L1, L2, resolution) and save it as a .npy file. The file is written under a temporary
+    name and then renamed, so that other processes never see a half written raster
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param resolution: The distance between two neighbour grid points
+    :param path: The path of the raster file
+    """
+    ext_r, int_r = get_workspace_radius(l1, l2)
+    size = int(math.ceil(2 * ext_r / resolution)) + 1
+    axis = -ext_r + resolution * np.arange(size)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        data = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(RASTER_LAYERS, size, size))
+
+        for start in range(0, size, BUILD_ROWS_CHUNK):
+            rows = axis[start:start + BUILD_ROWS_CHUNK]
+            x, y = np.meshgrid(axis, rows)
+
+            # Same open workspace as are_coords_inside_workspace
+            dist_sq = x ** 2 + y ** 2
+            data[RASTER_REACHABLE, start:start + len(rows)] = (dist_sq < ext_r ** 2) & (dist_sq > int_r ** 2)
+
+            for direction in (0, 1):
+                _, _, shoulder, elbow, _ = solve_arm_batch(l1, l2, x, y, direction)
+                data[RASTER_SHOULDER[direction], start:start + len(rows)] = shoulder
+                data[RASTER_ELBOW[direction], start:start + len(rows)] = elbow
+
+        data.flush()
+        del data
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_workspace_raster(l1, l2, resolution, cache_dir):
+    """
+    Get the raster for (L1, L2, resolution) from the cache directory, building it first if not cached yet
+    The raster is memory mapped read-only, so processes using the same raster share one copy in memory
+    :param l1: The arm length L1
+    :param l2: The arm length L2
+    :param resolution: The distance between two neighbour grid points
+    :param cache_dir: The directory of the cached rasters
+    :return: The WorkspaceRaster
+    """
+    path = get_raster_path(cache_dir, l1, l2, resolution)
+
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        build_workspace_raster(l1, l2, resolution, path)
+
+    return WorkspaceRaster(l1, l2, resolution, np.load(path, mmap_mode="r"))